@@ -0,0 +1,137 @@
+# dependencies
+from _common import clock
+from _doc_cache import release_document_cache
+from _element_census import ElementCensus, element_id_value
+
+RECOUNT_EVERY = 50  # Full census pass on every n-th sync, catching changes no event reported
+# Without version diffs, compare the element count with the document on every n-th sync, 0 to never.
+# DocumentChanged keeps the census current in between, the check only catches changes received from others.
+CHECK_EVERY = 10
+
+_tracked = []  # Applications whose DocumentChanged event is handled
+_pending = {}  # Document -> (added, modified, deleted) element id values since the last sync, None when lost
+_states = {}  # Document -> census state
+
+
+def on_document_changed(sender, args):
+    """ DocumentChanged handler collecting the element ids changed in tracked documents """
+    doc = args.GetDocument()
+    pending = _pending.get(doc)
+    if pending is None:
+        return
+    try:
+        added, modified, deleted = pending
+        added.update(element_id_value(i) for i in args.GetAddedElementIds())
+        modified.update(element_id_value(i) for i in args.GetModifiedElementIds())
+        deleted.update(element_id_value(i) for i in args.GetDeletedElementIds())
+    except Exception:  # Never fail inside a Revit event, recount on the next sync instead
+        _pending[doc] = None
+
+
+def on_document_closing(sender, args):
+    """ DocumentClosing handler dropping the census and cached lookups of the closing document """
+    try:
+        forget_document(args.Document)
+        release_document_cache(args.Document)
+    except Exception:  # Never fail inside a Revit event
+        pass
+
+
+def track_changes(app):
+    """ Handles DocumentChanged and DocumentClosing of app, once per session """
+    if not _tracked:
+        app.DocumentChanged += on_document_changed
+        app.DocumentClosing += on_document_closing
+        _tracked.append(app)
+
+
+def _version_guid(doc):
+    """ GUID of the current document version, None before Revit 2023 """
+    from Autodesk.Revit.DB import Document
+    get_version = getattr(Document, "GetDocumentVersion", None)
+    return None if get_version is None else get_version(doc).VersionGUID
+
+
+def _version_changes(doc, guid):
+    """ (added, modified, deleted) element id values since version guid, None when Revit cannot tell
+
+    Document.GetChangedElements is new in the Revit 2023 API. It covers the changes of every user
+    received by the last sync, which no DocumentChanged event reports.
+    """
+    if guid is None or not hasattr(doc, "GetChangedElements"):
+        return None
+    try:
+        changes = doc.GetChangedElements(guid)
+        return ([element_id_value(i) for i in changes.GetCreatedElementIds()],
+                [element_id_value(i) for i in changes.GetModifiedElementIds()],
+                [element_id_value(i) for i in changes.GetDeletedElementIds()])
+    except Exception:  # Version no longer known, e.g. after a reload, fall back to the events
+        return None
+
+
+def _start_tracking(doc):
+    _pending[doc] = (set(), set(), set())
+
+
+def current_census(doc, recount_every=RECOUNT_EVERY, check_every=CHECK_EVERY):
+    """ Census of doc, seeded by one full pass and then kept current from the changes since the last sync
+
+    From Revit 2023 the changes are the difference between the document versions of the two syncs,
+    including those of other users. Before, they are the DocumentChanged events of this session, and
+    every check_every-th sync a count of the document's census elements catches what no event
+    reported, such as elements other users added. The syncs in between do no collector pass at all.
+    A full pass also runs on every recount_every-th sync, when change events were lost and when that
+    count differs from the census.
+    """
+    start = clock()
+    state = _states.get(doc)
+    if state is None:
+        _start_tracking(doc)
+        state = {"census": ElementCensus(doc), "syncs": 0, "mode": "seed", "changed": 0,
+                 "version": _version_guid(doc)}
+        _states[doc] = state
+        state["seconds"] = clock() - start
+        return state["census"]
+
+    census = state["census"]
+    pending = _pending.get(doc)
+    _start_tracking(doc)
+    changes = _version_changes(doc, state["version"])
+    state["version"] = _version_guid(doc)
+    state["syncs"] += 1
+    if changes is not None:
+        pending = changes
+    state["changed"] = 0 if pending is None else sum(len(ids) for ids in pending)
+    if pending is None:
+        census.recount()
+        state["mode"] = "recount, events lost"
+    elif recount_every and state["syncs"] % recount_every == 0:
+        census.recount()
+        state["mode"] = "periodic recount"
+    elif changes is not None:
+        census.apply_changes(*changes)
+        state["mode"] = "version diff"
+    else:
+        census.apply_changes(*pending)
+        state["mode"] = "incremental"
+        if check_every and state["syncs"] % check_every == 0 and census.drifted():
+            census.recount()
+            state["mode"] = "recount, drift"
+    state["seconds"] = clock() - start
+    return census
+
+
+def census_state(doc):
+    """ How the census of doc was brought up to date on the last sync """
+    state = _states.get(doc)
+    if state is None:
+        return None
+    result = state["census"].stats()
+    result.update((k, v) for k, v in state.items() if k != "census")
+    return result
+
+
+def forget_document(doc):
+    """ Drops the census of a closed document """
+    _states.pop(doc, None)
+    _pending.pop(doc, None)
@@ -0,0 +1,76 @@
+# dependencies
+import json
+import os
+
+from _common import clock
+
+CHUNK_SIZE = 2000  # Points added per transaction
+
+
+def apply_in_chunks(points, add_chunk, chunk_size=CHUNK_SIZE, start=0, report=None, cancelled=None):
+    """ Calls add_chunk with consecutive slices of points from index start, stopping at the first failure
+
+    report(done, total, rate) is called after every chunk and cancelled() before every chunk. Returns
+    the number of points applied, the index the next run resumes from, whether the run was cancelled,
+    the error of a failed chunk, and the elapsed seconds and points per second.
+    """
+    chunk_size = max(1, int(chunk_size))
+    total = len(points)
+    index = start
+    error = None
+    stopped = False
+    begin = clock()
+    while index < total:
+        if cancelled is not None and cancelled():
+            stopped = True
+            break
+        chunk = points[index:index + chunk_size]
+        try:
+            add_chunk(chunk)
+        except Exception as e:
+            error = "{}: {} (points {} to {})".format(type(e).__name__, e, index, index + len(chunk) - 1)
+            break
+        index += len(chunk)
+        if report is not None:
+            seconds = clock() - begin
+            report(index, total, (index - start) / seconds if seconds > 0 else 0.0)
+    return apply_result(total, start, index, stopped, error, clock() - begin)
+
+
+def apply_result(total, start=0, index=0, cancelled=False, error=None, seconds=0.0):
+    """ Outcome of applying points start to index of total """
+    return {
+        "applied": index - start,
+        "next": index,
+        "total": total,
+        "complete": index >= total,
+        "cancelled": cancelled,
+        "error": error,
+        "seconds": seconds,
+        "rate": (index - start) / seconds if seconds > 0 else 0.0
+    }
+
+
+def save_resume(path, key, points, index):
+    """ Remembers the points from index on, the part of a run that has not been applied yet """
+    with open(path, "w") as f:
+        json.dump({"key": key, "points": [list(p) for p in points[index:]]}, f)
+
+
+def load_resume(path, key):
+    """ Points still to apply for key, or None """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except ValueError:  # Interrupted while saving
+        return None
+    if state.get("key") != key:
+        return None
+    return [tuple(p) for p in state["points"]]
+
+
+def clear_resume(path):
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,32 @@
+# dependencies
+import os
+import time
+
+clock = getattr(time, "perf_counter", time.time)  # Interval clock, IronPython 2.7 has no perf_counter
+
+
+def replace_file(source, destination):
+    """ Moves source over destination in one step, readers see either the old or the new file
+
+    Python 3 does this with os.replace. IronPython 2.7 has no os.replace, an existing destination is
+    swapped there with the .NET File.Replace.
+    """
+    replace = getattr(os, "replace", None)
+    if replace is not None:
+        replace(source, destination)
+    elif os.path.exists(destination):
+        from System.IO import File
+        File.Replace(source, destination, None)
+    else:
+        os.rename(source, destination)
+
+
+def write_file(path, data, mode="w"):
+    """ Writes data through a temporary file and replace_file, so an interrupted write keeps the old file """
+    folder = os.path.dirname(path)
+    if folder and not os.path.isdir(folder):
+        os.makedirs(folder)
+    temp = path + ".tmp"
+    with open(temp, mode) as f:
+        f.write(data)
+    replace_file(temp, path)
@@ -0,0 +1,166 @@
+# dependencies
+import math
+
+try:
+    import numpy as np
+except ImportError:  # IronPython, as in Revit, curves are sampled point by point in plain Python
+    np = None
+
+LINE = 0
+ARC = 1
+COUNT_EPSILON = 1.0e-9  # Keeps lengths that are exact multiples of the spacing from rounding down
+
+
+def line_descriptor(start, end):
+    """ Plain-data description of a bound line """
+    return (LINE, tuple(start), tuple(end))
+
+
+def arc_descriptor(center, radius, start_angle, end_angle, x_dir=(1.0, 0.0, 0.0), y_dir=(0.0, 1.0, 0.0)):
+    """ Plain-data description of an arc, angles in radians measured from x_dir towards y_dir """
+    return (ARC, tuple(center), float(radius), float(start_angle), float(end_angle), tuple(x_dir), tuple(y_dir))
+
+
+def _check_kinds(descriptors):
+    kinds = set(d[0] for d in descriptors)
+    if kinds - set((LINE, ARC)):
+        raise ValueError("Unknown curve descriptor kind in {}".format(sorted(kinds)))
+
+
+def curve_point(descriptor, t):
+    """ Point of one curve at normalized parameter t, the plain Python counterpart of evaluate_curves """
+    if descriptor[0] == LINE:
+        p0, p1 = descriptor[1], descriptor[2]
+        return tuple(p0[i] + t * (p1[i] - p0[i]) for i in range(3))
+    center, radius, a0, a1, x, y = descriptor[1:]
+    angle = a0 + t * (a1 - a0)
+    c = math.cos(angle)
+    s = math.sin(angle)
+    return tuple(center[i] + radius * (c * x[i] + s * y[i]) for i in range(3))
+
+
+def curve_length(descriptor):
+    if descriptor[0] == LINE:
+        p0, p1 = descriptor[1], descriptor[2]
+        return math.sqrt(sum((p1[i] - p0[i]) ** 2 for i in range(3)))
+    return descriptor[2] * abs(descriptor[4] - descriptor[3])
+
+
+class _Loop(object):
+    """ Curve descriptors unpacked into per-curve arrays """
+    def __init__(self, descriptors):
+        n = len(descriptors)
+        self.kind = np.array([d[0] for d in descriptors], dtype=np.int8).reshape(n)
+        if np.any((self.kind != LINE) & (self.kind != ARC)):
+            raise ValueError("Unknown curve descriptor kind in {}".format(sorted(set(self.kind.tolist()))))
+        self.p0 = np.zeros((n, 3))
+        self.p1 = np.zeros((n, 3))
+        self.center = np.zeros((n, 3))
+        self.radius = np.zeros(n)
+        self.a0 = np.zeros(n)
+        self.a1 = np.zeros(n)
+        self.x_dir = np.zeros((n, 3))
+        self.y_dir = np.zeros((n, 3))
+        # Fill the columns kind by kind, one array conversion each
+        lines = np.flatnonzero(self.kind == LINE)
+        if len(lines):
+            rows = [descriptors[i] for i in lines]
+            self.p0[lines] = [d[1] for d in rows]
+            self.p1[lines] = [d[2] for d in rows]
+        arcs = np.flatnonzero(self.kind == ARC)
+        if len(arcs):
+            rows = [descriptors[i] for i in arcs]
+            self.center[arcs] = [d[1] for d in rows]
+            self.radius[arcs] = [d[2] for d in rows]
+            self.a0[arcs] = [d[3] for d in rows]
+            self.a1[arcs] = [d[4] for d in rows]
+            self.x_dir[arcs] = [d[5] for d in rows]
+            self.y_dir[arcs] = [d[6] for d in rows]
+        self.is_arc = self.kind == ARC
+
+    def lengths(self):
+        return np.where(self.is_arc,
+                        self.radius * np.abs(self.a1 - self.a0),
+                        np.linalg.norm(self.p1 - self.p0, axis=1))
+
+    def evaluate(self, curve, t):
+        """ Points at normalized parameters t of the curves with index curve """
+        t = t[:, None]
+        points = self.p0[curve] + t * (self.p1[curve] - self.p0[curve])
+        arc = self.is_arc[curve]
+        if np.any(arc):
+            c = curve[arc]
+            angle = (self.a0[c] + t[arc, 0] * (self.a1[c] - self.a0[c]))[:, None]
+            points[arc] = self.center[c] + self.radius[c, None] * (np.cos(angle) * self.x_dir[c]
+                                                                  + np.sin(angle) * self.y_dir[c])
+        return points
+
+
+def evaluate_curves(descriptors, curve, t):
+    """ Points of the curves with indices curve at normalized parameters t, as an (n, 3) array
+
+    Without NumPy the points are a list of (x, y, z) tuples, as for every function of this module.
+    """
+    if np is None:
+        _check_kinds(descriptors)
+        return [curve_point(descriptors[c], u) for c, u in zip(curve, t)]
+    return _Loop(descriptors).evaluate(np.asarray(curve, dtype=np.int64), np.asarray(t, dtype=np.float64))
+
+
+def curve_lengths(descriptors):
+    """ Lengths of all curves of a loop """
+    if np is None:
+        _check_kinds(descriptors)
+        return [curve_length(d) for d in descriptors]
+    return _Loop(descriptors).lengths()
+
+
+def division_counts(lengths, spacing):
+    """ Number of divisions per curve, same as int(length // spacing) """
+    if spacing <= 0:
+        raise ValueError("Spacing must be greater than zero")
+    if np is None:
+        return [int(math.floor(float(length) / spacing + COUNT_EPSILON)) for length in lengths]
+    return np.floor(np.asarray(lengths, dtype=np.float64) / spacing + COUNT_EPSILON).astype(np.int64)
+
+
+def sample_loop(descriptors, spacing=None, divisions=None):
+    """ Samples a whole curve loop at once, returns points (n, 3) and per-curve offsets into them
+
+    Each curve gives its start point followed by the points at i / div for i in 1..div, the same
+    order as CurveDivisionSingular. Curve k owns points[offsets[k]:offsets[k + 1]].
+    """
+    if np is None:
+        return _sample_loop_python(descriptors, spacing, divisions)
+    loop = _Loop(descriptors)
+    if divisions is None:
+        if spacing is None:
+            raise ValueError("Either spacing or divisions is required")
+        divisions = division_counts(loop.lengths(), spacing)
+    divisions = np.asarray(divisions, dtype=np.int64)
+    if len(divisions) != len(descriptors):
+        raise ValueError("Expected {} division counts, got {}".format(len(descriptors), len(divisions)))
+
+    counts = divisions + 1
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    curve = np.repeat(np.arange(len(counts)), counts)
+    local = np.arange(offsets[-1]) - offsets[curve]
+    t = local / np.maximum(divisions, 1)[curve].astype(np.float64)
+    return loop.evaluate(curve, t), offsets
+
+
+def _sample_loop_python(descriptors, spacing, divisions):
+    _check_kinds(descriptors)
+    if divisions is None:
+        if spacing is None:
+            raise ValueError("Either spacing or divisions is required")
+        divisions = division_counts(curve_lengths(descriptors), spacing)
+    divisions = [int(d) for d in divisions]
+    if len(divisions) != len(descriptors):
+        raise ValueError("Expected {} division counts, got {}".format(len(descriptors), len(divisions)))
+    points, offsets = [], [0]
+    for descriptor, div in zip(descriptors, divisions):
+        points.extend(curve_point(descriptor, float(i) / max(div, 1)) for i in range(div + 1))
+        offsets.append(len(points))
+    return points, offsets
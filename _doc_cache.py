@@ -0,0 +1,115 @@
+# dependencies
+_caches = {}  # Document -> DocumentCache
+
+
+def revit_document_version(doc):
+    """ Returns a token that changes whenever the Revit document is saved or synced, None before Revit 2023
+
+    Document.GetDocumentVersion is new in the Revit 2023 API. Without it the token never changes and
+    a cache only follows the document through DocumentChanged, see DocumentCache.watch.
+    """
+    from Autodesk.Revit.DB import Document
+    get_version = getattr(Document, "GetDocumentVersion", None)
+    if get_version is None:
+        return None
+    version = get_version(doc)
+    return str(version.VersionGUID), version.NumberOfSaves
+
+
+def is_valid_element(element):
+    """ False for missing elements and for elements deleted since they were cached """
+    return element is not None and getattr(element, "IsValidObject", True)
+
+
+class DocumentCache(object):
+    """ Lookup cache bound to one document, cleared when the document version changes
+
+    While watched it is also cleared by every DocumentChanged of the document, which covers edits
+    between saves and Revit versions without document versions.
+    """
+    def __init__(self, doc, version=None):
+        self.doc = doc
+        self._version = version
+        self._token = self._current_token()
+        self._entries = {}
+        self._app = None  # Application whose DocumentChanged is watched
+        self._handler = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _current_token(self):
+        if self._version is None:
+            return None
+        return self._version(self.doc)
+
+    def _check_version(self):
+        token = self._current_token()
+        if token != self._token:
+            self._token = token
+            self.invalidate()
+
+    def get(self, key, loader, validate=None):
+        """ Returns cached value of key, calls loader(doc) on a miss or when validate(value) fails """
+        self._check_version()
+        if key in self._entries:
+            value = self._entries[key]
+            if validate is None or validate(value):
+                self.hits += 1
+                return value
+        self.misses += 1
+        value = loader(self.doc)
+        self._entries[key] = value
+        return value
+
+    def invalidate(self, key=None):
+        """ Drops one entry, or all entries when key is None """
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+        self.invalidations += 1
+
+    def on_document_changed(self, sender, args):
+        """ DocumentChanged event handler """
+        if args.GetDocument() == self.doc:
+            self.invalidate()
+
+    def watch(self, app):
+        """ Clears the cache on DocumentChanged of app until unwatch, once however often it is called """
+        if self._app is None:
+            self._handler = self.on_document_changed  # The same object has to be removed again
+            app.DocumentChanged += self._handler
+            self._app = app
+
+    def unwatch(self):
+        if self._app is not None:
+            self._app.DocumentChanged -= self._handler
+            self._app = None
+            self._handler = None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit rate": float(self.hits) / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries)
+        }
+
+
+def document_cache(doc, version=None):
+    """ Returns the cache of doc, creating it on first use """
+    cache = _caches.get(doc)
+    if cache is None:
+        cache = DocumentCache(doc, version)
+        _caches[doc] = cache
+    return cache
+
+
+def release_document_cache(doc):
+    """ Forgets the cache of a closed document and stops watching its changes """
+    cache = _caches.pop(doc, None)
+    if cache is not None:
+        cache.unwatch()
@@ -0,0 +1,106 @@
+# dependencies
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+
+from _common import write_file
+
+MAX_ENTRIES = 50000  # Edges kept before the least recently used ones are evicted
+MAX_POINTS = 1000000  # Points kept over all edges, about 24 MB of coordinates in the cache file
+
+
+def fingerprint(*parts):
+    """ Stable hex digest of plain data, equal inputs give equal keys across sessions """
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+
+def entry_points(value):
+    """ Number of points a cache value holds, over all of its arrays or lists of points """
+    return sum(len(v) for v in value.values() if hasattr(v, "__len__"))
+
+
+class EdgeCache(object):
+    """ Least recently used cache of per-edge excavation results, optionally persisted to a file
+
+    Every value is a dict with the computed arrays and the seconds it took to compute them, so hits
+    can report the time they saved. The least recently used edges are evicted beyond max_entries
+    edges or max_points points, and the file is only rewritten when edges were added.
+    """
+    def __init__(self, path=None, max_entries=MAX_ENTRIES, max_points=MAX_POINTS):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_points = max_points
+        self._entries = OrderedDict()
+        self.points = 0
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.time_saved = 0.0
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """ Returns the value of key and marks it recently used, None on a miss """
+        value = self._entries.pop(key, None)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries[key] = value
+        self.hits += 1
+        self.time_saved += value.get("seconds", 0.0)
+        return value
+
+    def put(self, key, value):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.points -= entry_points(old)
+        self._entries[key] = value
+        self.points += entry_points(value)
+        self.dirty = True
+        self._evict()
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self.points > self.max_points):
+            self.points -= entry_points(self._entries.popitem(last=False)[1])
+
+    def load(self):
+        """ Reads the cache file, an unreadable file leaves the cache empty """
+        try:
+            with open(self.path, "rb") as f:
+                entries = pickle.load(f)
+        except Exception:
+            return
+        self._entries = OrderedDict(entries)
+        self.points = sum(entry_points(value) for value in self._entries.values())
+        self._evict()
+        self.dirty = False
+
+    def save(self):
+        """ Writes the cache file through a temporary file when edges were added since the last save or load
+
+        An interrupted save keeps the old file.
+        """
+        if self.path is None or not self.dirty:
+            return
+        write_file(self.path, pickle.dumps(list(self._entries.items()), 2), "wb")
+        self.dirty = False
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.time_saved = 0.0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit rate": float(self.hits) / lookups if lookups else 0.0,
+            "time saved": self.time_saved,
+            "entries": len(self._entries),
+            "points": self.points
+        }
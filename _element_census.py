@@ -0,0 +1,151 @@
+# dependencies
+import clr
+from Autodesk.Revit.DB import (BuiltInCategory, DesignOption, ElementId, ElementMulticategoryFilter,
+                               ElementMulticlassFilter, ElementType, Family, FillPatternElement,
+                               FilteredElementCollector, ImportInstance, LinePatternElement, LogicalOrFilter,
+                               RevitLinkInstance, ScheduleSheetInstance, Viewport)
+from System import Type
+from System.Collections.Generic import List
+
+from _common import clock
+
+# Categories and classes read by the health check, collected together in one pass
+CENSUS_CATEGORIES = (
+    BuiltInCategory.OST_Views,
+    BuiltInCategory.OST_Sheets,
+    BuiltInCategory.OST_Materials,
+    BuiltInCategory.OST_RasterImages,
+    BuiltInCategory.OST_Rooms,
+    BuiltInCategory.OST_IOSModelGroups
+)
+CENSUS_CLASSES = (FillPatternElement, LinePatternElement, DesignOption, ImportInstance, RevitLinkInstance, Family,
+                  Viewport, ScheduleSheetInstance)
+
+
+def element_id_value(element_id):
+    """ Integer value of an ElementId, Value from Revit 2024 on and IntegerValue before """
+    value = getattr(element_id, "Value", None)
+    return element_id.IntegerValue if value is None else value
+
+
+def category_key(category):
+    """ Integer key of a BuiltInCategory, comparable with element_id_value(element.Category.Id) """
+    return element_id_value(ElementId(category))
+
+
+class ElementCensus(object):
+    """ Elements of the census categories and classes, indexed by category and class in one collector pass
+
+    of_category and of_class return the same elements as FilteredElementCollector(doc).OfCategory and
+    OfClass, so counts built on them match separate collectors. apply_changes keeps the index current
+    from DocumentChanged element ids, and read keeps per-element values until the element changes.
+    """
+    def __init__(self, doc, categories=CENSUS_CATEGORIES, classes=CENSUS_CLASSES):
+        self.doc = doc
+        self.categories = tuple(categories)
+        self.classes = tuple(classes)
+        self.full_passes = 0
+        self.changes = 0
+        self.seconds = 0.0
+        self.recount()
+
+    def _filter(self):
+        category_filter = ElementMulticategoryFilter(List[BuiltInCategory](self.categories))
+        class_filter = ElementMulticlassFilter(List[Type]([clr.GetClrType(c) for c in self.classes]))
+        return LogicalOrFilter(category_filter, class_filter)
+
+    def recount(self):
+        """ Rebuilds the index from a full collector pass """
+        start = clock()
+        self._elements = {}  # id -> element, for every element in the census
+        self._categories = dict((category_key(c), ({}, {})) for c in self.categories)  # key -> (instances, types)
+        self._classes = dict((c, {}) for c in self.classes)
+        self._reads = {}  # read key -> {id: value}
+        for element in FilteredElementCollector(self.doc).WherePasses(self._filter()):
+            self._add(element)
+        self.full_passes += 1
+        self.seconds = clock() - start
+
+    def _add(self, element):
+        """ Indexes element when it passes the census filter """
+        element_id = element_id_value(element.Id)
+        found = False
+        category = element.Category
+        if category is not None:
+            bucket = self._categories.get(element_id_value(category.Id))
+            if bucket is not None:
+                bucket[isinstance(element, ElementType)][element_id] = element
+                found = True
+        for cls in self.classes:
+            if isinstance(element, cls):
+                self._classes[cls][element_id] = element
+                found = True
+        if found:
+            self._elements[element_id] = element
+
+    def _remove(self, element_id):
+        if self._elements.pop(element_id, None) is None:
+            return
+        for instances, types in self._categories.values():
+            instances.pop(element_id, None)
+            types.pop(element_id, None)
+        for bucket in self._classes.values():
+            bucket.pop(element_id, None)
+        for values in self._reads.values():
+            values.pop(element_id, None)
+
+    def apply_changes(self, added=(), modified=(), deleted=()):
+        """ Updates the index from the integer ids of added, modified and deleted elements """
+        start = clock()
+        for element_id in deleted:
+            self._remove(element_id)
+        changed = set(added) | set(modified)
+        for element_id in changed:
+            self._remove(element_id)
+            element = self.doc.GetElement(ElementId(element_id))
+            if element is not None:
+                self._add(element)
+        self.changes += len(changed) + len(deleted)
+        self.seconds = clock() - start
+
+    def drifted(self):
+        """ True when the document holds a different number of census elements than the index """
+        count = FilteredElementCollector(self.doc).WherePasses(self._filter()).GetElementCount()
+        return count != len(self._elements)
+
+    def _buckets(self, source, instances_only=False):
+        if source in self._classes:
+            return [self._classes[source]]
+        instances, types = self._categories[category_key(source)]
+        return [instances] if instances_only else [instances, types]
+
+    def of_category(self, category, instances_only=False):
+        """ Elements of a census category, like OfCategory with optional WhereElementIsNotElementType """
+        return [e for bucket in self._buckets(category, instances_only) for e in bucket.values()]
+
+    def of_class(self, cls):
+        """ Elements of a census class, like OfClass """
+        return list(self._classes[cls].values())
+
+    def ids(self, source, instances_only=False):
+        """ Integer ids of the elements of a census category or class """
+        return [i for bucket in self._buckets(source, instances_only) for i in bucket]
+
+    def read(self, key, source, read, instances_only=False):
+        """ read(element) for the elements of a census category or class, kept under key until they change """
+        values = self._reads.setdefault(key, {})
+        result = []
+        for bucket in self._buckets(source, instances_only):
+            for element_id, element in bucket.items():
+                if element_id not in values:
+                    values[element_id] = read(element)
+                result.append(values[element_id])
+        return result
+
+    def stats(self):
+        return {
+            "full passes": self.full_passes,
+            "changes": self.changes,
+            "elements": len(self._elements),
+            "seconds": self.seconds
+        }
@@ -0,0 +1,600 @@
+# dependencies
+import math
+import os
+import sys
+from bisect import bisect_left
+
+try:
+    import numpy as np
+except ImportError:  # IronPython, as in Revit, runs the same pipeline in plain Python one edge at a time
+    np = None
+
+from _common import clock
+from _curve_sampling import (LINE, curve_lengths, curve_point, division_counts, evaluate_curves, line_descriptor,
+                             sample_loop)
+from _edge_cache import fingerprint
+from _point_set import DEFAULT_TOLERANCE, unique_indices
+from _slope import SLOPE_LENGTH, edge_angles, per_edge, slope_offsets
+JOIN_TOLERANCE = 1.0e-9
+BACKEND = "python" if np is None else "numpy"  # pad_points gives lists of tuples or arrays, and caches them
+
+_worker_terrain = None  # TerrainBVH of a process pool worker
+
+
+class Stopwatch(object):
+    """ Adds the wall time since the previous lap to timings[stage], does nothing without timings """
+    def __init__(self, timings=None):
+        self.timings = timings
+        self._last = clock()
+
+    def lap(self, stage):
+        now = clock()
+        if self.timings is not None:
+            self.timings[stage] = self.timings.get(stage, 0.0) + now - self._last
+        self._last = now
+
+
+def _dot(a, b):
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+def _arc_point(curve, angle):
+    center, radius, x, y = curve[1], curve[2], curve[5], curve[6]
+    c = math.cos(angle)
+    s = math.sin(angle)
+    return tuple(center[i] + radius * (c * x[i] + s * y[i]) for i in range(3))
+
+
+def _arc_angle(curve, point, near):
+    """ Angle of point on the arc circle, unwrapped to the turn closest to near """
+    center, x, y = curve[1], curve[5], curve[6]
+    v = [point[i] - center[i] for i in range(3)]
+    angle = math.atan2(_dot(v, y), _dot(v, x))
+    return angle + 2 * math.pi * round((near - angle) / (2 * math.pi))
+
+
+def curve_start(curve):
+    if curve[0] == LINE:
+        return curve[1]
+    return _arc_point(curve, curve[3])
+
+
+def curve_end(curve):
+    if curve[0] == LINE:
+        return curve[2]
+    return _arc_point(curve, curve[4])
+
+
+def _with_start(curve, point):
+    if curve[0] == LINE:
+        return (LINE, point, curve[2])
+    return curve[:3] + (_arc_angle(curve, point, curve[3]),) + curve[4:]
+
+
+def _with_end(curve, point):
+    if curve[0] == LINE:
+        return (LINE, curve[1], point)
+    return curve[:4] + (_arc_angle(curve, point, curve[4]),) + curve[5:]
+
+
+def offset_curve(curve, distance):
+    """ Offsets a curve in plan towards direction x Z, which is outwards for a counterclockwise loop """
+    if curve[0] == LINE:
+        p0, p1 = curve[1], curve[2]
+        dx = p1[0] - p0[0]
+        dy = p1[1] - p0[1]
+        length = math.hypot(dx, dy)
+        nx = dy / length * distance
+        ny = -dx / length * distance
+        return line_descriptor((p0[0] + nx, p0[1] + ny, p0[2]), (p1[0] + nx, p1[1] + ny, p1[2]))
+
+    center, radius, a0, a1, x, y = curve[1:]
+    sense = 1.0 if a1 >= a0 else -1.0
+    radial = [math.cos(a0) * x[i] + math.sin(a0) * y[i] for i in range(3)]
+    tangent = [sense * (-math.sin(a0) * x[i] + math.cos(a0) * y[i]) for i in range(3)]
+    outwards = tangent[1] * radial[0] - tangent[0] * radial[1] > 0  # (tangent x Z) . radial
+    new_radius = radius + distance if outwards else radius - distance
+    if new_radius <= 0:
+        raise ValueError("Offset of {} collapses an arc of radius {}".format(distance, radius))
+    return curve[:2] + (new_radius,) + curve[3:]
+
+
+def _support_intersections(a, b):
+    """ Plan intersections of the infinite line or full circle supporting two curves """
+    if a[0] != LINE and b[0] == LINE:
+        a, b = b, a
+    if a[0] == LINE and b[0] == LINE:
+        p, q = a[1], b[1]
+        u = (a[2][0] - p[0], a[2][1] - p[1])
+        v = (b[2][0] - q[0], b[2][1] - q[1])
+        cross = u[0] * v[1] - u[1] * v[0]
+        if abs(cross) < 1e-12 * math.hypot(*u) * math.hypot(*v):
+            return []
+        t = ((q[0] - p[0]) * v[1] - (q[1] - p[1]) * v[0]) / cross
+        return [(p[0] + t * u[0], p[1] + t * u[1])]
+    if a[0] == LINE:
+        p, c, r = a[1], b[1], b[2]
+        u = (a[2][0] - p[0], a[2][1] - p[1])
+        f = (p[0] - c[0], p[1] - c[1])
+        qa = u[0] * u[0] + u[1] * u[1]
+        qb = 2 * (f[0] * u[0] + f[1] * u[1])
+        qc = f[0] * f[0] + f[1] * f[1] - r * r
+        disc = qb * qb - 4 * qa * qc
+        if disc < 0:
+            return []
+        root = math.sqrt(disc)
+        return [(p[0] + t * u[0], p[1] + t * u[1]) for t in ((-qb - root) / (2 * qa), (-qb + root) / (2 * qa))]
+    c1, r1, c2, r2 = a[1], a[2], b[1], b[2]
+    dx = c2[0] - c1[0]
+    dy = c2[1] - c1[1]
+    d = math.hypot(dx, dy)
+    if d == 0 or d > r1 + r2 or d < abs(r1 - r2):
+        return []
+    along = (r1 * r1 - r2 * r2 + d * d) / (2 * d)
+    h = math.sqrt(max(r1 * r1 - along * along, 0.0))
+    mx = c1[0] + along * dx / d
+    my = c1[1] + along * dy / d
+    return [(mx - h * dy / d, my + h * dx / d), (mx + h * dy / d, my - h * dx / d)]
+
+
+def offset_loop(loop, distance):
+    """ Offsets a closed loop of line and arc descriptors, trimming or extending curves at the corners
+
+    distance is one offset for the whole loop or a sequence with one offset per curve.
+    """
+    distances = per_edge(distance, len(loop), "offsets")
+    curves = [offset_curve(c, d) for c, d in zip(loop, distances)]
+    count = len(curves)
+    for i in range(count):
+        j = (i + 1) % count
+        end = curve_end(curves[i])
+        start = curve_start(curves[j])
+        if math.hypot(end[0] - start[0], end[1] - start[1]) <= JOIN_TOLERANCE:
+            continue  # Tangent joint, the offset curves still meet
+        guess = ((end[0] + start[0]) / 2, (end[1] + start[1]) / 2)
+        candidates = _support_intersections(curves[i], curves[j])
+        if not candidates and distances[i] != distances[j]:
+            continue  # Parallel curves offset by different distances, the slope steps at this corner
+        if not candidates:
+            raise ValueError("Offset curves {} and {} do not meet".format(i, j))
+        corner = min(candidates, key=lambda p: math.hypot(p[0] - guess[0], p[1] - guess[1]))
+        corner = (corner[0], corner[1], end[2])
+        curves[i] = _with_end(curves[i], corner)
+        curves[j] = _with_start(curves[j], corner)
+    return curves
+
+
+def translate_loop(loop, dz):
+    """ Moves a loop vertically by dz, or every curve by its own entry of a sequence dz """
+    moved = []
+    for c, dz in zip(loop, per_edge(dz, len(loop), "heights")):
+        if c[0] == LINE:
+            moved.append((LINE, (c[1][0], c[1][1], c[1][2] + dz), (c[2][0], c[2][1], c[2][2] + dz)))
+        else:
+            moved.append((c[0], (c[1][0], c[1][1], c[1][2] + dz)) + c[2:])
+    return moved
+
+
+def _cast_slope_rays(bottom, top, divisions, curve, index, terrain):
+    """ Base points at index / divisions on the bottom loop and the terrain hits of their slope rays """
+    t = index / np.maximum(divisions[curve], 1).astype(np.float64)
+    base = evaluate_curves(bottom, curve, t)
+    hits, _, _ = terrain.intersect(base, evaluate_curves(top, curve, t) - base)
+    return base, hits
+
+
+def _interval_error(z_lo, z_mid, z_hi, frac):
+    """ Vertical distance of z_mid from the line between z_lo and z_hi, inf when only some are missing """
+    error = np.abs(z_mid - (z_lo + frac * (z_hi - z_lo)))
+    missing = np.isnan(z_lo).astype(int) + np.isnan(z_mid) + np.isnan(z_hi)
+    return np.where(missing == 0, error, np.where(missing == 3, 0.0, np.inf))
+
+
+def _grid_rays(divisions):
+    """ Curve and index along the curve of every ray of the fixed-spacing grid, curve by curve """
+    curve = np.repeat(np.arange(len(divisions)), divisions + 1)
+    starts = np.concatenate(([0], np.cumsum(divisions + 1)[:-1]))
+    return curve, np.arange(len(curve)) - starts[curve]
+
+
+def _adaptive_slope_rays(bottom, top, divisions, terrain, vertical_tolerance, slope):
+    """ Rays of the fixed-spacing grid the daylight line needs to stay within tolerance
+
+    Returns the base points, terrain hits and curve indices of every grid ray, and a mask of the ones
+    kept. Every ray of the grid is cast in one batch. Each curve starts from its two end rays, and an
+    interval between kept rays is split at its worst ray while any ray inside is off by more than
+    vertical_tolerance, so the error of every dropped ray is bounded. A ray is off by the vertical
+    distance of its terrain hit from the line between the hits at the interval ends, or the plan
+    distance of its base point from their chord times the slope gradient, whichever is larger.
+    """
+    curve, index = _grid_rays(divisions)
+    base, hits = _cast_slope_rays(bottom, top, divisions, curve, index, terrain)
+    kept = (index == 0) | (index == divisions[curve])
+    position = np.arange(len(curve))
+    while True:
+        inner = np.flatnonzero(~kept)
+        if not len(inner):
+            break
+        # Kept rays on both sides, always of the same curve as its end rays are kept
+        lo = np.maximum.accumulate(np.where(kept, position, 0))[inner]
+        hi = np.minimum.accumulate(np.where(kept, position, len(curve))[::-1])[::-1][inner]
+
+        frac = (inner - lo) / (hi - lo).astype(np.float64)
+        error = _interval_error(hits[lo, 2], hits[inner, 2], hits[hi, 2], frac)
+        chord = base[hi, :2] - base[lo, :2]
+        rel = base[inner, :2] - base[lo, :2]
+        chord_length = np.maximum(np.hypot(chord[:, 0], chord[:, 1]), 1e-12)
+        deviation = np.abs(chord[:, 0] * rel[:, 1] - chord[:, 1] * rel[:, 0]) / chord_length
+        error = np.fmax(error, deviation * slope[curve[inner]])
+        if not (error > vertical_tolerance).any():
+            break
+
+        # The worst ray of every interval that is off anywhere
+        order = np.lexsort((-error, lo))
+        worst = order[np.r_[True, lo[order][1:] != lo[order][:-1]]]
+        kept[inner[worst[error[worst] > vertical_tolerance]]] = True
+    return base, hits, curve, kept
+
+
+def _adaptive_segment_points(base, hits, spacing, terrain, vertical_tolerance):
+    """ Points of the fixed-spacing grid of each slope line where the terrain departs from the slope
+
+    Every grid point between the base point and the terrain hit is tested, a point the terrain passes
+    within vertical_tolerance of is dropped. Returns the points and the index of the line each one
+    lies on.
+    """
+    if not len(base):
+        return np.zeros((0, 3)), np.zeros(0, dtype=np.int64)
+    divisions = division_counts(np.linalg.norm(hits - base, axis=1), spacing)
+    line, index = _grid_rays(np.maximum(divisions - 2, -1))
+    t = ((index + 1) / divisions[line].astype(np.float64))[:, None]
+    points = base[line] + t * (hits[line] - base[line])
+    error = np.abs(terrain.heights(points[:, :2]) - points[:, 2])
+    off = np.nan_to_num(error) > vertical_tolerance
+    return points[off], line[off]
+
+
+def slope_loops(loop, angleExcavation, offset):
+    """ Bottom loop offset from the pad and top loop the slope lines run to
+
+    angleExcavation is one angle or a sequence with one angle per edge. Every top curve is its bottom
+    curve offset and raised by the closed-form slope extent of its own angle.
+    """
+    bottom = offset_loop(loop, offset)
+    extents = slope_offsets(edge_angles(angleExcavation, len(loop)))
+    top = offset_loop(bottom, [horizontal for horizontal, _ in extents])
+    return bottom, translate_loop(top, [vertical for _, vertical in extents])
+
+
+def slope_rays(bottom, top, divisions):
+    """ Base points and directions of the slope lines between the bottom and top loops """
+    base, _ = sample_loop(bottom, divisions=divisions)
+    tops, _ = sample_loop(top, divisions=divisions)
+    return base, tops - base
+
+
+def segment_points(base, hits, spacing):
+    """ Points every spacing along the lines from base points to their terrain hits
+
+    Returns the points and the index of the line each one lies on.
+    """
+    if not len(base):
+        return np.zeros((0, 3)), np.zeros(0, dtype=np.int64)
+    points, offsets = sample_loop([line_descriptor(p, q) for p, q in zip(base.tolist(), hits.tolist())], spacing)
+    return points, np.repeat(np.arange(len(base)), np.diff(offsets))
+
+
+def fixed_spacing_counts(base, hits, spacing, edge, count):
+    """ Points fixed spacing gives each of count edges before dedup, from the rays of their grid
+
+    Every ray gives its base point and, when it hits, its terrain hit and the division_counts + 1
+    points of its slope line, as segment_points samples it.
+    """
+    hit = ~np.isnan(hits[:, 0])
+    per_ray = np.ones(len(base), dtype=np.int64)
+    per_ray[hit] += 2 + division_counts(np.linalg.norm(hits[hit] - base[hit], axis=1), spacing)
+    return np.bincount(edge, weights=per_ray, minlength=count).astype(np.int64)
+
+
+def _edge_points(bottom, top, divisions, spacing, terrain, vertical_tolerance, slope, watch):
+    """ Terrain hits, base points and segment points of the slope lines, each followed by its edge indices
+
+    The last item is the fixed_spacing_counts of the edges, taken from the rays the adaptive sampling
+    casts anyway.
+    """
+    if vertical_tolerance is None:
+        base, directions = slope_rays(bottom, top, divisions)
+        base_edge = np.repeat(np.arange(len(bottom)), divisions + 1)
+        watch.lap("slope lines")
+        hits, _, _ = terrain.intersect(base, directions)
+        watch.lap("projection")
+        fixed = fixed_spacing_counts(base, hits, spacing, base_edge, len(bottom))
+    else:
+        base, hits, base_edge, kept = _adaptive_slope_rays(bottom, top, divisions, terrain, vertical_tolerance,
+                                                           slope)
+        fixed = fixed_spacing_counts(base, hits, spacing, base_edge, len(bottom))
+        base, hits, base_edge = base[kept], hits[kept], base_edge[kept]
+        watch.lap("adaptive slope lines")
+    hit = ~np.isnan(hits[:, 0])
+
+    # Points along each line from the base point to its terrain hit
+    if vertical_tolerance is None:
+        segments, line = segment_points(base[hit], hits[hit], spacing)
+    else:
+        segments, line = _adaptive_segment_points(base[hit], hits[hit], spacing, terrain, vertical_tolerance)
+    watch.lap("segments")
+    hit_edge = base_edge[hit]
+    return hits[hit], hit_edge, base, base_edge, segments, hit_edge[line], fixed
+
+
+def _split_by_edge(values, edge, count):
+    """ Splits values into count arrays, one per edge index """
+    order = np.argsort(edge, kind="stable")
+    return np.split(values[order], np.cumsum(np.bincount(edge, minlength=count))[:-1])
+
+
+def edge_keys(loop, angles, terrain, params):
+    """ Cache key of every edge of a loop
+
+    An edge's slope lines depend on the edge and its angle, the neighbours and angles that trim its
+    offset corners, the terrain and the excavation parameters, so the key covers exactly those.
+    """
+    count = len(loop)
+    return [fingerprint(loop[i - 1], loop[i], loop[(i + 1) % count], angles[i - 1], angles[i],
+                        angles[(i + 1) % count], terrain.fingerprint, params)
+            for i in range(count)]
+
+
+def _cached_edge_points(keys, bottom, top, divisions, spacing, terrain, vertical_tolerance, slope, cache, watch):
+    """ Per-edge results from the cache, computing and storing only the edges it does not hold yet """
+    entries = [cache.get(key) for key in keys]
+    missing = [i for i, entry in enumerate(entries) if entry is None or "fixed" not in entry]
+    watch.lap("cache lookup")
+    if missing:
+        start = clock()
+        sub = np.array(missing, dtype=np.int64)
+        hits, hit_edge, base, base_edge, segments, segment_edge, fixed = _edge_points(
+            [bottom[i] for i in missing], [top[i] for i in missing], divisions[sub], spacing, terrain,
+            vertical_tolerance, slope[sub], watch)
+        # Run time is shared out by ray count, it is what an edge saves on its next hit
+        rays = np.bincount(base_edge, minlength=len(missing))
+        seconds = (clock() - start) * rays / max(rays.sum(), 1)
+        parts = zip(_split_by_edge(hits, hit_edge, len(missing)), _split_by_edge(base, base_edge, len(missing)),
+                    _split_by_edge(segments, segment_edge, len(missing)))
+        for k, (edge_hits, edge_base, edge_segments) in enumerate(parts):
+            entry = {"hits": edge_hits, "base": edge_base, "segments": edge_segments, "fixed": int(fixed[k]),
+                     "seconds": float(seconds[k])}
+            cache.put(keys[missing[k]], entry)
+            entries[missing[k]] = entry
+    return tuple(np.concatenate([entry[name] for entry in entries]).reshape(-1, 3)
+                 for name in ("hits", "base", "segments")) + (sum(entry["fixed"] for entry in entries),)
+
+
+def _python_ray_error(base, hits, lo, i, hi, slope):
+    """ _adaptive_slope_rays error of ray i in the interval between the kept rays lo and hi """
+    z_lo, z_mid, z_hi = hits[lo][2], hits[i][2], hits[hi][2]
+    missing = (z_lo != z_lo) + (z_mid != z_mid) + (z_hi != z_hi)
+    if missing == 0:
+        error = abs(z_mid - (z_lo + float(i - lo) / (hi - lo) * (z_hi - z_lo)))
+    else:
+        error = 0.0 if missing == 3 else float("inf")
+    cx, cy = base[hi][0] - base[lo][0], base[hi][1] - base[lo][1]
+    rx, ry = base[i][0] - base[lo][0], base[i][1] - base[lo][1]
+    return max(error, abs(cx * ry - cy * rx) / max(math.hypot(cx, cy), 1e-12) * slope)
+
+
+def _python_adaptive_rays(base, hits, vertical_tolerance, slope):
+    """ Indices of the grid rays of one edge _adaptive_slope_rays keeps, splitting interval by interval """
+    kept = set((0, len(base) - 1))
+    intervals = [(0, len(base) - 1)]
+    while intervals:
+        lo, hi = intervals.pop()
+        worst, worst_error = None, vertical_tolerance
+        for i in range(lo + 1, hi):
+            error = _python_ray_error(base, hits, lo, i, hi, slope)
+            if error > worst_error:
+                worst, worst_error = i, error
+        if worst is not None:
+            kept.add(worst)
+            intervals.extend(((lo, worst), (worst, hi)))
+    return sorted(kept)
+
+
+def _python_adaptive_segment_points(base, hits, spacing, terrain, vertical_tolerance):
+    """ _adaptive_segment_points as a list of (x, y, z) tuples """
+    lengths = [math.sqrt(sum((h[k] - p[k]) ** 2 for k in range(3))) for p, h in zip(base, hits)]
+    points = []
+    for p, h, div in zip(base, hits, division_counts(lengths, spacing)):
+        for j in range(1, div):
+            t = float(j) / div
+            points.append((p[0] + t * (h[0] - p[0]), p[1] + t * (h[1] - p[1]), p[2] + t * (h[2] - p[2])))
+    heights = terrain.heights([(x, y) for x, y, _ in points])
+    return [p for p, z in zip(points, heights) if abs(z - p[2]) > vertical_tolerance]  # False for nan
+
+
+def _python_fixed_spacing_count(base, hits, spacing):
+    """ fixed_spacing_counts of the grid rays of one edge """
+    lengths = [math.sqrt(sum((h[k] - p[k]) ** 2 for k in range(3))) for p, h in zip(base, hits) if h[0] == h[0]]
+    return len(base) + sum(2 + div for div in division_counts(lengths, spacing))
+
+
+def _python_edge_points(bottom, top, division, spacing, terrain, vertical_tolerance, slope, watch):
+    """ _edge_points of one edge without NumPy
+
+    Returns the terrain hits, base points and segment points, and the fixed spacing point count.
+    """
+    t = [float(i) / max(division, 1) for i in range(division + 1)]
+    base = [curve_point(bottom, u) for u in t]
+    directions = [(q[0] - p[0], q[1] - p[1], q[2] - p[2]) for p, q in zip(base, [curve_point(top, u) for u in t])]
+    watch.lap("slope lines")
+    hits, _, _ = terrain.intersect(base, directions)
+    watch.lap("projection")
+    fixed = _python_fixed_spacing_count(base, hits, spacing)
+    if vertical_tolerance is not None:
+        kept = _python_adaptive_rays(base, hits, vertical_tolerance, slope)
+        base = [base[i] for i in kept]
+        hits = [hits[i] for i in kept]
+        watch.lap("adaptive slope lines")
+    hit = [i for i, p in enumerate(hits) if p[0] == p[0]]
+    hit_base = [base[i] for i in hit]
+    hits = [hits[i] for i in hit]
+    if vertical_tolerance is None:
+        segments, _ = sample_loop([line_descriptor(p, q) for p, q in zip(hit_base, hits)], spacing)
+    else:
+        segments = _python_adaptive_segment_points(hit_base, hits, spacing, terrain, vertical_tolerance)
+    watch.lap("segments")
+    return hits, base, segments, fixed
+
+
+def _python_points(keys, bottom, top, divisions, spacing, terrain, vertical_tolerance, slope, cache, watch):
+    """ Terrain hits, base points, segment points and fixed spacing point count of every edge
+
+    Goes through the cache when keys are given.
+    """
+    hits, base, segments = [], [], []
+    fixed = 0
+    for i in range(len(bottom)):
+        entry = cache.get(keys[i]) if keys is not None else None
+        if keys is not None:
+            watch.lap("cache lookup")
+        if entry is None or "fixed" not in entry:  # Entries cached before the count was kept are redone
+            start = clock()
+            parts = _python_edge_points(bottom[i], top[i], divisions[i], spacing, terrain, vertical_tolerance,
+                                        slope[i], watch)
+            entry = {"hits": parts[0], "base": parts[1], "segments": parts[2], "fixed": parts[3],
+                     "seconds": clock() - start}
+            if keys is not None:
+                cache.put(keys[i], entry)
+        hits.extend(entry["hits"])
+        base.extend(entry["base"])
+        segments.extend(entry["segments"])
+        fixed += entry["fixed"]
+    return hits, base, segments, fixed
+
+
+def pad_points(loop, angleExcavation, offset, spacing, terrain, tolerance=DEFAULT_TOLERANCE,
+               vertical_tolerance=None, stats=None, timings=None, cache=None):
+    """ New topography points of one pad, the plain-data counterpart of MyWindows.compute_points
+
+    loop is the pad boundary as curve descriptors and angleExcavation one angle or one angle per edge.
+    offset, spacing and vertical_tolerance are in the loop units and terrain is a TerrainBVH. Without
+    vertical_tolerance points are placed every spacing, with it spacing is the finest resolution and
+    points are only added where the surface needs them. With an EdgeCache only the edges whose
+    geometry, neighbours, terrain or parameters changed since they were cached are computed.
+    Returns unique points as an (n, 3) array, stats receives the point counts and timings the wall
+    time of every stage. The terrain hits and base points come first, stats["required points"] of
+    them, see merge_points. stats["fixed spacing points"] is what fixed spacing gives before dedup,
+    to compare with stats["points before dedup"], counted from the cast rays without a second run.
+    Without NumPy terrain is a TerrainTree, the points are a list of (x, y, z) tuples and the cache
+    holds lists.
+    """
+    watch = Stopwatch(timings)
+    bottom, top = slope_loops(loop, angleExcavation, offset)
+    watch.lap("offset")
+
+    # Slope lines join points of the bottom and top loops divided into the same number of parts
+    divisions = division_counts(curve_lengths(bottom), spacing)
+    angles = edge_angles(angleExcavation, len(loop))
+    keys = None
+    if cache is not None:
+        keys = edge_keys(loop, angles, terrain, (offset, spacing, vertical_tolerance, SLOPE_LENGTH))
+    if np is None:
+        slope = [math.tan(math.radians(a)) for a in angles]
+        hits, base, segments, fixed = _python_points(keys, bottom, top, divisions, spacing, terrain,
+                                                     vertical_tolerance, slope, cache, watch)
+        points = hits + base + segments
+    else:
+        slope = np.tan(np.radians(angles))
+        if cache is None:
+            hits, _, base, _, segments, _, fixed = _edge_points(bottom, top, divisions, spacing, terrain,
+                                                                vertical_tolerance, slope, watch)
+            fixed = int(fixed.sum())
+        else:
+            hits, base, segments, fixed = _cached_edge_points(keys, bottom, top, divisions, spacing, terrain,
+                                                              vertical_tolerance, slope, cache, watch)
+        points = np.concatenate((hits, base, segments))
+    raw_count = len(points)
+    kept = unique_indices(points if np is None else points.tolist(), tolerance)
+    points = [points[i] for i in kept] if np is None else points[np.array(kept, dtype=np.int64)]
+    watch.lap("dedup")
+
+    if stats is not None:
+        stats["points"] = len(points)
+        stats["required points"] = bisect_left(kept, len(hits) + len(base))
+        stats["points before dedup"] = raw_count
+        stats["fixed spacing points"] = fixed
+        stats["rays"] = len(base)
+        stats["hits"] = len(hits)
+    return points
+
+
+def _init_worker(terrain):
+    global _worker_terrain
+    _worker_terrain = terrain
+
+
+def _pad_job(job):
+    stats = {}
+    points = pad_points(job["loop"], job["angle"], job["offset"], job["spacing"], _worker_terrain,
+                        job.get("tolerance", DEFAULT_TOLERANCE), job.get("vertical_tolerance"), stats)
+    return points, stats
+
+
+def pool_interpreter():
+    """ Interpreter spawned pool workers would run, None when this process is not a Python interpreter
+
+    Spawned workers start sys.executable. In a host that embeds CPython, such as Revit, that is the
+    host application itself, so no pool is started there.
+    """
+    name = os.path.basename(sys.executable or "").lower()
+    return sys.executable if name.startswith("python") else None
+
+
+def _map_in_pool(jobs, terrain, processes):
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+    context = multiprocessing.get_context("spawn")
+    context.set_executable(pool_interpreter())
+    with ProcessPoolExecutor(processes, mp_context=context, initializer=_init_worker, initargs=(terrain,)) as pool:
+        return list(pool.map(_pad_job, jobs))
+
+
+def batch_pad_points(jobs, terrain, processes=None, tolerance=DEFAULT_TOLERANCE, stats=None):
+    """ Computes pads in a process pool, returns merged unique points and the point count of each pad
+
+    Every job is a dict with loop, angle, offset, spacing and optionally tolerance and
+    vertical_tolerance, see pad_points. The required points of all pads come first, stats receives
+    their count as "required points" and the "points before dedup" and "fixed spacing points" of
+    all pads.
+    The pool is only used under a standalone Python interpreter, e.g. the benchmarks. Embedded in a
+    host application, or when no process pool can be started, the pads are computed one by one.
+    """
+    results = None
+    if processes != 1 and len(jobs) > 1 and pool_interpreter() is not None:
+        try:
+            results = _map_in_pool(jobs, terrain, processes)
+        except (ImportError, OSError, RuntimeError, NotImplementedError):
+            results = None  # No usable process pool in this host
+    if results is None:
+        _init_worker(terrain)
+        results = [_pad_job(job) for job in jobs]
+    if stats is not None:
+        stats["required points"] = 0
+        for name in ("points before dedup", "fixed spacing points"):
+            stats[name] = sum(pad[name] for _, pad in results)
+    if not results:
+        return ([] if np is None else np.zeros((0, 3))), []
+    required = [pad["required points"] for _, pad in results]
+    parts = ([points[:n] for (points, _), n in zip(results, required)] +
+             [points[n:] for (points, _), n in zip(results, required)])
+    if np is None:
+        merged = [p for part in parts for p in part]
+        kept = unique_indices(merged, tolerance)
+        unique = [merged[i] for i in kept]
+    else:
+        merged = np.concatenate(parts)
+        kept = unique_indices(merged.tolist(), tolerance)
+        unique = merged[np.array(kept, dtype=np.int64)]
+    if stats is not None:
+        stats["required points"] = bisect_left(kept, sum(required))
+    return unique, [len(points) for points, _ in results]
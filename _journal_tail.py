@@ -0,0 +1,194 @@
+# dependencies
+import hashlib
+import json
+import mmap
+import os
+import re
+import time
+from datetime import datetime
+
+from _common import write_file
+
+# Journal lines marking the start and the end of a sync with central, see benchmarks/journals
+SYNC_START = b"ID_FILE_SAVE_TO_MASTER"  # Jrn.Command of both synchronize buttons
+SYNC_END = b"<STC"
+# Timestamp comment written before journal entries, e.g. 'C 27-Feb-2023 10:15:32.123;
+TIMESTAMP = re.compile(br"'[A-Z] (\d{2}-[A-Za-z]{3}-\d{4} \d{2}:\d{2}:\d{2}\.\d{3});")
+TIMESTAMP_FORMAT = "%d-%b-%Y %H:%M:%S.%f"
+LOOKBACK = 1 << 20  # Bytes searched back from an event for its timestamp
+KEEP = 10000  # Durations kept for the percentiles
+HEAD = 4096  # Leading bytes that tell a journal apart from a new one written under the same name
+STATE_DAYS = 30  # States of journals not read for this many days are removed
+
+
+def parse_timestamp(text):
+    return datetime.strptime(text, TIMESTAMP_FORMAT)
+
+
+def percentile(ordered, fraction):
+    """ Nearest-rank percentile of sorted values """
+    if not ordered:
+        return 0.0
+    rank = max(1, int(-(-fraction * len(ordered) // 1)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _positions(mm, marker, start, end):
+    position = mm.find(marker, start, end)
+    while position >= 0:
+        yield position
+        position = mm.find(marker, position + len(marker), end)
+
+
+def _timestamp_before(mm, position):
+    """ Text of the last timestamp written at or before position, None when there is none close by """
+    first = max(0, position - LOOKBACK)
+    line = position
+    while line > first:
+        line = mm.rfind(b"\n'", first, line)
+        if line < 0:
+            break
+        match = TIMESTAMP.match(mm, line + 1)
+        if match:
+            return match.group(1).decode("ascii")
+    match = TIMESTAMP.match(mm, first)
+    return match.group(1).decode("ascii") if match else None
+
+
+def _head_hash(mm, size):
+    return hashlib.sha1(mm[:size]).hexdigest()
+
+
+class JournalTail(object):
+    """ Sync with central durations of one journal, read incrementally from the last byte offset
+
+    Only complete lines after the offset are mapped and searched, so every update reads the bytes the
+    journal gained since the previous one. A sync whose end is not written yet stays open until then,
+    a sync started again before it ended, e.g. after a cancelled dialog, is timed from the last start.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.head = None  # Hash of the first head_size bytes, a different hash means a new journal
+        self.head_size = 0
+        self.open_start = None  # Timestamp of a sync that has not ended yet
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.durations = []  # Latest KEEP durations in seconds
+        self.bytes_read = 0  # Bytes searched by the last update
+
+    def update(self):
+        """ Reads the new part of the journal, returns the number of syncs that ended in it """
+        self.bytes_read = 0
+        if not os.path.exists(self.path):
+            return 0
+        size = os.path.getsize(self.path)
+        if size < self.offset:  # Journal was replaced, start over
+            self.__init__(self.path)
+        if size == self.offset:
+            return 0
+        with open(self.path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                if self.offset and _head_hash(mm, self.head_size) != self.head:  # Replaced and grown past it
+                    self.__init__(self.path)
+                end = mm.rfind(b"\n", self.offset, size) + 1
+                if end <= self.offset:  # No complete line yet
+                    return 0
+                events = sorted([(p, True) for p in _positions(mm, SYNC_START, self.offset, end)] +
+                                [(p, False) for p in _positions(mm, SYNC_END, self.offset, end)])
+                ended = 0
+                for position, is_start in events:
+                    stamp = _timestamp_before(mm, position)
+                    if stamp is None:
+                        continue
+                    if is_start:
+                        self.open_start = stamp
+                    elif self.open_start is not None:
+                        self.add((parse_timestamp(stamp) - parse_timestamp(self.open_start)).total_seconds())
+                        self.open_start = None
+                        ended += 1
+                if self.head_size < HEAD:
+                    self.head_size = min(end, HEAD)
+                    self.head = _head_hash(mm, self.head_size)
+                self.bytes_read = end - self.offset
+                self.offset = end
+            finally:
+                mm.close()
+        return ended
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+        self.durations.append(seconds)
+        del self.durations[:-KEEP]
+
+    def stats(self):
+        ordered = sorted(self.durations)
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": percentile(ordered, 0.5),
+            "p95": percentile(ordered, 0.95),
+            "max": self.maximum
+        }
+
+    def to_dict(self):
+        return dict((k, getattr(self, k)) for k in ("path", "offset", "head", "head_size", "open_start", "count",
+                                                     "total", "maximum", "durations"))
+
+    @classmethod
+    def from_dict(cls, state):
+        tail = cls(state["path"])
+        for k, v in state.items():
+            setattr(tail, k, v)
+        return tail
+
+
+def state_path(journal_path, state_folder):
+    """ State file of one journal, every Revit session records its own journal and keeps its own offset """
+    key = hashlib.sha1(os.path.normcase(os.path.abspath(journal_path)).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(state_folder, "{}.{}.json".format(os.path.basename(journal_path), key))
+
+
+def load_tail(journal_path, state_folder):
+    """ Tail of journal_path, continuing from the state saved for it """
+    try:
+        with open(state_path(journal_path, state_folder)) as f:
+            state = json.load(f)
+        if state.get("path") == journal_path:
+            return JournalTail.from_dict(state)
+    except (IOError, OSError, ValueError, KeyError):  # No state yet or interrupted while saving
+        pass
+    return JournalTail(journal_path)
+
+
+def save_tail(tail, state_folder):
+    write_file(state_path(tail.path, state_folder), json.dumps(tail.to_dict()))
+
+
+def prune_states(state_folder, days=STATE_DAYS):
+    """ Removes the states of journals not read for days, Revit keeps writing new journals """
+    oldest = time.time() - days * 86400
+    for name in os.listdir(state_folder):
+        path = os.path.join(state_folder, name)
+        try:
+            if os.path.getmtime(path) < oldest:
+                os.remove(path)
+        except OSError:  # Removed or saved by another session meanwhile
+            pass
+
+
+def sync_statistics(journal_path, state_folder):
+    """ Running sync with central statistics of a journal, reading only what was written since the last call
+
+    Documents of one session share its journal and its state, so each of them continues from the offset
+    the other left instead of starting the journal over.
+    """
+    tail = load_tail(journal_path, state_folder)
+    tail.update()
+    save_tail(tail, state_folder)
+    prune_states(state_folder)
+    return tail.stats()
@@ -0,0 +1,87 @@
+# dependencies
+import json
+from datetime import date
+
+from _common import clock, write_file
+
+EVERY_SYNC = "sync"
+DAILY = "daily"
+DEFER_LIMIT = 5  # A due collector deferred this many syncs in a row runs whatever the budget
+
+
+def is_due(tier, state, today):
+    """ True when a collector of tier, last run as recorded in state, should run again """
+    if not state or "values" not in state:
+        return True
+    if tier == EVERY_SYNC:
+        return True
+    if tier == DAILY:
+        return state.get("day") != today
+    return state.get("syncs since run", 0) + 1 >= int(tier)
+
+
+class MetricScheduler(object):
+    """ Runs metric collectors by tier within a time budget, reusing the last values of the others
+
+    Collectors of the every sync tier, and collectors that never ran, always run. Other due collectors
+    run while the time spent plus their last duration fits the budget, otherwise they are deferred.
+    """
+    def __init__(self, state_path, key, budget):
+        self.state_path = state_path
+        self.key = key
+        self.budget = budget
+        self.timings = {}  # name -> seconds, for collectors run on this sync
+        self.stale = []  # names of collectors whose values come from an earlier sync
+        self.deferred = []  # names of due collectors pushed back by the budget
+        self._all = self._load()
+        self._states = self._all.setdefault(key, {})
+
+    def _load(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):  # No state yet or interrupted while saving
+            return {}
+
+    def save(self):
+        write_file(self.state_path, json.dumps(self._all))
+
+    def run(self, collectors, spent=0.0):
+        """ Merged values of collectors given as (name, tier, function), spent is the time used before """
+        today = date.today().isoformat()
+        start = clock() - spent
+        order = sorted(collectors, key=lambda c: c[1] != EVERY_SYNC)  # Every sync tier first, stable otherwise
+        results = {}
+        for name, tier, collect in order:
+            state = self._states.setdefault(name, {})
+            if not is_due(tier, state, today):
+                state["syncs since run"] = state.get("syncs since run", 0) + 1
+                self.stale.append(name)
+                continue
+            required = tier == EVERY_SYNC or "values" not in state or state.get("deferred", 0) >= DEFER_LIMIT
+            if not required and clock() - start + state.get("seconds", 0.0) > self.budget:
+                state["syncs since run"] = state.get("syncs since run", 0) + 1
+                state["deferred"] = state.get("deferred", 0) + 1
+                self.stale.append(name)
+                self.deferred.append(name)
+                continue
+            begin = clock()
+            state["values"] = collect()
+            self.timings[name] = state["seconds"] = clock() - begin
+            state["day"] = today
+            state["syncs since run"] = 0
+            state["deferred"] = 0
+        for name, _, _ in collectors:
+            results.update(self._states[name]["values"])
+        self.total = clock() - start
+        return results
+
+    def payload_fields(self, collectors):
+        """ Stale collector names and timings in milliseconds, as flat payload columns """
+        fields = {
+            "Stale metrics": ", ".join(self.stale),
+            "Health check ms": int(round(1000 * self.total))
+        }
+        for name, _, _ in collectors:
+            fields["{} ms".format(name)] = int(round(1000 * self.timings.get(name, 0.0)))
+        return fields
@@ -0,0 +1,172 @@
+# dependencies
+import os
+import sqlite3
+import time
+
+DAY = 86400.0
+
+_full_rows = set()  # Projects whose full row was uploaded in this session
+
+
+class MetricStore(object):
+    """ Local time series of health metrics per project in SQLite, keeping a sample only when a value changes
+
+    Project and metric names are stored once and referenced by integer ids. Samples are clustered by
+    project, metric and time, so the series of one metric is a single index range scan. The current
+    table holds the last stored values, the latest table the last values the server accepted.
+    """
+    def __init__(self, path):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+        self.db = sqlite3.connect(path, timeout=10.0, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(
+            "CREATE TABLE IF NOT EXISTS projects (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);"
+            "CREATE TABLE IF NOT EXISTS metrics (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);"
+            "CREATE TABLE IF NOT EXISTS syncs (project INTEGER NOT NULL, time REAL NOT NULL, changed INTEGER NOT NULL,"
+            " PRIMARY KEY (project, time)) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS samples (project INTEGER NOT NULL, metric INTEGER NOT NULL, time REAL NOT NULL,"
+            " value REAL, text TEXT, PRIMARY KEY (project, metric, time)) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS current (project INTEGER NOT NULL, metric INTEGER NOT NULL, time REAL NOT NULL,"
+            " value REAL, text TEXT, PRIMARY KEY (project, metric)) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS latest (project INTEGER NOT NULL, metric INTEGER NOT NULL, time REAL NOT NULL,"
+            " value REAL, text TEXT, PRIMARY KEY (project, metric)) WITHOUT ROWID;")
+        self._projects = dict(self.db.execute("SELECT name, id FROM projects"))
+        self._metrics = dict(self.db.execute("SELECT name, id FROM metrics"))
+        self._names = dict((i, name) for name, i in self._metrics.items())
+
+    def close(self):
+        self.db.close()
+
+    def _code(self, table, codes, name):
+        code = codes.get(name)
+        if code is None:
+            code = self.db.execute("INSERT INTO {} (name) VALUES (?)".format(table), (name,)).lastrowid
+            codes[name] = code
+        return code
+
+    def project_id(self, name):
+        return self._code("projects", self._projects, name)
+
+    def metric_id(self, name):
+        code = self._code("metrics", self._metrics, name)
+        self._names[code] = name
+        return code
+
+    def _values(self, table, project):
+        project_id = self._projects.get(project)
+        if project_id is None:
+            return {}
+        rows = self.db.execute("SELECT metric, value, text FROM {} WHERE project = ?".format(table), (project_id,))
+        return dict((self._names[m], t if v is None else v) for m, v, t in rows)
+
+    def _records(self, project_id, values, moment):
+        records = []
+        for name, value in values.items():
+            number = value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+            text = None if number is not None else (None if value is None else str(value))
+            records.append((project_id, self.metric_id(name), moment, number, text))
+        return records
+
+    def current(self, project):
+        """ Last stored value of every metric of project """
+        return self._values("current", project)
+
+    def latest(self, project):
+        """ Last value of every metric of project the server accepted """
+        return self._values("latest", project)
+
+    def record(self, project, row, moment=None):
+        """ Stores the metrics of one sync, returns the metrics whose value differs from the last accepted one """
+        moment = time.time() if moment is None else moment
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            project_id = self.project_id(project)
+            previous = self.current(project)
+            records = self._records(project_id, dict((k, v) for k, v in row.items()
+                                                     if k not in previous or previous[k] != v), moment)
+            self.db.executemany("INSERT OR REPLACE INTO samples VALUES (?, ?, ?, ?, ?)", records)
+            self.db.executemany("INSERT OR REPLACE INTO current VALUES (?, ?, ?, ?, ?)", records)
+            self.db.execute("INSERT OR REPLACE INTO syncs VALUES (?, ?, ?)", (project_id, moment, len(records)))
+            self.db.execute("COMMIT")
+        except Exception:
+            self.db.execute("ROLLBACK")
+            raise
+        accepted = self.latest(project)
+        return dict((k, v) for k, v in row.items() if k not in accepted or accepted[k] != v)
+
+    def accept(self, project, row, moment):
+        """ Moves the upload baseline to a row the server accepted, metrics of a later accepted row are kept """
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            project_id = self.project_id(project)
+            later = set(m for m, in self.db.execute("SELECT metric FROM latest WHERE project = ? AND time > ?",
+                                                    (project_id, moment)))
+            records = [r for r in self._records(project_id, row, moment) if r[1] not in later]
+            self.db.executemany("INSERT OR REPLACE INTO latest VALUES (?, ?, ?, ?, ?)", records)
+            self.db.execute("COMMIT")
+        except Exception:
+            self.db.execute("ROLLBACK")
+            raise
+
+    def series(self, project, metric, since=None, until=None):
+        """ (time, value) of every change of a metric between since and until, in time order """
+        project_id, metric_id = self._projects.get(project), self._metrics.get(metric)
+        if project_id is None or metric_id is None:
+            return []
+        rows = self.db.execute("SELECT time, value, text FROM samples WHERE project = ? AND metric = ? "
+                               "AND time >= ? AND time <= ? ORDER BY time",
+                               (project_id, metric_id, -1.0 if since is None else since,
+                                float("inf") if until is None else until))
+        return [(t, x if v is None else v) for t, v, x in rows]
+
+    def trend(self, project, metric, days=30, now=None):
+        """ Summary of a numeric metric over the last days, e.g. the sync time trend of a model """
+        now = time.time() if now is None else now
+        points = [(t, v) for t, v in self.series(project, metric, now - days * DAY, now) if v is not None]
+        if not points:
+            return {"count": 0, "first": None, "last": None, "mean": None, "min": None, "max": None, "per day": None}
+        values = [v for _, v in points]
+        return {
+            "count": len(points),
+            "first": values[0],
+            "last": values[-1],
+            "mean": float(sum(values)) / len(values),
+            "min": min(values),
+            "max": max(values),
+            "per day": _slope(points) * DAY
+        }
+
+
+def _slope(points):
+    """ Least squares slope of (time, value) points per second """
+    if len(points) < 2:
+        return 0.0
+    n = float(len(points))
+    mean_t = sum(t for t, _ in points) / n
+    mean_v = sum(v for _, v in points) / n
+    var = sum((t - mean_t) ** 2 for t, _ in points)
+    if var == 0:
+        return 0.0
+    return sum((t - mean_t) * (v - mean_v) for t, v in points) / var
+
+
+def delta_row(changed, row, keys):
+    """ Upload row with the changed metrics and the identifying keys of the sync """
+    delta = dict((k, row[k]) for k in keys if k in row)
+    delta.update(changed)
+    return delta
+
+
+def upload_row(project, changed, row, keys):
+    """ The full row on the first upload of project in this session, the delta row after that
+
+    Other users of a workshared model upload in between, so a metric that went back to the value this
+    workstation sent last would otherwise never be sent again.
+    """
+    if project not in _full_rows:
+        _full_rows.add(project)
+        return dict(row)
+    return delta_row(changed, row, keys)
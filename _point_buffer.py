@@ -0,0 +1,127 @@
+# dependencies
+from array import array
+
+from _point_set import CELL_FACTOR, DEFAULT_TOLERANCE, PointSet, unique_indices
+
+
+def unique_rows(values, tolerance=DEFAULT_TOLERANCE):
+    """ unique_indices of an (n, 3) NumPy array, with only near-duplicate candidates going through PointSet
+
+    Two points within tolerance share a cell in at least one of eight grids shifted by half a cell
+    along each axis. Points alone in their cell of every grid have no neighbour within tolerance, so
+    they are kept without entering the point set and cannot remove any other point.
+    """
+    import numpy as np
+    cell = tolerance * CELL_FACTOR
+    candidate = np.zeros(len(values), dtype=bool)
+    for shift in range(8):
+        offset = np.array([(shift >> axis) & 1 for axis in range(3)]) * cell / 2
+        keys = np.floor((values + offset) / cell).astype(np.int64)
+        order = np.lexsort(keys.T)
+        same = np.flatnonzero((keys[order[1:]] == keys[order[:-1]]).all(axis=1))
+        candidate[order[same]] = True
+        candidate[order[same + 1]] = True
+    keep = ~candidate
+    point_set = PointSet(tolerance)
+    for i in np.flatnonzero(candidate).tolist():
+        keep[i] = point_set.add(*values[i].tolist())
+    return np.flatnonzero(keep)
+
+
+class PointBuffer(object):
+    """ Points as three contiguous float64 columns, so stages pass one object instead of lists of XYZ
+
+    Only the standard array module is needed, NumPy code reads the columns in place through
+    columns(). XYZ objects are made by to_xyz, where the Revit API needs them.
+    """
+    __slots__ = ("x", "y", "z")
+
+    def __init__(self, x=None, y=None, z=None):
+        self.x = array("d") if x is None else x
+        self.y = array("d") if y is None else y
+        self.z = array("d") if z is None else z
+
+    @classmethod
+    def from_xyz(cls, points):
+        """ Buffer of Revit XYZ or any objects with X, Y and Z """
+        buffer = cls()
+        buffer.extend_xyz(points)
+        return buffer
+
+    @classmethod
+    def from_coords(cls, coords):
+        """ Buffer of (x, y, z) tuples """
+        buffer = cls()
+        for x, y, z in coords:
+            buffer.append(x, y, z)
+        return buffer
+
+    @classmethod
+    def from_numpy(cls, values):
+        """ Buffer of an (n, 3) array, each column is copied once into contiguous storage """
+        import numpy as np
+        values = np.asarray(values, dtype=np.float64).reshape(-1, 3)
+        return cls(*[array("d", np.ascontiguousarray(values[:, k]).tobytes()) for k in range(3)])
+
+    def __len__(self):
+        return len(self.x)
+
+    def __iter__(self):
+        x, y, z = self.x, self.y, self.z
+        for i in range(len(x)):
+            yield x[i], y[i], z[i]
+
+    def __getitem__(self, key):
+        """ A slice gives a new buffer, an index gives an (x, y, z) tuple """
+        if isinstance(key, slice):
+            return PointBuffer(self.x[key], self.y[key], self.z[key])
+        return self.x[key], self.y[key], self.z[key]
+
+    @property
+    def nbytes(self):
+        return 3 * len(self.x) * self.x.itemsize
+
+    def append(self, x, y, z):
+        self.x.append(x)
+        self.y.append(y)
+        self.z.append(z)
+
+    def extend(self, other):
+        """ Appends all points of another buffer """
+        self.x.extend(other.x)
+        self.y.extend(other.y)
+        self.z.extend(other.z)
+
+    def extend_xyz(self, points):
+        for p in points:
+            self.append(p.X, p.Y, p.Z)
+
+    def take(self, indices):
+        """ New buffer with the points at indices, in that order """
+        x, y, z = self.x, self.y, self.z
+        return PointBuffer(array("d", [x[i] for i in indices]), array("d", [y[i] for i in indices]),
+                           array("d", [z[i] for i in indices]))
+
+    def unique(self, tolerance=DEFAULT_TOLERANCE):
+        """ New buffer without duplicates, keeping the first occurrence and input order """
+        try:
+            indices = unique_rows(self.numpy(), tolerance).tolist()
+        except ImportError:  # NumPy is not available
+            indices = unique_indices(self, tolerance)
+        return self.take(indices)
+
+    def columns(self):
+        """ The three columns as NumPy arrays sharing this buffer's memory """
+        import numpy as np
+        return np.frombuffer(self.x), np.frombuffer(self.y), np.frombuffer(self.z)
+
+    def numpy(self):
+        """ Points as a new (n, 3) NumPy array """
+        import numpy as np
+        if not len(self):
+            return np.zeros((0, 3))
+        return np.column_stack(self.columns())
+
+    def to_xyz(self, factory):
+        """ Points made by factory(x, y, z), e.g. XYZ at the AddPoints boundary """
+        return [factory(x, y, z) for x, y, z in self]
@@ -0,0 +1,93 @@
+# dependencies
+import math
+
+DEFAULT_TOLERANCE = 1.0e-9  # Same tolerance as XYZ.IsAlmostEqualTo
+CELL_FACTOR = 4.0  # Cell size in tolerances, a point then touches ~3 cells on average
+
+
+def _xyz(point):
+    """ Returns coordinates of a Revit XYZ or any object with X, Y and Z """
+    return point.X, point.Y, point.Z
+
+
+class PointSet(object):
+    """ Tolerance-aware point set backed by a spatial hash of cubic cells """
+    def __init__(self, tolerance=DEFAULT_TOLERANCE):
+        if tolerance <= 0:
+            raise ValueError("Tolerance must be greater than zero")
+        self.tolerance = tolerance
+        self._tol2 = tolerance * tolerance
+        self._inv_cell = 1.0 / (tolerance * CELL_FACTOR)
+        self._cells = {}
+        self._coords = []
+
+    def __len__(self):
+        return len(self._coords)
+
+    def __iter__(self):
+        return iter(self._coords)
+
+    def __contains__(self, coord):
+        return self.find(coord[0], coord[1], coord[2]) is not None
+
+    def _cell_range(self, value):
+        """ Returns the first and last cell index touched by value +- tolerance """
+        return (int(math.floor((value - self.tolerance) * self._inv_cell)),
+                int(math.floor((value + self.tolerance) * self._inv_cell)))
+
+    def find(self, x, y, z):
+        """ Returns index of a stored point within tolerance of x, y, z or None """
+        cells = self._cells
+        coords = self._coords
+        tol2 = self._tol2
+        i0, i1 = self._cell_range(x)
+        j0, j1 = self._cell_range(y)
+        k0, k1 = self._cell_range(z)
+        # Points near a cell boundary are checked against every cell the tolerance sphere touches
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                for k in range(k0, k1 + 1):
+                    bucket = cells.get((i, j, k))
+                    if bucket is None:
+                        continue
+                    for index in bucket:
+                        px, py, pz = coords[index]
+                        dx = px - x
+                        dy = py - y
+                        dz = pz - z
+                        if dx * dx + dy * dy + dz * dz <= tol2:
+                            return index
+        return None
+
+    def add(self, x, y, z):
+        """ Adds a point unless an equal one is stored, returns True if it was added """
+        if self.find(x, y, z) is not None:
+            return False
+        index = len(self._coords)
+        self._coords.append((x, y, z))
+        key = (int(math.floor(x * self._inv_cell)),
+               int(math.floor(y * self._inv_cell)),
+               int(math.floor(z * self._inv_cell)))
+        bucket = self._cells.get(key)
+        if bucket is None:
+            self._cells[key] = [index]
+        else:
+            bucket.append(index)
+        return True
+
+
+def unique_indices(coords, tolerance=DEFAULT_TOLERANCE):
+    """ Returns indices of the first occurrence of every distinct (x, y, z) in coords """
+    point_set = PointSet(tolerance)
+    return [i for i, (x, y, z) in enumerate(coords) if point_set.add(x, y, z)]
+
+
+def unique_points(points, tolerance=DEFAULT_TOLERANCE, coords=_xyz):
+    """ Returns points without duplicates, keeping the first occurrence and input order """
+    point_set = PointSet(tolerance)
+    result = []
+    for pnt in points:
+        x, y, z = coords(pnt)
+        if point_set.add(x, y, z):
+            result.append(pnt)
+    return result
@@ -0,0 +1,57 @@
+# dependencies
+from _doc_cache import document_cache, revit_document_version
+
+PURGE_GUID = "e8c63650-70b7-435a-9010-ec97660c1bda"  # PerformanceAdviser rule listing purgeable elements
+
+_rule_ids = []  # The purge rule id list, resolved once per session
+_schedules = {}  # Document -> purge schedule state
+
+
+def purge_rule_ids():
+    """ Generic list holding the purge rule id, as required by ExecuteRules """
+    if not _rule_ids:
+        from Autodesk.Revit.DB import PerformanceAdviser, PerformanceAdviserRuleId
+        from System.Collections.Generic import List
+        rule_id_list = List[PerformanceAdviserRuleId]()
+        for rule_id in PerformanceAdviser.GetPerformanceAdviser().GetAllRuleIds():
+            if str(rule_id.Guid) == PURGE_GUID:
+                rule_id_list.Add(rule_id)
+                break
+        _rule_ids.append(rule_id_list)
+    return _rule_ids[0]
+
+
+def run_purge_rule(doc):
+    """ Ids of purgeable elements, None when the rule reports nothing """
+    from Autodesk.Revit.DB import PerformanceAdviser
+    failure_messages = PerformanceAdviser.GetPerformanceAdviser().ExecuteRules(doc, purge_rule_ids())
+    if len(failure_messages) > 0:
+        return list(failure_messages[0].GetFailingElements())
+    return None
+
+
+def purge_schedule(doc):
+    """ Syncs seen, purge runs and the last result for doc """
+    return _schedules.setdefault(doc, {"syncs": 0, "runs": 0, "ids": None, "syncs since run": 0})
+
+
+def purgeable_elements(doc, every=1):
+    """ Purgeable element ids, analysed at most once per document version and only on every n-th one
+
+    Versions in between return the result of the last analysis, which is None before the first one.
+    """
+    schedule = purge_schedule(doc)
+
+    def analyse(document):
+        if schedule["syncs"] % max(1, int(every)) == 0:
+            schedule["ids"] = run_purge_rule(document)
+            schedule["runs"] += 1
+            schedule["syncs since run"] = 0
+        else:
+            schedule["syncs since run"] += 1
+        schedule["syncs"] += 1
+        return schedule["ids"]
+
+    cache = document_cache(doc, revit_document_version)
+    cache.watch(doc.Application)  # Edits also start a new analysis where Revit has no document versions
+    return cache.get(("purge",), analyse)
@@ -0,0 +1,142 @@
+# dependencies
+import json
+import os
+import time
+
+from _common import clock, write_file
+
+MAX_RECORDS = 200  # Runs kept in the rolling log
+PROFILE_LINES = 30  # Functions listed from a cProfile capture
+
+_active = None  # RunProfile of the run in progress
+
+
+class RunProfile(object):
+    """ Wall time and call count of every stage, and item counts, of one run """
+    def __init__(self, context=None):
+        self.context = dict(context or {})
+        self.stages = {}
+        self.items = {}
+        self.timings = {}
+        self.error = None
+        self.profile = None
+        self.profile_error = None
+        self._started = time.time()
+        self._start = clock()
+
+    def add(self, stage, seconds, calls=1):
+        entry = self.stages.setdefault(stage, {"seconds": 0.0, "calls": 0})
+        entry["seconds"] += seconds
+        entry["calls"] += calls
+
+    def count(self, name, value):
+        self.items[name] = self.items.get(name, 0) + int(value)
+
+    def record(self):
+        """ JSON-ready summary of the run """
+        return {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self._started)),
+            "seconds": clock() - self._start,
+            "context": self.context,
+            "stages": self.stages,
+            "items": self.items,
+            "timings": self.timings,
+            "slowest stage": max(self.stages, key=lambda s: self.stages[s]["seconds"]) if self.stages else None,
+            "error": self.error,
+            "profile": self.profile,
+            "profile error": self.profile_error
+        }
+
+
+def stage(name):
+    """ Decorator recording every call of a function as stage name of the run in progress """
+    def decorate(func):
+        def timed(*args, **kwargs):
+            if _active is None:
+                return func(*args, **kwargs)
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _active.add(name, clock() - start)
+        timed.__name__ = func.__name__
+        timed.__doc__ = func.__doc__
+        return timed
+    return decorate
+
+
+def count(name, value):
+    """ Adds value to item count name of the run in progress """
+    if _active is not None:
+        _active.count(name, value)
+
+
+def record_timings(timings):
+    """ Stores the stage timings a run reports itself, e.g. those of the geometry core """
+    if _active is not None:
+        _active.timings.update(timings)
+
+
+def read_records(path):
+    """ Records of the rolling log, oldest first """
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_record(path, record, max_records=MAX_RECORDS):
+    """ Appends one JSON record per line, dropping the oldest beyond max_records """
+    lines = []
+    if os.path.exists(path):
+        with open(path) as f:
+            lines = [line.rstrip("\n") for line in f if line.strip()]
+    lines.append(json.dumps(record, sort_keys=True))
+    write_file(path, "\n".join(lines[-max_records:]) + "\n")
+
+
+def _profiler():
+    try:
+        import cProfile
+    except ImportError:  # IronPython has no cProfile, the run is still timed per stage
+        return None
+    return cProfile.Profile()
+
+
+def _write_profile(profiler, path):
+    """ Saves the raw cProfile data and the text of the most expensive functions next to it """
+    import pstats
+    profiler.dump_stats(path)
+    with open(path + ".txt", "w") as f:
+        pstats.Stats(path, stream=f).sort_stats("cumulative").print_stats(PROFILE_LINES)
+
+
+def profile_run(func, log_path, context=None, profile_path=None, max_records=MAX_RECORDS):
+    """ Runs func() while recording its stages, and appends the record to the rolling log at log_path
+
+    With profile_path the run is also captured with cProfile where the interpreter provides it,
+    otherwise the record says why there is no capture in "profile error". A failing run is logged with its error before the error is raised again. Returns the result of
+    func and the record.
+    """
+    global _active
+    run = RunProfile(context)
+    profiler = _profiler() if profile_path else None
+    if profile_path and profiler is None:
+        run.profile_error = "cProfile is not available in this interpreter"
+    _active = run
+    try:
+        if profiler is None:
+            result = func()
+        else:
+            result = profiler.runcall(func)
+    except Exception as e:
+        run.error = "{}: {}".format(type(e).__name__, e)
+        raise
+    finally:
+        _active = None
+        if profiler is not None:
+            _write_profile(profiler, profile_path)
+            run.profile = profile_path
+        record = run.record()
+        append_record(log_path, record, max_records)
+    return result, record
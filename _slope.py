@@ -0,0 +1,41 @@
+# dependencies
+import math
+
+SLOPE_LENGTH = 10.0  # Length of the helper line the slope direction is taken from, in feet
+
+
+def slope_offset(angleExcavation, length=SLOPE_LENGTH):
+    """ Horizontal and vertical extent of a slope line of length rising at angleExcavation
+
+    Only the direction matters, the slope rays run on until they meet the terrain.
+    """
+    angle = math.radians(angleExcavation)
+    return length * math.cos(angle), length * math.sin(angle)
+
+
+def per_edge(value, count, name="values"):
+    """ One float per edge from a single value or a sequence of per-edge values """
+    if not hasattr(value, "__iter__"):
+        return [float(value)] * count
+    values = [float(v) for v in value]
+    if len(values) != count:
+        raise ValueError("Expected {} {}, one per edge, got {}".format(count, name, len(values)))
+    return values
+
+
+def edge_angles(angleExcavation, count):
+    """ One excavation angle per edge from a single angle or a sequence of per-edge angles """
+    return per_edge(angleExcavation, count, "excavation angles")
+
+
+def slope_offsets(angles, length=SLOPE_LENGTH):
+    """ Horizontal and vertical slope extent of every edge of a pad """
+    return [slope_offset(angle, length) for angle in angles]
+
+
+def parse_angles(text):
+    """ A single angle, or per-edge angles separated by ; or , from a dialog field """
+    values = [v for v in text.replace(",", ";").split(";") if v.strip()]
+    if len(values) == 1:
+        return int(values[0]) if values[0].strip().lstrip("-").isdigit() else float(values[0])
+    return [float(v) for v in values]
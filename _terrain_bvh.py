@@ -0,0 +1,347 @@
+# dependencies
+import hashlib
+import math
+import struct
+
+try:
+    import numpy as np
+except ImportError:  # IronPython, as in Revit, rays are cast one at a time by TerrainTree
+    np = None
+
+LEAF_SIZE = 8  # Triangles per BVH leaf
+EPSILON = 1.0e-12
+
+
+def _as_points(values):
+    """ Returns values as a (n, 3) float64 array """
+    return np.asarray(values, dtype=np.float64).reshape(-1, 3)
+
+
+class TerrainBVH(object):
+    """ Bounding-volume hierarchy over a triangulated terrain, intersects rays in NumPy batches """
+    def __init__(self, vertices, triangles, leaf_size=LEAF_SIZE):
+        self.vertices = _as_points(vertices)
+        self.triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+        if len(self.triangles) == 0:
+            raise ValueError("Terrain mesh has no triangles")
+        self.leaf_size = max(1, int(leaf_size))
+        self._fingerprint = None
+        self._build()
+
+    def _build(self):
+        """ Builds a flat node array with median splits along the longest centroid axis """
+        corners = self.vertices[self.triangles]  # (m, 3, 3)
+        tri_lo = corners.min(axis=1)
+        tri_hi = corners.max(axis=1)
+        centroids = corners.mean(axis=1)
+
+        lo, hi, left, right, start, count = [], [], [], [], [], []
+        order = np.arange(len(self.triangles))
+        stack = [(0, len(order), -1, 0)]  # (first, last, parent, side)
+        while stack:
+            first, last, parent, side = stack.pop()
+            node = len(lo)
+            if parent >= 0:
+                (left if side == 0 else right)[parent] = node
+            items = order[first:last]
+            lo.append(tri_lo[items].min(axis=0))
+            hi.append(tri_hi[items].max(axis=0))
+            left.append(-1)
+            right.append(-1)
+            if last - first <= self.leaf_size:
+                start.append(first)
+                count.append(last - first)
+                continue
+            start.append(0)
+            count.append(0)
+            cen = centroids[items]
+            axis = int(np.argmax(cen.max(axis=0) - cen.min(axis=0)))
+            middle = (last - first) // 2
+            order[first:last] = items[np.argpartition(cen[:, axis], middle)]
+            stack.append((first + middle, last, node, 1))
+            stack.append((first, first + middle, node, 0))
+
+        self._lo = np.array(lo)
+        self._hi = np.array(hi)
+        self._left = np.array(left, dtype=np.int64)
+        self._right = np.array(right, dtype=np.int64)
+        self._start = np.array(start, dtype=np.int64)
+        self._count = np.array(count, dtype=np.int64)
+        # Triangle data in leaf order, so a leaf is the contiguous range start:start+count
+        self._tri_ids = order
+        ordered = corners[order]
+        self._v0 = ordered[:, 0]
+        self._e1 = ordered[:, 1] - ordered[:, 0]
+        self._e2 = ordered[:, 2] - ordered[:, 0]
+
+    @property
+    def node_count(self):
+        return len(self._lo)
+
+    @property
+    def fingerprint(self):
+        """ Digest of the mesh, changes whenever a vertex or triangle does """
+        if self._fingerprint is None:
+            digest = hashlib.sha1(self.vertices.tobytes())
+            digest.update(self.triangles.tobytes())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def heights(self, xy):
+        """ Terrain height under each (x, y), nan outside the terrain """
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        top = self._hi[0, 2] + 1.0
+        origins = np.column_stack((xy, np.full(len(xy), top)))
+        directions = np.tile((0.0, 0.0, -1.0), (len(xy), 1))
+        points, _, _ = self.intersect(origins, directions)
+        return points[:, 2]
+
+    def intersect(self, origins, directions, max_distance=float("inf")):
+        """ Returns hit points (nan on miss), distances (inf on miss) and triangle ids (-1 on miss) """
+        origins = _as_points(origins)
+        directions = _as_points(directions)
+        length = np.linalg.norm(directions, axis=1)
+        if np.any(length == 0):
+            raise ValueError("Ray directions must be non-zero")
+        directions = directions / length[:, None]
+        with np.errstate(divide="ignore"):
+            inv_dir = 1.0 / directions
+
+        ray_count = len(origins)
+        best_t = np.full(ray_count, float(max_distance))
+        best_tri = np.full(ray_count, -1, dtype=np.int64)
+
+        # Breadth-first traversal of all (ray, node) pairs at once
+        ray = np.arange(ray_count)
+        node = np.zeros(ray_count, dtype=np.int64)
+        while ray.size:
+            o = origins[ray]
+            inv = inv_dir[ray]
+            with np.errstate(invalid="ignore"):
+                t1 = (self._lo[node] - o) * inv
+                t2 = (self._hi[node] - o) * inv
+            # A ray lying exactly in a slab plane gives nan, that axis then does not clip the ray
+            t_lo = np.minimum(t1, t2)
+            t_hi = np.maximum(t1, t2)
+            t_lo[np.isnan(t_lo)] = -np.inf
+            t_hi[np.isnan(t_hi)] = np.inf
+            t_near = np.maximum(t_lo.max(axis=1), 0.0)
+            t_far = t_hi.min(axis=1)
+            keep = (t_near <= t_far) & (t_near <= best_t[ray])
+            ray = ray[keep]
+            node = node[keep]
+
+            is_leaf = self._count[node] > 0
+            if np.any(is_leaf):
+                self._intersect_leaves(origins, directions, ray[is_leaf], node[is_leaf], best_t, best_tri)
+            inner = ~is_leaf
+            node = np.column_stack((self._left[node[inner]], self._right[node[inner]])).ravel()
+            ray = np.repeat(ray[inner], 2)
+
+        hit = best_tri >= 0
+        distances = np.where(hit, best_t, np.inf)
+        points = np.full((ray_count, 3), np.nan)
+        points[hit] = origins[hit] + directions[hit] * best_t[hit, None]
+        triangle_ids = np.where(hit, self._tri_ids[np.maximum(best_tri, 0)], -1)
+        return points, distances, triangle_ids
+
+    def _intersect_leaves(self, origins, directions, ray, node, best_t, best_tri):
+        """ Moller-Trumbore test of every ray against every triangle of its leaf """
+        counts = self._count[node]
+        pair_ray = np.repeat(ray, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        tri = np.repeat(self._start[node], counts) + offsets
+
+        d = directions[pair_ray]
+        e1 = self._e1[tri]
+        e2 = self._e2[tri]
+        p = np.cross(d, e2)
+        det = np.einsum("ij,ij->i", e1, p)
+        valid = np.abs(det) > EPSILON
+        inv_det = np.where(valid, 1.0 / np.where(valid, det, 1.0), 0.0)
+        s = origins[pair_ray] - self._v0[tri]
+        u = np.einsum("ij,ij->i", s, p) * inv_det
+        q = np.cross(s, e1)
+        v = np.einsum("ij,ij->i", d, q) * inv_det
+        t = np.einsum("ij,ij->i", e2, q) * inv_det
+        valid &= (u >= 0.0) & (v >= 0.0) & (u + v <= 1.0) & (t >= 0.0)
+        if not np.any(valid):
+            return
+        pair_ray = pair_ray[valid]
+        t = t[valid]
+        tri = tri[valid]
+        np.minimum.at(best_t, pair_ray, t)
+        nearest = t == best_t[pair_ray]
+        best_tri[pair_ray[nearest]] = tri[nearest]
+
+
+class TerrainTree(object):
+    """ Plain Python counterpart of TerrainBVH for hosts without NumPy, casts one ray at a time
+
+    Built and traversed the same way, it gives the same hits. Results are lists: points as (x, y, z)
+    tuples, nan on a miss.
+    """
+    def __init__(self, vertices, triangles, leaf_size=LEAF_SIZE):
+        self.vertices = [tuple(float(c) for c in v) for v in vertices]
+        self.triangles = [tuple(int(i) for i in t) for t in triangles]
+        if not self.triangles:
+            raise ValueError("Terrain mesh has no triangles")
+        self.leaf_size = max(1, int(leaf_size))
+        self._fingerprint = None
+        self._build()
+
+    def _build(self):
+        corners = [[self.vertices[i] for i in t] for t in self.triangles]
+        tri_lo = [tuple(min(c[k] for c in tri) for k in range(3)) for tri in corners]
+        tri_hi = [tuple(max(c[k] for c in tri) for k in range(3)) for tri in corners]
+        centroids = [tuple(sum(c[k] for c in tri) / 3.0 for k in range(3)) for tri in corners]
+
+        # Nodes as [lo, hi, left, right, start, count], leaves own order[start:start + count]
+        self._nodes = []
+        order = list(range(len(self.triangles)))
+        stack = [(0, len(order), -1, 0)]
+        while stack:
+            first, last, parent, side = stack.pop()
+            node = len(self._nodes)
+            if parent >= 0:
+                self._nodes[parent][2 + side] = node
+            items = order[first:last]
+            lo = tuple(min(tri_lo[i][k] for i in items) for k in range(3))
+            hi = tuple(max(tri_hi[i][k] for i in items) for k in range(3))
+            if last - first <= self.leaf_size:
+                self._nodes.append([lo, hi, -1, -1, first, last - first])
+                continue
+            self._nodes.append([lo, hi, -1, -1, 0, 0])
+            spread = [max(centroids[i][k] for i in items) - min(centroids[i][k] for i in items) for k in range(3)]
+            axis = spread.index(max(spread))
+            middle = (last - first) // 2
+            order[first:last] = sorted(items, key=lambda i: centroids[i][axis])
+            stack.append((first + middle, last, node, 1))
+            stack.append((first, first + middle, node, 0))
+
+        self._tri_ids = order
+        self._v0, self._e1, self._e2 = [], [], []
+        for i in order:
+            a, b, c = corners[i]
+            self._v0.append(a)
+            self._e1.append((b[0] - a[0], b[1] - a[1], b[2] - a[2]))
+            self._e2.append((c[0] - a[0], c[1] - a[1], c[2] - a[2]))
+
+    @property
+    def node_count(self):
+        return len(self._nodes)
+
+    @property
+    def fingerprint(self):
+        """ Same digest as TerrainBVH.fingerprint of the same mesh """
+        if self._fingerprint is None:
+            coords = [c for v in self.vertices for c in v]
+            indices = [i for t in self.triangles for i in t]
+            digest = hashlib.sha1(struct.pack("<{}d".format(len(coords)), *coords))
+            digest.update(struct.pack("<{}q".format(len(indices)), *indices))
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def heights(self, xy):
+        """ Terrain height under each (x, y), nan outside the terrain """
+        top = self._nodes[0][1][2] + 1.0
+        origins = [(x, y, top) for x, y in xy]
+        points, _, _ = self.intersect(origins, [(0.0, 0.0, -1.0)] * len(origins))
+        return [p[2] for p in points]
+
+    def intersect(self, origins, directions, max_distance=float("inf")):
+        """ Returns hit points (nan on miss), distances (inf on miss) and triangle ids (-1 on miss) """
+        points, distances, triangle_ids = [], [], []
+        nan = float("nan")
+        for origin, direction in zip(origins, directions):
+            length = math.sqrt(direction[0] ** 2 + direction[1] ** 2 + direction[2] ** 2)
+            if length == 0:
+                raise ValueError("Ray directions must be non-zero")
+            d = (direction[0] / length, direction[1] / length, direction[2] / length)
+            t, tri = self._cast(tuple(origin), d, float(max_distance))
+            if tri < 0:
+                points.append((nan, nan, nan))
+                distances.append(float("inf"))
+                triangle_ids.append(-1)
+            else:
+                points.append((origin[0] + d[0] * t, origin[1] + d[1] * t, origin[2] + d[2] * t))
+                distances.append(t)
+                triangle_ids.append(self._tri_ids[tri])
+        return points, distances, triangle_ids
+
+    def _cast(self, o, d, best_t):
+        """ Nearest triangle along one ray, as (distance, index in leaf order), index -1 on a miss """
+        inf = float("inf")
+        inv = [1.0 / c if c else math.copysign(inf, c) for c in d]
+        best_tri = -1
+        stack = [0]
+        nodes = self._nodes
+        while stack:
+            lo, hi, left, right, start, count = nodes[stack.pop()]
+            t_near, t_far = 0.0, inf
+            for k in range(3):
+                t1 = (lo[k] - o[k]) * inv[k]
+                t2 = (hi[k] - o[k]) * inv[k]
+                if t1 != t1 or t2 != t2:  # Ray lying in a slab plane, that axis does not clip it
+                    continue
+                if t1 > t2:
+                    t1, t2 = t2, t1
+                t_near = max(t_near, t1)
+                t_far = min(t_far, t2)
+            if t_near > t_far or t_near > best_t:
+                continue
+            if count:
+                for tri in range(start, start + count):
+                    t = self._triangle(o, d, tri)
+                    if t is not None and (t < best_t or best_tri < 0 and t <= best_t):
+                        best_t, best_tri = t, tri
+            else:
+                stack.append(right)
+                stack.append(left)
+        return best_t, best_tri
+
+    def _triangle(self, o, d, tri):
+        """ Moller-Trumbore distance of one ray to one triangle, None on a miss """
+        e1 = self._e1[tri]
+        e2 = self._e2[tri]
+        p = (d[1] * e2[2] - d[2] * e2[1], d[2] * e2[0] - d[0] * e2[2], d[0] * e2[1] - d[1] * e2[0])
+        det = e1[0] * p[0] + e1[1] * p[1] + e1[2] * p[2]
+        if abs(det) <= EPSILON:
+            return None
+        inv_det = 1.0 / det
+        v0 = self._v0[tri]
+        s = (o[0] - v0[0], o[1] - v0[1], o[2] - v0[2])
+        u = (s[0] * p[0] + s[1] * p[1] + s[2] * p[2]) * inv_det
+        q = (s[1] * e1[2] - s[2] * e1[1], s[2] * e1[0] - s[0] * e1[2], s[0] * e1[1] - s[1] * e1[0])
+        v = (d[0] * q[0] + d[1] * q[1] + d[2] * q[2]) * inv_det
+        t = (e2[0] * q[0] + e2[1] * q[1] + e2[2] * q[2]) * inv_det
+        if u < 0.0 or v < 0.0 or u + v > 1.0 or t < 0.0:
+            return None
+        return t
+
+
+def build_terrain(vertices, triangles, leaf_size=LEAF_SIZE):
+    """ TerrainBVH of a triangulation where NumPy is available, TerrainTree otherwise """
+    if np is None:
+        return TerrainTree(vertices, triangles, leaf_size)
+    return TerrainBVH(vertices, triangles, leaf_size)
+
+
+def synthetic_terrain(size_x, size_y, nx, ny, origin=(0.0, 0.0, 0.0), relief=3.0, seed=0):
+    """ Returns vertices and triangles of a gridded rolling terrain for headless runs """
+    rnd = np.random.RandomState(seed)
+    xs = np.linspace(0.0, size_x, nx + 1)
+    ys = np.linspace(0.0, size_y, ny + 1)
+    gx, gy = np.meshgrid(xs, ys)
+    phase = rnd.uniform(0, 2 * np.pi, 4)
+    gz = relief * (np.sin(gx / size_x * 3 * np.pi + phase[0]) * np.cos(gy / size_y * 2 * np.pi + phase[1])
+                   + 0.3 * np.sin(gx / size_x * 11 * np.pi + phase[2]) * np.sin(gy / size_y * 7 * np.pi + phase[3]))
+    vertices = np.column_stack((gx.ravel(), gy.ravel(), gz.ravel())) + np.asarray(origin, dtype=np.float64)
+
+    idx = np.arange((nx + 1) * (ny + 1)).reshape(ny + 1, nx + 1)
+    a = idx[:-1, :-1].ravel()
+    b = idx[:-1, 1:].ravel()
+    c = idx[1:, 1:].ravel()
+    d = idx[1:, :-1].ravel()
+    triangles = np.concatenate((np.column_stack((a, b, c)), np.column_stack((a, c, d))))
+    return vertices, triangles
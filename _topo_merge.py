@@ -0,0 +1,219 @@
+# dependencies
+import math
+
+try:
+    import numpy as np
+except ImportError:  # IronPython, as in Revit, points are merged and simplified in plain Python
+    np = None
+
+POINTS_PER_CELL = 4  # Average points per grid cell of the simplification neighbourhoods
+
+
+def _cell_ids(xy, cell):
+    """ Grid indices of xy padded by one cell on every side, and the grid shape """
+    ij = np.floor((xy - xy.min(axis=0)) / cell).astype(np.int64) + 1
+    return ij, tuple(ij.max(axis=0) + 2)
+
+
+def plane_errors(xy, z, cell):
+    """ Vertical error of each point against a least-squares plane through the other points of its 3 x 3 cells
+
+    Points with too few or collinear neighbours get an infinite error.
+    """
+    ij, shape = _cell_ids(xy, cell)
+    x = xy[:, 0] - xy[:, 0].min()
+    y = xy[:, 1] - xy[:, 1].min()
+    moments = np.column_stack((np.ones_like(x), x, y, z, x * x, x * y, y * y, x * z, y * z))
+    grid = np.zeros(shape + (9,))
+    np.add.at(grid, (ij[:, 0], ij[:, 1]), moments)
+    block = np.zeros_like(grid)
+    for di in (-1, 0, 1):
+        for dj in (-1, 0, 1):
+            block[1:-1, 1:-1] += grid[1 + di:shape[0] - 1 + di, 1 + dj:shape[1] - 1 + dj]
+    n, sx, sy, sz, sxx, sxy, syy, sxz, syz = (block[ij[:, 0], ij[:, 1]] - moments).T
+
+    matrix = np.stack((np.column_stack((sxx, sxy, sx)),
+                       np.column_stack((sxy, syy, sy)),
+                       np.column_stack((sx, sy, n))), axis=1)
+    scale = np.maximum(np.abs(matrix).max(axis=(1, 2)), 1e-300)
+    solvable = (n >= 3) & (np.abs(np.linalg.det(matrix / scale[:, None, None])) > 1e-12)
+    matrix[~solvable] = np.eye(3)
+    coef = np.linalg.solve(matrix, np.column_stack((sxz, syz, sz))[:, :, None])[:, :, 0]
+    error = np.abs(z - (coef[:, 0] * x + coef[:, 1] * y + coef[:, 2]))
+    return np.where(solvable, error, np.inf)
+
+
+def _python_cell_ids(xy, cell):
+    """ _cell_ids of a list of (x, y) """
+    x0 = min(x for x, _ in xy)
+    y0 = min(y for _, y in xy)
+    ij = [(int(math.floor((x - x0) / cell)) + 1, int(math.floor((y - y0) / cell)) + 1) for x, y in xy]
+    return ij, (max(i for i, _ in ij) + 2, max(j for _, j in ij) + 2)
+
+
+def _det3(a, b, c):
+    """ Determinant of the 3 x 3 matrix of columns a, b and c """
+    return (a[0] * (b[1] * c[2] - b[2] * c[1]) - b[0] * (a[1] * c[2] - a[2] * c[1]) +
+            c[0] * (a[1] * b[2] - a[2] * b[1]))
+
+
+def _python_plane_errors(xy, z, cell):
+    """ plane_errors of a list of (x, y) and a list of heights """
+    ij, _ = _python_cell_ids(xy, cell)
+    x0 = min(x for x, _ in xy)
+    y0 = min(y for _, y in xy)
+    moments = []
+    grid = {}
+    for (x, y), h, key in zip(xy, z, ij):
+        x, y = x - x0, y - y0
+        m = (1.0, x, y, h, x * x, x * y, y * y, x * h, y * h)
+        moments.append(m)
+        sums = grid.setdefault(key, [0.0] * 9)
+        for k in range(9):
+            sums[k] += m[k]
+    blocks = {}
+    errors = []
+    for (x, y), h, key, m in zip(xy, z, ij, moments):
+        if key not in blocks:
+            block = [0.0] * 9
+            for di in (-1, 0, 1):
+                for dj in (-1, 0, 1):
+                    sums = grid.get((key[0] + di, key[1] + dj))
+                    if sums is not None:
+                        for k in range(9):
+                            block[k] += sums[k]
+            blocks[key] = block
+        n, sx, sy, sz, sxx, sxy, syy, sxz, syz = [b - v for b, v in zip(blocks[key], m)]
+        # Symmetric, so the columns are the rows of plane_errors' matrix, solved by Cramer's rule
+        columns = ((sxx, sxy, sx), (sxy, syy, sy), (sx, sy, n))
+        rhs = (sxz, syz, sz)
+        scale = max(max(abs(v) for column in columns for v in column), 1e-300)
+        det = _det3(*columns)
+        if n < 3 or abs(det / scale ** 3) <= 1e-12:
+            errors.append(float("inf"))
+            continue
+        a = _det3(rhs, columns[1], columns[2]) / det
+        b = _det3(columns[0], rhs, columns[2]) / det
+        c = _det3(columns[0], columns[1], rhs) / det
+        errors.append(abs(h - (a * (x - x0) + b * (y - y0) + c)))
+    return errors
+
+
+def _python_simplify(points, max_points):
+    """ simplify of a list of (x, y, z), returns a list of indices """
+    alive = list(range(len(points)))
+    if len(points) <= max_points:
+        return alive
+    width = max(p[0] for p in points) - min(p[0] for p in points)
+    depth = max(p[1] for p in points) - min(p[1] for p in points)
+    extent = max(width, depth)
+    area = max(max(width, 1e-9) * max(depth, 1e-9), 1e-9)
+    growth = 1.0
+    while len(alive) > max_points:
+        cell = max(math.sqrt(area / len(alive) * POINTS_PER_CELL), 1e-9) * growth
+        xy = [(points[i][0], points[i][1]) for i in alive]
+        error = _python_plane_errors(xy, [points[i][2] for i in alive], cell)
+        ij, shape = _python_cell_ids(xy, cell)
+        cells = [i * shape[1] + j for i, j in ij]
+        order = sorted(range(len(alive)), key=lambda k: (cells[k], error[k]))
+        first = [k for n, k in enumerate(order) if n == 0 or cells[k] != cells[order[n - 1]]]
+        first = [k for k in first if error[k] != float("inf")]
+        if len(first) < 2 and cell <= 2 * extent:
+            growth *= 2
+            continue
+        if not first:
+            break  # Nothing left that a plane can predict
+        limit = min(len(alive) - max_points, max(1, len(first) // 2))
+        dropped = set(sorted(first, key=lambda k: error[k])[:limit])
+        alive = [a for k, a in enumerate(alive) if k not in dropped]
+    return alive
+
+
+def simplify(points, max_points):
+    """ Indices of at most max_points points, dropping first the points their neighbours predict best
+
+    Stops early when no remaining point has enough neighbours to fit a plane.
+
+    Every round removes at most one point per grid cell, and only from the better predicted half of
+    the cells, so neighbouring points are not removed together before their errors are measured again.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    alive = np.arange(len(points))
+    if len(points) <= max_points:
+        return alive
+    extent = np.ptp(points[:, :2], axis=0).max()
+    area = max(np.prod(np.maximum(np.ptp(points[:, :2], axis=0), 1e-9)), 1e-9)
+    growth = 1.0
+    while len(alive) > max_points:
+        # Cells follow the thinning density so every neighbourhood keeps enough points for a plane
+        cell = max(np.sqrt(area / len(alive) * POINTS_PER_CELL), 1e-9) * growth
+        xy = points[alive, :2]
+        error = plane_errors(xy, points[alive, 2], cell)
+        ij, shape = _cell_ids(xy, cell)
+        flat = ij[:, 0] * shape[1] + ij[:, 1]
+        order = np.lexsort((error, flat))
+        first = order[np.r_[True, flat[order][1:] != flat[order][:-1]]]  # Lowest error of every cell
+        first = first[np.isfinite(error[first])]
+        if len(first) < 2 and cell <= 2 * extent:
+            growth *= 2
+            continue
+        if not len(first):
+            break  # Nothing left that a plane can predict
+        limit = min(len(alive) - max_points, max(1, len(first) // 2))
+        first = first[np.argsort(error[first], kind="stable")][:limit]
+        alive = np.delete(alive, first)
+    return alive
+
+
+def merge_points(points, terrain, vertical_tolerance, max_points=None, stats=None, required=0):
+    """ New points the existing terrain does not already represent, reduced to max_points
+
+    terrain is a TerrainBVH of the current topography triangulation. A point is represented when the
+    triangulation passes within vertical_tolerance of it. The first required points are always kept,
+    terrain hits lie on the current terrain by construction but the new surface still needs them, e.g.
+    the daylight line and the pad boundary. max_points limits the other points to what the required
+    ones leave of it. Returns indices into points, stats receives the added, skipped and simplified
+    counts. Without NumPy terrain is a TerrainTree, points a list of (x, y, z) and the indices a list.
+    """
+    if np is None:
+        return _python_merge_points(points, terrain, vertical_tolerance, max_points, stats, required)
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    heights = terrain.heights(points[:, :2])
+    represented = np.abs(heights - points[:, 2]) <= vertical_tolerance  # False outside the terrain
+    represented[:required] = False
+    kept = np.flatnonzero(~represented)
+    simplified = 0
+    optional = kept[required:]
+    if max_points is not None and len(kept) > max_points:
+        budget = max(max_points - required, 0)
+        reduced = optional[simplify(points[optional], budget)] if budget else optional[:0]
+        reduced = np.concatenate((kept[:required], reduced))
+        simplified = len(kept) - len(reduced)
+        kept = reduced
+    if stats is not None:
+        stats["added"] = len(kept)
+        stats["skipped"] = int(represented.sum())
+        stats["simplified"] = simplified
+    return kept
+
+
+def _python_merge_points(points, terrain, vertical_tolerance, max_points, stats, required):
+    points = [tuple(p) for p in points]
+    heights = terrain.heights([(x, y) for x, y, _ in points])
+    # False outside the terrain, where the height is nan
+    represented = [i >= required and abs(h - p[2]) <= vertical_tolerance
+                   for i, (h, p) in enumerate(zip(heights, points))]
+    kept = [i for i, r in enumerate(represented) if not r]
+    simplified = 0
+    optional = kept[required:]
+    if max_points is not None and len(kept) > max_points:
+        budget = max(max_points - required, 0)
+        reduced = [optional[k] for k in _python_simplify([points[i] for i in optional], budget)] if budget else []
+        reduced = kept[:required] + reduced
+        simplified = len(kept) - len(reduced)
+        kept = reduced
+    if stats is not None:
+        stats["added"] = len(kept)
+        stats["skipped"] = sum(represented)
+        stats["simplified"] = simplified
+    return kept
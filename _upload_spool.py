@@ -0,0 +1,268 @@
+# dependencies
+import gzip
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+
+BATCH_SIZE = 50  # Rows per request
+BASE_DELAY = 2.0  # Seconds before the first retry, doubled on every further failure
+MAX_DELAY = 900.0
+LEASE = 120.0  # Seconds a claimed batch is hidden from other workers while it is posted
+IDLE_WAIT = 300.0  # Seconds the worker sleeps when nothing is due
+TIMEOUT = 30.0
+RETRY_STATUS = (408, 429)  # Client errors worth retrying, other 4xx rows are kept as failed
+REJECTED_TEXT = 500  # Characters of the server's reason for refusing rows kept with their error
+
+_uploaders = {}  # (spool path, url) -> running SpoolUploader
+_lock = threading.Lock()
+
+
+def backoff(attempts, base=BASE_DELAY, maximum=MAX_DELAY):
+    """ Seconds to wait after the given number of failed attempts """
+    return min(maximum, base * 2 ** max(0, attempts - 1))
+
+
+class UploadSpool(object):
+    """ Durable queue of JSON rows in SQLite, shared safely by worker threads and Revit sessions """
+    def __init__(self, path):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS rows (id INTEGER PRIMARY KEY, payload TEXT NOT NULL, "
+                       "created REAL NOT NULL, next_try REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+                       "error TEXT, failed INTEGER NOT NULL DEFAULT 0)")
+            db.execute("CREATE INDEX IF NOT EXISTS rows_due ON rows (failed, next_try)")
+            if "tag" not in [c[1] for c in db.execute("PRAGMA table_info(rows)")]:  # Spools of earlier versions
+                db.execute("ALTER TABLE rows ADD COLUMN tag TEXT")
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        return _Connection(db)
+
+    def put(self, row, tag=None):
+        """ Adds one row, due immediately, tag is kept with it locally and never posted """
+        now = time.time()
+        with self._connect() as db:
+            db.execute("INSERT INTO rows (payload, created, next_try, tag) VALUES (?, ?, ?, ?)",
+                       (json.dumps(row), now, now, None if tag is None else json.dumps(tag)))
+
+    def claim(self, limit=BATCH_SIZE, lease=LEASE):
+        """ Up to limit due rows as (ids, rows), hidden from other claims for lease seconds """
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            found = db.execute("SELECT id, payload FROM rows WHERE failed = 0 AND next_try <= ? ORDER BY id LIMIT ?",
+                               (now, limit)).fetchall()
+            ids = [i for i, _ in found]
+            db.executemany("UPDATE rows SET next_try = ? WHERE id = ?", [(now + lease, i) for i in ids])
+            db.execute("COMMIT")
+        return ids, [json.loads(p) for _, p in found]
+
+    def tags(self, ids):
+        """ Tags of the rows in the order of ids, None for rows without one """
+        with self._connect() as db:
+            found = dict(db.execute("SELECT id, tag FROM rows WHERE id IN ({})".format(",".join("?" * len(ids))),
+                                    ids).fetchall())
+        return [None if found.get(i) is None else json.loads(found[i]) for i in ids]
+
+    def remove(self, ids):
+        with self._connect() as db:
+            db.executemany("DELETE FROM rows WHERE id = ?", [(i,) for i in ids])
+
+    def retry(self, ids, error, base=BASE_DELAY, maximum=MAX_DELAY):
+        """ Schedules rows again with exponential backoff on their attempt count """
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            for i in ids:
+                attempts = db.execute("SELECT attempts FROM rows WHERE id = ?", (i,)).fetchone()
+                if attempts is not None:
+                    attempts = attempts[0] + 1
+                    db.execute("UPDATE rows SET attempts = ?, next_try = ?, error = ? WHERE id = ?",
+                               (attempts, now + backoff(attempts, base, maximum), error, i))
+            db.execute("COMMIT")
+
+    def fail(self, ids, error):
+        """ Keeps rows the server rejected, without sending them again """
+        with self._connect() as db:
+            db.executemany("UPDATE rows SET failed = 1, error = ? WHERE id = ?", [(error, i) for i in ids])
+
+    def next_due(self):
+        """ Seconds until the next row is due, None when the spool is empty """
+        with self._connect() as db:
+            first = db.execute("SELECT MIN(next_try) FROM rows WHERE failed = 0").fetchone()[0]
+        return None if first is None else max(0.0, first - time.time())
+
+    def counts(self):
+        with self._connect() as db:
+            pending, failed = db.execute("SELECT COUNT(*) - COALESCE(SUM(failed), 0), COALESCE(SUM(failed), 0) "
+                                         "FROM rows").fetchone()
+        return {"pending": pending, "failed": failed}
+
+
+class _Connection(object):
+    """ sqlite3 connection closed on leaving the with block """
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        return self.db
+
+    def __exit__(self, *exc):
+        self.db.close()
+
+
+class SpoolUploader(threading.Thread):
+    """ Background worker posting spooled rows in batches over one pooled HTTP session
+
+    on_sent(rows, tags) is called on the worker thread with the rows of every batch the server accepted.
+    """
+    def __init__(self, spool, url, session=None, batch_size=BATCH_SIZE, base_delay=BASE_DELAY,
+                 max_delay=MAX_DELAY, timeout=TIMEOUT, compress=False, on_sent=None):
+        threading.Thread.__init__(self, name="RevitHealthCheck upload")
+        self.daemon = True
+        self.spool = spool
+        self.url = url
+        self.session = session if session is not None else pooled_session()
+        self.batch_size = batch_size
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.compress = compress
+        self.on_sent = on_sent
+        self.sent = 0
+        self.bytes_sent = 0
+        self.requests = 0
+        self.failures = 0
+        self.last_error = None
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+
+    def notify(self):
+        """ Wakes the worker after rows were spooled """
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        self._wake.set()
+        self.join(timeout)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                wait = self.flush()
+            except Exception as e:  # Spool locked or unreadable, try again later
+                self.last_error = "{}: {}".format(type(e).__name__, e)
+                wait = self.base_delay
+            self._wake.wait(IDLE_WAIT if wait is None else wait)
+            self._wake.clear()
+
+    def flush(self):
+        """ Posts all due rows, returns seconds until the next row is due or None when the spool is empty """
+        while not self._stop_event.is_set():
+            ids, rows = self.spool.claim(self.batch_size)
+            if not ids:
+                break
+            self.post(ids, rows)
+        return self.spool.next_due()
+
+    def post(self, ids, rows):
+        self.requests += 1
+        try:
+            body = json.dumps(rows).encode("utf-8")
+            headers = {"Content-Type": "application/json"}
+            if self.compress:
+                body = gzip_bytes(body)
+                headers["Content-Encoding"] = "gzip"
+            self.bytes_sent += len(body)
+            r = self.session.post(self.url, data=body, headers=headers, timeout=self.timeout)
+        except Exception as e:  # Offline, DNS, timeout
+            return self._failed(ids, "{}: {}".format(type(e).__name__, e), True)
+        if 200 <= r.status_code < 300:
+            tags = self.spool.tags(ids) if self.on_sent is not None else None
+            self.spool.remove(ids)
+            self.sent += len(ids)
+            if tags is not None:
+                try:
+                    self.on_sent(rows, tags)
+                except Exception as e:  # The rows are delivered, only the bookkeeping failed
+                    self.last_error = "{}: {}".format(type(e).__name__, e)
+            return True
+        error = "Error occurred: {status_c}, {status_r},".format(status_c=str(r.status_code), status_r=r.reason)
+        if r.status_code >= 500 or r.status_code in RETRY_STATUS:
+            return self._failed(ids, error, True)
+        return self._failed(ids, "{} {}".format(error, getattr(r, "text", "")[:REJECTED_TEXT]), False, rows)
+
+    def _failed(self, ids, error, retry, rows=()):
+        self.failures += 1
+        self.last_error = error
+        if retry:
+            self.spool.retry(ids, error, self.base_delay, self.max_delay)
+        else:
+            self.spool.fail(ids, error)
+            log_rejected(self.spool.path, rows, error)
+        return False
+
+    def stats(self):
+        stats = {
+            "sent": self.sent,
+            "requests": self.requests,
+            "failures": self.failures,
+            "bytes sent": self.bytes_sent,
+            "last error": self.last_error
+        }
+        stats.update(self.spool.counts())
+        return stats
+
+
+def log_rejected(path, rows, error):
+    """ Prints the error of rows the server refused for good, and appends them to a log next to the spool """
+    print("{} {} rows kept as failed in {}".format(error, len(rows), path))
+    with open(os.path.splitext(path)[0] + "_rejected.log", "a") as f:
+        f.write("{} {}\n{}\n".format(time.strftime("%Y-%m-%d %H:%M:%S"), error, json.dumps(rows)))
+
+
+def gzip_bytes(data):
+    """ data compressed as a gzip stream """
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode="wb") as f:
+        f.write(data)
+    return buffer.getvalue()
+
+
+def pooled_session(pool_size=2):
+    """ requests session keeping its connections alive between batches """
+    import requests
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def uploader(path, url, compress=False, on_sent=None):
+    """ The running worker for a spool and url, started on first use and kept for the session """
+    key = (os.path.abspath(path), url)
+    with _lock:
+        worker = _uploaders.get(key)
+        if worker is None or not worker.is_alive():
+            worker = SpoolUploader(UploadSpool(path), url, compress=compress, on_sent=on_sent)
+            worker.start()
+            _uploaders[key] = worker
+        elif on_sent is not None:
+            worker.on_sent = on_sent
+    return worker
+
+
+def spool_upload(url, row, path, compress=False, tag=None, on_sent=None):
+    """ Spools row for upload to url and returns at once, the worker posts it in the background """
+    worker = uploader(path, url, compress, on_sent)
+    worker.spool.put(row, tag)
+    worker.notify()
+    return worker
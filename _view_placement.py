@@ -0,0 +1,46 @@
+# dependencies
+from _element_census import element_id_value
+
+
+def viewport_placement(viewport):
+    """ (view id, sheet id) of a viewport """
+    return element_id_value(viewport.ViewId), element_id_value(viewport.SheetId)
+
+
+def schedule_placement(instance):
+    """ (schedule id, sheet id) of a schedule sheet instance, None for revision schedules inside title blocks """
+    if instance.IsTitleblockRevisionSchedule:
+        return None
+    return element_id_value(instance.ScheduleId), element_id_value(instance.OwnerViewId)
+
+
+class PlacementIndex(object):
+    """ Placed views mapped to their sheets, from (view id, sheet id) pairs of viewports and schedule instances
+
+    None entries are skipped, they stand for title block revision schedules which place no view.
+    """
+    def __init__(self, placements):
+        self.view_sheets = {}  # view id -> set of sheet ids
+        self.sheet_views = {}  # sheet id -> list of view ids, one per viewport or schedule instance
+        for placement in placements:
+            if placement is not None:
+                view, sheet = placement
+                self.view_sheets.setdefault(view, set()).add(sheet)
+                self.sheet_views.setdefault(sheet, []).append(view)
+
+    def is_placed(self, view_id):
+        return view_id in self.view_sheets
+
+    def views_on(self, sheet_id):
+        """ Ids of the views placed on a sheet """
+        return self.sheet_views.get(sheet_id, [])
+
+    def empty_sheets(self, sheet_ids):
+        return [s for s in sheet_ids if s not in self.sheet_views]
+
+    def views_per_sheet(self, sheet_ids):
+        """ Average and largest number of views placed on the sheets """
+        counts = [len(self.views_on(s)) for s in sheet_ids]
+        if not counts:
+            return 0.0, 0
+        return float(sum(counts)) / len(counts), max(counts)
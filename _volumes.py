@@ -0,0 +1,144 @@
+# dependencies
+import math
+
+import numpy as np
+
+from _curve_sampling import LINE, curve_lengths, division_counts, sample_loop
+from _slope import edge_angles
+
+CELL_CHUNK = 4096  # Cells measured at once
+SEGMENT_CHUNK = 64  # Boundary segments measured at once
+
+
+def loop_polygon(loop, spacing):
+    """ Plan polygon of a curve loop, arcs get vertices about spacing apart, and the curve of every side """
+    divisions = division_counts(curve_lengths(loop), spacing)
+    divisions[np.array([c[0] == LINE for c in loop])] = 0  # Lines only need their start point
+    points, offsets = sample_loop(loop, divisions=divisions)
+    curve = np.repeat(np.arange(len(loop)), np.diff(offsets))
+    local = np.arange(len(points)) - offsets[curve]
+    keep = (local < divisions[curve]) | (divisions[curve] == 0)  # The end point is the next curve's start
+    return points[keep, :2], curve[keep]
+
+
+def _distances(xy, polygon):
+    """ Distance of every point to the polygon boundary, the nearest side and whether it lies inside """
+    parts = [_chunk_distances(xy[first:first + CELL_CHUNK], polygon) for first in range(0, len(xy), CELL_CHUNK)]
+    if not parts:
+        return np.zeros(0), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool)
+    return tuple(np.concatenate(values) for values in zip(*parts))
+
+
+def _chunk_distances(xy, polygon):
+    start = polygon
+    end = np.roll(polygon, -1, axis=0)
+    best = np.full(len(xy), np.inf)
+    side = np.zeros(len(xy), dtype=np.int64)
+    inside = np.zeros(len(xy), dtype=bool)
+    for first in range(0, len(polygon), SEGMENT_CHUNK):
+        a = start[first:first + SEGMENT_CHUNK]
+        b = end[first:first + SEGMENT_CHUNK]
+        ab = b - a
+        ap = xy[:, None, :] - a[None, :, :]
+        t = np.clip((ap * ab).sum(axis=2) / np.maximum((ab * ab).sum(axis=1), 1e-300), 0.0, 1.0)
+        gap = ap - t[:, :, None] * ab
+        distance = np.hypot(gap[:, :, 0], gap[:, :, 1])
+        nearest = distance.argmin(axis=1)
+        closer = distance[np.arange(len(xy)), nearest] < best
+        best[closer] = distance[closer, nearest[closer]]
+        side[closer] = first + nearest[closer]
+
+        # Even-odd rule on a ray towards +x
+        crosses = (a[None, :, 1] > xy[:, None, 1]) != (b[None, :, 1] > xy[:, None, 1])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x = a[None, :, 0] + (xy[:, None, 1] - a[None, :, 1]) * ab[None, :, 0] / ab[None, :, 1]
+        inside ^= (crosses & (xy[:, None, 0] < x)).sum(axis=1) % 2 == 1
+    return best, side, inside
+
+
+class ExcavationGrid(object):
+    """ Existing terrain heights on a regular grid around a pad, with every cell's distance from the pad
+
+    The grid depends only on the pad, the terrain and the cell size, so any number of angle and offset
+    variants are evaluated on it without touching the geometry again. Volumes are in the cubed loop
+    units, areas in the squared loop units.
+    """
+    def __init__(self, loop, terrain, cell_size, margin):
+        self.cell_size = float(cell_size)
+        self.edge_count = len(loop)
+        self.pad_z = loop[0][1][2]
+        polygon, sides = loop_polygon(loop, self.cell_size / 2)
+        lo = polygon.min(axis=0) - margin
+        hi = polygon.max(axis=0) + margin
+        # Never reach beyond the terrain, cells there have no existing height anyway
+        lo = np.maximum(lo, terrain.vertices[:, :2].min(axis=0))
+        hi = np.minimum(hi, terrain.vertices[:, :2].max(axis=0))
+        xs = np.arange(lo[0] + self.cell_size / 2, hi[0], self.cell_size)
+        ys = np.arange(lo[1] + self.cell_size / 2, hi[1], self.cell_size)
+        gx, gy = np.meshgrid(xs, ys)
+        xy = np.column_stack((gx.ravel(), gy.ravel()))
+        self.shape = gx.shape
+        self.terrain_z = terrain.heights(xy)
+        valid = ~np.isnan(self.terrain_z)
+        self.xy = xy[valid]
+        self.terrain_z = self.terrain_z[valid]
+        distance, side, inside = _distances(self.xy, polygon)
+        self.distance = np.where(inside, 0.0, distance)  # Plan distance outwards from the pad
+        self.edge = sides[side]
+
+    @property
+    def cell_area(self):
+        return self.cell_size * self.cell_size
+
+    def _gradients(self, angle):
+        """ Slope gradient of every cell, from one angle or the angle of the nearest pad edge """
+        if not hasattr(angle, "__iter__"):
+            return math.tan(math.radians(angle))
+        return np.tan(np.radians(edge_angles(angle, self.edge_count)))[self.edge]
+
+    def surfaces(self, angle, offset, fill_angle=None):
+        """ Designed cut and fill surfaces: the pad level out to offset, then slopes up and down """
+        run = np.maximum(self.distance - offset, 0.0)
+        cut = self.pad_z + run * self._gradients(angle)
+        fill = self.pad_z - run * self._gradients(angle if fill_angle is None else fill_angle)
+        return cut, fill
+
+    def volumes(self, angle, offset, fill_angle=None):
+        """ Cut and fill volumes and plan areas of one variant """
+        cut_surface, fill_surface = self.surfaces(angle, offset, fill_angle)
+        cut = np.maximum(self.terrain_z - cut_surface, 0.0)
+        fill = np.maximum(fill_surface - self.terrain_z, 0.0)
+        return {
+            "angle": angle,
+            "offset": offset,
+            "cut": float(cut.sum() * self.cell_area),
+            "fill": float(fill.sum() * self.cell_area),
+            "cut area": float(np.count_nonzero(cut) * self.cell_area),
+            "fill area": float(np.count_nonzero(fill) * self.cell_area),
+        }
+
+    def sweep(self, angles, offsets, fill_angle=None):
+        """ Volumes of every combination of angles and offsets """
+        return [self.volumes(angle, offset, fill_angle) for angle in angles for offset in offsets]
+
+
+def reach(terrain, pad_z, angles, offset):
+    """ Farthest plan distance from the pad the flattest of angles can run before it meets the terrain
+
+    angles may mix single angles and per-edge angle sequences.
+    """
+    flattest = min(np.hstack([np.ravel(a) for a in angles]))
+    depth = max(terrain.vertices[:, 2].max() - pad_z, pad_z - terrain.vertices[:, 2].min(), 0.0)
+    return offset + depth / math.tan(math.radians(flattest))
+
+
+def excavation_volumes(loop, terrain, angle, offset, cell_size, fill_angle=None):
+    """ Cut and fill volumes of one pad on a grid just large enough for its slopes """
+    margin = reach(terrain, loop[0][1][2], [angle, angle if fill_angle is None else fill_angle], offset)
+    return ExcavationGrid(loop, terrain, cell_size, margin + cell_size).volumes(angle, offset, fill_angle)
+
+
+def sweep_volumes(loop, terrain, angles, offsets, cell_size, fill_angle=None):
+    """ Volumes of every angle and offset combination, sharing one grid sized for the widest variant """
+    margin = reach(terrain, loop[0][1][2], list(angles) + ([] if fill_angle is None else [fill_angle]), max(offsets))
+    return ExcavationGrid(loop, terrain, cell_size, margin + cell_size).sweep(angles, offsets, fill_angle)
@@ -0,0 +1,98 @@
+""" Benchmark of batch curve-loop sampling against per-point Evaluate calls """
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from _curve_sampling import arc_descriptor, division_counts, line_descriptor, sample_loop
+
+
+class Line(object):
+    """ Minimal stand-in for a Revit Line with normalized Evaluate """
+    def __init__(self, p0, p1):
+        self.p0 = p0
+        self.p1 = p1
+        self.Length = math.sqrt(sum((b - a) ** 2 for a, b in zip(p0, p1)))
+
+    def Evaluate(self, t, normalized):
+        return tuple(a + t * (b - a) for a, b in zip(self.p0, self.p1))
+
+    def descriptor(self):
+        return line_descriptor(self.p0, self.p1)
+
+
+class Arc(object):
+    """ Minimal stand-in for a horizontal Revit Arc with normalized Evaluate """
+    def __init__(self, center, radius, a0, a1):
+        self.center = center
+        self.radius = radius
+        self.a0 = a0
+        self.a1 = a1
+        self.Length = radius * abs(a1 - a0)
+
+    def Evaluate(self, t, normalized):
+        a = self.a0 + t * (self.a1 - self.a0)
+        return (self.center[0] + self.radius * math.cos(a), self.center[1] + self.radius * math.sin(a), self.center[2])
+
+    def descriptor(self):
+        return arc_descriptor(self.center, self.radius, self.a0, self.a1)
+
+
+def curve_division_singular(crvs, div):
+    """ Per-point sampling as in MyWindows.CurveDivisionSingular """
+    points = [crvs.Evaluate(0, True)]
+    for i in range(div):
+        points.append(crvs.Evaluate((i + 1.0) / div, True))
+    return points
+
+
+def make_loop(edges, radius=150.0):
+    """ Closed loop of alternating straight edges and rounded corners on a wavy outline """
+    curves = []
+    step = 2 * math.pi / edges
+    for k in range(0, edges, 2):
+        a = k * step
+        r = radius * (1 + 0.1 * math.sin(7 * a))
+        p0 = (r * math.cos(a), r * math.sin(a), 0.0)
+        b = (k + 1) * step
+        corner = (r * math.cos(b), r * math.sin(b), 0.0)
+        curves.append(Line(p0, corner))
+        curves.append(Arc((corner[0] - 0.5 * math.cos(b), corner[1] - 0.5 * math.sin(b), 0.0), 0.5, b, b + step))
+    return curves[:edges]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--edges", type=int, nargs="+", default=[100, 1000, 5000, 20000])
+    parser.add_argument("--spacing", type=float, default=200 / 304.8, help="feet")
+    args = parser.parse_args()
+
+    print("{:>8} {:>10} {:>12} {:>12} {:>10} {:>12}".format("edges", "points", "evaluate", "batch", "speedup", "max error"))
+    for edges in args.edges:
+        curves = make_loop(edges, radius=max(150.0, edges * 0.2))
+        descriptors = [c.descriptor() for c in curves]
+        divisions = division_counts([c.Length for c in curves], args.spacing)
+
+        start = time.perf_counter()
+        expected = []
+        for c, div in zip(curves, divisions):
+            expected.extend(curve_division_singular(c, int(div)))
+        t_eval = time.perf_counter() - start
+
+        start = time.perf_counter()
+        points, offsets = sample_loop(descriptors, args.spacing)
+        t_batch = time.perf_counter() - start
+
+        error = np.abs(points - np.array(expected)).max()
+        if error > 1e-9:
+            raise AssertionError("Batch sampling differs from Evaluate by {}".format(error))
+        print("{:>8} {:>10} {:>12} {:>12} {:>9.1f}x {:>12.1e}".format(
+            edges, len(points), "{:.4f} s".format(t_eval), "{:.4f} s".format(t_batch), t_eval / t_batch, error))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+""" Per-stage benchmark of the headless excavation core on synthetic pads, with regression tracking """
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from _excavation_core import pad_points
+from _terrain_bvh import TerrainBVH
+from synthetic_pads import SHAPES, pad_scale, terrain_for
+
+NOISE_FLOOR = 0.005  # Seconds, stages faster than this are not checked for regressions
+
+
+def run_case(shape, edges, args):
+    scale = pad_scale(edges)
+    loop = SHAPES[shape](edges, scale)
+    vertices, triangles = terrain_for(scale)
+    best = None
+    for _ in range(args.repeat):
+        timings = {}
+        stats = {}
+        start = time.perf_counter()
+        terrain = TerrainBVH(vertices, triangles)
+        timings["terrain bvh"] = time.perf_counter() - start
+        pad_points(loop, args.angle, args.offset / 304.8, args.spacing / 304.8, terrain,
+                   vertical_tolerance=args.vertical_tolerance / 304.8 if args.vertical_tolerance else None,
+                   stats=stats, timings=timings)
+        timings["total"] = time.perf_counter() - start
+        if best is None or timings["total"] < best["timings"]["total"]:
+            best = {"edges": len(loop), "points": stats["points"], "rays": stats["rays"], "timings": timings,
+                    "points before dedup": stats["points before dedup"],
+                    "fixed spacing points": stats["fixed spacing points"]}
+    return best
+
+
+def compare(results, baseline, threshold):
+    """ Returns (case, stage, before, after) for every stage slower than the baseline by threshold """
+    regressions = []
+    for case, result in sorted(results.items()):
+        before = baseline.get(case)
+        if before is None:
+            continue
+        for stage, after in sorted(result["timings"].items()):
+            old = before["timings"].get(stage)
+            if old is not None and after > NOISE_FLOOR and after > old * (1 + threshold):
+                regressions.append((case, stage, old, after))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--shapes", nargs="+", default=sorted(SHAPES), choices=sorted(SHAPES))
+    parser.add_argument("--edges", type=int, nargs="+", default=[4, 40, 400, 4000, 10000])
+    parser.add_argument("--angle", type=float, default=45.0)
+    parser.add_argument("--offset", type=float, default=800.0, help="mm")
+    parser.add_argument("--spacing", type=float, default=200.0, help="segment_length in mm")
+    parser.add_argument("--vertical-tolerance", type=float, default=None, help="mm, enables adaptive sampling")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case, the fastest is kept")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown per stage")
+    args = parser.parse_args()
+
+    results = {}
+    stages = []
+    for shape in args.shapes:
+        for edges in args.edges:
+            case = "{}/{}".format(shape, edges)
+            results[case] = run_case(shape, edges, args)
+            for stage in results[case]["timings"]:
+                if stage not in stages:
+                    stages.append(stage)
+
+    print(("{:<18} {:>7} {:>9}" + " {:>12}" * len(stages)).format("case", "edges", "points", *stages))
+    for case, result in results.items():
+        timings = ["{:.4f}".format(result["timings"].get(stage, 0.0)) for stage in stages]
+        print(("{:<18} {:>7} {:>9}" + " {:>12}" * len(stages)).format(
+            case, result["edges"], result["points"], *timings))
+    if args.vertical_tolerance:
+        for case, result in results.items():
+            print("{}: {} adaptive points instead of {} at fixed spacing, before dedup".format(
+                case, result["points before dedup"], result["fixed spacing points"]))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for case, stage, before, after in regressions:
+            print("REGRESSION {} {}: {:.4f} s -> {:.4f} s".format(case, stage, before, after))
+        if regressions:
+            sys.exit(1)
+        print("No regressions against {}".format(args.baseline))
+
+
+if __name__ == "__main__":
+    main()
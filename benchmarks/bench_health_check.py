@@ -0,0 +1,207 @@
+""" Per-collector time and memory of the doc-synced health check on synthetic models, with regression tracking """
+import argparse
+import json
+import os
+import random
+import runpy
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+import revit_standin
+from revit_standin import Application, FilteredElementCollector, synthetic_document
+
+revit_standin.install()
+import _upload_spool
+from _change_tracker import census_state
+from _element_census import ElementCensus
+
+SCRIPT = os.path.join(os.path.dirname(BENCHMARKS), "doc-synced.py")
+JOURNAL = os.path.join(BENCHMARKS, "journals", "journal.0001.txt")  # Recording journal of the stand-in session
+NOISE_FLOOR = 0.005  # Seconds, collectors faster than this are not checked for regressions
+COLLECTORS = [
+    ("general", "general_data"),
+    ("views", "view_and_sheet_data"),
+    ("styles", "style_data"),
+    ("links", "link_import_data"),
+    ("rooms", "room_data"),
+    ("groups", "group_data"),
+    ("families", "family_data")
+]
+
+
+class EventArgs(object):
+    def __init__(self, doc):
+        self.Document = doc
+
+
+def measure(func, setup=None):
+    """ Result, seconds and peak traced memory of func(), timed in a run without tracing, setup() runs before each """
+    if setup is not None:
+        setup()
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def post_recorder(payloads):
+    """ requests module for versions of the health check that post directly, keeping the rows instead """
+    module = types.ModuleType("requests")
+
+    def post(url, json=None, **kwargs):
+        payloads.extend(json)
+        return types.SimpleNamespace(status_code=200, reason="OK")
+
+    module.post = post
+    return module
+
+
+def run_hook(script, doc, payloads):
+    """ Runs the health check as the DocumentSynchronizedWithCentral hook does, returns its globals and seconds """
+    doc.save()
+    FilteredElementCollector.passes = 0
+    requests = sys.modules.get("requests")
+    sys.modules["requests"] = post_recorder(payloads)
+    try:
+        start = time.perf_counter()
+        hook = runpy.run_path(script, init_globals={"__eventargs__": EventArgs(doc)})
+        seconds = time.perf_counter() - start
+    finally:
+        if requests is None:
+            del sys.modules["requests"]
+        else:
+            sys.modules["requests"] = requests
+    return hook, seconds, FilteredElementCollector.passes, payloads[-1]
+
+
+def stale_collectors(hook, doc, payload):
+    """ Collectors that sent earlier values, from the schedule state as the row has no such column by default """
+    if "SCHEDULE_STATE" not in hook:  # Health check without a scheduler
+        return payload.get("Stale metrics", "")
+    with open(hook["SCHEDULE_STATE"]) as f:
+        states = json.load(f).get(doc.PathName, {})
+    return ", ".join(name for name, state in sorted(states.items()) if state.get("syncs since run"))
+
+
+def extended_columns(hook, payload):
+    """ Columns of payload the push dataset does not define, while the health check leaves them off """
+    if hook.get("EXTENDED_COLUMNS", True):
+        return []
+    return sorted(c for c in payload if c in hook["VIEW_COLUMNS"] or c.endswith(" ms") or c == "Stale metrics")
+
+
+def run_case(app, elements, args, payloads):
+    build = time.perf_counter()
+    doc = synthetic_document(app, elements, args.seed, args.purge_seconds)
+    build = time.perf_counter() - build
+    os.environ["LOCALAPPDATA"] = tempfile.mkdtemp()  # Fresh spool, schedule state and metric store
+
+    hook, first, first_passes, payload = run_hook(args.script, doc, payloads)
+    result = {
+        "elements": len(doc.elements),
+        "build seconds": build,
+        "first sync": {"seconds": first, "passes": first_passes, "census": census_state(doc)},
+        "extended columns": extended_columns(hook, payload),
+        "timings": {},
+        "memory": {}
+    }
+
+    # Each collector on its own over a fresh census, so it reads every element as on a first sync
+    check = hook["RevitHealthCheck"].__new__(hook["RevitHealthCheck"])
+    _, result["timings"]["census seed"], result["memory"]["census seed"] = measure(lambda: ElementCensus(doc))
+    for name, method in COLLECTORS:
+        _, seconds, peak = measure(getattr(check, method), lambda: setattr(check, "census", ElementCensus(doc)))
+        result["timings"][name] = seconds
+        result["memory"][name] = peak
+
+    rnd = random.Random(args.seed)
+    changed = doc.change(args.changes, rnd)
+    _, seconds, passes, payload = run_hook(args.script, doc, payloads)
+    result["incremental sync"] = {"seconds": seconds, "passes": passes, "changed": changed,
+                                  "census": census_state(doc), "stale": stale_collectors(hook, doc, payload)}
+    result["timings"]["incremental sync"] = seconds
+    result["payload fields"] = len(payload)
+    return result
+
+
+def compare(results, baseline, threshold):
+    """ Returns (case, collector, before, after) for every collector slower than the baseline by threshold """
+    regressions = []
+    for case, result in sorted(results.items()):
+        before = baseline.get(case)
+        if before is None:
+            continue
+        for name, after in sorted(result["timings"].items()):
+            old = before["timings"].get(name)
+            if old is not None and after > NOISE_FLOOR and after > old * (1 + threshold):
+                regressions.append((case, name, old, after))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--elements", type=int, nargs="+", default=[10000, 100000, 500000])
+    parser.add_argument("--changes", type=int, default=200, help="element changes before the second sync")
+    parser.add_argument("--purge-seconds", type=float, default=0.0, help="time the stand-in purge analysis takes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--script", default=SCRIPT, help="health check to run, e.g. an earlier doc-synced.py from git")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown per collector")
+    args = parser.parse_args()
+
+    payloads = []
+    # Nothing is posted
+    _upload_spool.spool_upload = lambda url, row, path, compress=False, tag=None, on_sent=None: payloads.append(row)
+    app = Application(journal=JOURNAL)  # One application per session, as in Revit
+    results = {}
+    for elements in args.elements:
+        results[str(elements)] = run_case(app, elements, args, payloads)
+
+    stages = ["census seed"] + [name for name, _ in COLLECTORS]
+    print(("{:>9} {:>9}" + " {:>13}" * len(stages)).format("elements", "", *stages))
+    for case, result in results.items():
+        print(("{:>9} {:>9}" + " {:>13.4f}" * len(stages)).format(
+            case, "seconds", *[result["timings"][s] for s in stages]))
+        print(("{:>9} {:>9}" + " {:>13.1f}" * len(stages)).format(
+            "", "peak MB", *[result["memory"][s] / 1e6 for s in stages]))
+    print()
+    for case, result in results.items():
+        first, second = result["first sync"], result["incremental sync"]
+        print("{:>9} elements: first sync {:.3f} s in {} passes, incremental sync {:.3f} s in {} passes "
+              "({} changes, census {}, stale: {})".format(
+                  case, first["seconds"], first["passes"], second["seconds"], second["passes"],
+                  second["changed"], (second["census"] or {}).get("mode", "none"), second["stale"] or "none"))
+
+    extended = [(case, r["extended columns"]) for case, r in sorted(results.items()) if r["extended columns"]]
+    for case, columns in extended:
+        print("FAILED {} elements: columns outside the push dataset sent: {}".format(case, ", ".join(columns)))
+    if extended:
+        sys.exit(1)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for case, name, before, after in regressions:
+            print("REGRESSION {} {}: {:.4f} s -> {:.4f} s".format(case, name, before, after))
+        if regressions:
+            sys.exit(1)
+        print("No regressions against {}".format(args.baseline))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+""" Benchmark of the incremental journal tailer against parsing the whole journal on every sync """
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from _journal_tail import SYNC_END, SYNC_START, TIMESTAMP, JournalTail, parse_timestamp
+
+FILLER = [
+    "' 0:< ::{n}:: Delta VM: Avail -3 -> 134211744 MB, Used +3 -> 453 MB; RAM: Avail -37 -> 9898 MB\r\n",
+    "Jrn.Data \"Transaction Successful\" , \"Move\"\r\n",
+    "Jrn.MouseMove    0 ,   1015 ,    427\r\n",
+    "' [Jrn.Redraw] Rvt.Attr.ViewName: {{3D}} Rvt.Attr.ElapsedTime: 0.{n}\r\n",
+]
+
+
+def stamp(moment, kind="C"):
+    return "'{} {};   0:< \r\n".format(kind, moment.strftime("%d-%b-%Y %H:%M:%S.%f")[:-3])
+
+
+class SyntheticJournal(object):
+    """ Appends journal blocks with a sync with central every sync_every bytes on average """
+    def __init__(self, path, sync_every, seed=0):
+        self.path = path
+        self.sync_every = sync_every
+        self.rnd = random.Random(seed)
+        self.moment = datetime(2024, 3, 1, 8, 0, 0)
+        self.durations = []
+        open(path, "wb").close()
+
+    def _block(self, size):
+        lines = []
+        written = 0
+        while written < size:
+            self.moment += timedelta(milliseconds=self.rnd.randint(1, 400))
+            lines.append(stamp(self.moment, self.rnd.choice("CEH")))
+            for _ in range(self.rnd.randint(1, 6)):
+                lines.append(self.rnd.choice(FILLER).format(n=self.rnd.randint(1, 999)))
+            written += sum(len(line) for line in lines[-7:])
+        return "".join(lines)
+
+    def grow(self, size):
+        """ Appends about size bytes, ending each sync before the block ends """
+        with open(self.path, "ab") as f:
+            while size > 0:
+                text = self._block(min(size, self.rnd.randint(self.sync_every // 2, self.sync_every * 3 // 2)))
+                self.moment += timedelta(milliseconds=self.rnd.randint(1, 400))
+                start = self.moment
+                text += stamp(start, "E")
+                text += "Jrn.Command \"Ribbon\" , \"Synchronize Now , {}_SHORTCUT\"\r\n".format(SYNC_START.decode())
+                text += self._block(20000)
+                self.moment += timedelta(seconds=self.rnd.uniform(5, 240))
+                text += stamp(self.moment, "H") + "' 0:< {} \r\n".format(SYNC_END.decode())
+                self.durations.append((self.moment - start).total_seconds())
+                data = text.encode("ascii")
+                f.write(data)
+                size -= len(data)
+
+
+def full_parse(path):
+    """ Previous flow: every line of the journal is read to pair sync start and end timestamps """
+    durations = []
+    last = None
+    start = None
+    with open(path, "rb") as f:
+        for line in f:
+            match = TIMESTAMP.match(line)
+            if match:
+                last = match.group(1).decode("ascii")
+            elif SYNC_START in line:
+                start = last
+            elif SYNC_END in line and start is not None:
+                durations.append((parse_timestamp(last) - parse_timestamp(start)).total_seconds())
+                start = None
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=500, help="final journal size in MB")
+    parser.add_argument("--steps", type=int, default=10, help="syncs the journal grows over")
+    parser.add_argument("--sync-every", type=int, default=5, help="MB between syncs with central")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "journal.0001.txt")
+    journal = SyntheticJournal(path, args.sync_every << 20)
+    tail = JournalTail(path)
+    step = (args.size << 20) // args.steps
+    print("{:>8} {:>8} {:>12} {:>10}".format("MB", "syncs", "tail s", "MB read"))
+    seconds = []
+    for _ in range(args.steps):
+        journal.grow(step)
+        start = time.perf_counter()
+        tail.update()
+        seconds.append(time.perf_counter() - start)
+        print("{:>8.0f} {:>8} {:>12.3f} {:>10.1f}".format(
+            os.path.getsize(path) / 1e6, tail.count, seconds[-1], tail.bytes_read / 1e6))
+
+    start = time.perf_counter()
+    durations = full_parse(path)
+    full = time.perf_counter() - start
+    start = time.perf_counter()
+    JournalTail(path).update()
+    cold = time.perf_counter() - start
+    print("Full parse of {:.0f} MB: {:.2f} s, twice per sync before: {:.2f} s".format(
+        os.path.getsize(path) / 1e6, full, 2 * full))
+    print("Tail: {:.3f} s per sync on average, {:.2f} s for a cold read of the whole journal".format(
+        sum(seconds) / len(seconds), cold))
+    print("Stats: {}".format(tail.stats()))
+    os.remove(path)
+    if sorted(durations) != sorted(tail.durations) or len(durations) != len(journal.durations):
+        print("MISMATCH between the tail, the full parse and the synthetic journal")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
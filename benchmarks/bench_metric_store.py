@@ -0,0 +1,121 @@
+""" Benchmark of the local metric store: record time, size, trend queries and delta upload volume
+
+Every delta row is accepted by the server right away, except for a check of a rejected row at the end.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from _metric_store import DAY, MetricStore, delta_row
+from _upload_spool import BATCH_SIZE, gzip_bytes
+
+KEYS = ("user", "software", "project", "date", "dateTime")
+COUNTS = ["All views", "All sheets", "Views on sheets", "Views not on sheets", "Empty sheets", "Max views per sheet",
+          "Orphaned legends", "Materials", "Line styles", "Line patterns", "Fill patterns", "Worksets",
+          "Design options", "Imports", "CAD imports", "CAD links", "Images", "Linked Revit", "Pinned linked Revit",
+          "Room count", "Unplaced rooms", "Unenclosed rooms", "Model groups", "Model group types",
+          "Model group instances", "Unused groups", "Loaded families", "Inplace families", "Non-approved families",
+          "Unused families", "Warnings"]
+
+
+class SyntheticProject(object):
+    """ Health check rows of one model, where each sync changes a few counts """
+    def __init__(self, name, rnd):
+        self.name = name
+        self.rnd = rnd
+        self.row = dict((k, rnd.randint(0, 5000)) for k in COUNTS)
+        self.row.update({"software": "Autodesk Revit 2024", "project": name, "size": 850.0, "Room area": 12000.0,
+                         "Average views per sheet": 3.5, "Average sync time": 60})
+
+    def sync(self, moment):
+        rnd = self.rnd
+        for k in rnd.sample(COUNTS, rnd.randint(0, 4)):
+            self.row[k] = max(0, self.row[k] + rnd.randint(-3, 5))
+        self.row["size"] = round(self.row["size"] + rnd.uniform(-0.5, 1.0), 1)
+        self.row["Average sync time"] = int(max(5, self.row["Average sync time"] + rnd.randint(-5, 6)))
+        self.row["user"] = "user{}".format(rnd.randint(1, 8))
+        stamp = time.strftime("%d/%m/%Y %H:%M:%S", time.localtime(moment))
+        self.row["date"] = self.row["dateTime"] = stamp
+        return dict(self.row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--syncs-per-day", type=int, default=12)
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    path = os.path.join(tempfile.mkdtemp(), "metrics.sqlite")
+    store = MetricStore(path)
+    projects = [SyntheticProject("Project {:03d}".format(p), rnd) for p in range(args.projects)]
+    start_time = 1.7e9
+    full_json = delta_json = full_gzip = delta_gzip = 0
+    full_batch, delta_batch = [], []
+    record_seconds = []
+    syncs = 0
+    for day in range(args.days):
+        for s in range(args.syncs_per_day):
+            for project in projects:
+                moment = start_time + day * DAY + s * DAY / args.syncs_per_day
+                row = project.sync(moment)
+                begin = time.perf_counter()
+                changed = store.record(project.name, row, moment)
+                record_seconds.append(time.perf_counter() - begin)
+                full_batch.append(row)
+                delta_batch.append(delta_row(changed, row, KEYS))
+                store.accept(project.name, delta_batch[-1], moment)
+                syncs += 1
+                if len(full_batch) == BATCH_SIZE:
+                    full, delta = json.dumps(full_batch).encode(), json.dumps(delta_batch).encode()
+                    full_json += len(full)
+                    delta_json += len(delta)
+                    full_gzip += len(gzip_bytes(full))
+                    delta_gzip += len(gzip_bytes(delta))
+                    full_batch, delta_batch = [], []
+    store.close()
+
+    record_seconds.sort()
+    print("{} syncs of {} projects over {} days".format(syncs, args.projects, args.days))
+    print("Record: median {:.3f} ms, p99 {:.3f} ms".format(
+        1000 * record_seconds[len(record_seconds) // 2], 1000 * record_seconds[int(len(record_seconds) * 0.99)]))
+    print("Store: {:.1f} MB for {} samples of changes".format(
+        sum(os.path.getsize(path + s) for s in ("", "-wal") if os.path.exists(path + s)) / 1e6,
+        MetricStore(path).db.execute("SELECT COUNT(*) FROM samples").fetchone()[0]))
+    print("Upload: full rows {:.1f} MB, full gzip {:.1f} MB, delta gzip {:.1f} MB ({:.1f}x smaller than full rows)".format(
+        full_json / 1e6, full_gzip / 1e6, delta_gzip / 1e6, float(full_json) / delta_gzip))
+
+    store = MetricStore(path)
+    now = start_time + args.days * DAY
+    timings = []
+    for project in projects:
+        begin = time.perf_counter()
+        trend = store.trend(project.name, "Average sync time", 30, now)
+        timings.append(time.perf_counter() - begin)
+    timings.sort()
+    print("30 day sync time trend: median {:.2f} ms, max {:.2f} ms per project query, e.g. {}".format(
+        1000 * timings[len(timings) // 2], 1000 * timings[-1], trend))
+    project = projects[-1]
+    for values in (store.current(project.name), store.latest(project.name)):
+        if any(values[k] != v for k, v in project.row.items()):
+            print("MISMATCH between the stored and the last synced values")
+            sys.exit(1)
+
+    # A rejected row is not accepted, so its changes are sent again with the next row
+    moment = now + DAY
+    project.row["Warnings"] += 1
+    store.record(project.name, dict(project.row), moment)
+    changed = store.record(project.name, dict(project.row), moment + 60)
+    if "Warnings" not in changed:
+        print("MISMATCH: the changes of a rejected row are not sent again")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+""" Memory and time of the point pipeline with lists of XYZ objects against PointBuffer columns """
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from _chunked_apply import CHUNK_SIZE
+from _point_buffer import PointBuffer
+from _point_set import unique_points
+
+
+class Point(object):
+    """ Minimal stand-in for Revit XYZ """
+    __slots__ = ("X", "Y", "Z")
+
+    def __init__(self, x, y, z):
+        self.X = x
+        self.Y = y
+        self.Z = z
+
+
+def stage_arrays(count, seed=0):
+    """ Terrain hits, base points and segment points as the geometry core returns them """
+    rnd = np.random.RandomState(seed)
+    arrays = [rnd.uniform(0.0, 1000.0, (count // 3, 3)) for _ in range(3)]
+    arrays[1][::10] = arrays[0][::10]  # Some duplicates for the dedup stage
+    return arrays
+
+
+def xyz_pipeline(arrays, keep_every):
+    """ Previous flow: XYZ lists per stage, concatenated, deduplicated and filtered into new lists """
+    hits, base, segments = [[Point(*p) for p in a.tolist()] for a in arrays]
+    points = unique_points(hits + base + segments)
+    kept = [points[i] for i in range(0, len(points), keep_every)]
+    added = 0
+    for first in range(0, len(kept), CHUNK_SIZE):
+        added += len(kept[first:first + CHUNK_SIZE])
+    return added
+
+
+def buffer_pipeline(arrays, keep_every):
+    """ PointBuffer flow: columns per stage, XYZ objects only per AddPoints chunk """
+    points = PointBuffer.from_numpy(arrays[0])
+    for a in arrays[1:]:
+        points.extend(PointBuffer.from_numpy(a))
+    points = points.unique()
+    kept = points.take(range(0, len(points), keep_every))
+    added = 0
+    for first in range(0, len(kept), CHUNK_SIZE):
+        added += len(kept[first:first + CHUNK_SIZE].to_xyz(Point))
+    return added
+
+
+def measure(pipeline, arrays, keep_every):
+    """ Points added, seconds and peak traced memory, timed in a run without tracing as it slows Python down """
+    start = time.perf_counter()
+    added = pipeline(arrays, keep_every)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    pipeline(arrays, keep_every)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return added, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--points", type=int, default=1000000)
+    parser.add_argument("--keep-every", type=int, default=2, help="merge keeps every n-th point")
+    args = parser.parse_args()
+
+    arrays = stage_arrays(args.points)
+    results = {}
+    for name, pipeline in (("XYZ lists", xyz_pipeline), ("PointBuffer", buffer_pipeline)):
+        results[name] = measure(pipeline, arrays, args.keep_every)
+        added, seconds, peak = results[name]
+        print("{:<12} {:>9} points added  {:>8.2f} s  peak {:>8.1f} MB".format(name, added, seconds, peak / 1e6))
+    if results["XYZ lists"][0] != results["PointBuffer"][0]:
+        print("MISMATCH in the number of points added")
+        sys.exit(1)
+    old, new = results["XYZ lists"], results["PointBuffer"]
+    print("PointBuffer: {:.1f}x less peak memory, {:.2f}x the speed".format(old[2] / new[2], old[1] / new[1]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+""" Benchmark of spatial-hash point deduplication against the previous CheckForDupCoord """
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from _point_set import DEFAULT_TOLERANCE, unique_points
+
+
+class Point(object):
+    """ Minimal stand-in for Revit XYZ """
+    __slots__ = ("X", "Y", "Z")
+
+    def __init__(self, x, y, z):
+        self.X = x
+        self.Y = y
+        self.Z = z
+
+    def IsAlmostEqualTo(self, other, tolerance=DEFAULT_TOLERANCE):
+        dx = self.X - other.X
+        dy = self.Y - other.Y
+        dz = self.Z - other.Z
+        return dx * dx + dy * dy + dz * dz <= tolerance * tolerance
+
+
+def check_for_dup_coord_quadratic(listOfCoords):
+    """ Previous O(n^2) implementation of CheckForDupCoord, kept as the baseline """
+    listOfCoordsWithoutDup = []
+    for pnt in listOfCoords:
+        if len(listOfCoordsWithoutDup) == 0:
+            listOfCoordsWithoutDup.append(pnt)
+        else:
+            for p in listOfCoordsWithoutDup:
+                checkForDup = False
+                if p.IsAlmostEqualTo(pnt):
+                    checkForDup = True
+                    break
+            if checkForDup == False:
+                listOfCoordsWithoutDup.append(pnt)
+    return listOfCoordsWithoutDup
+
+
+def make_points(count, duplicate_ratio, seed=1):
+    """ Pad-like points on a 200 mm grid, with duplicates and near-duplicates on cell boundaries """
+    rnd = random.Random(seed)
+    step = 200 / 304.8
+    side = int(count ** 0.5) + 1
+    points = []
+    while len(points) < count:
+        if points and rnd.random() < duplicate_ratio:
+            p = points[rnd.randrange(len(points))]
+            jitter = DEFAULT_TOLERANCE * 0.4
+            points.append(Point(p.X + jitter, p.Y - jitter, p.Z))
+        else:
+            n = rnd.randrange(side * side)
+            points.append(Point((n % side) * step, (n // side) * step, rnd.uniform(0, 3)))
+    return points
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--duplicates", type=float, default=0.3, help="ratio of repeated points")
+    parser.add_argument("--baseline-limit", type=int, default=10000,
+                        help="largest size to run the quadratic baseline on, larger sizes are extrapolated")
+    args = parser.parse_args()
+
+    print("{:>10} {:>10} {:>14} {:>14} {:>10}".format("points", "unique", "spatial hash", "baseline", "speedup"))
+    baseline_ref = None
+    for size in args.sizes:
+        points = make_points(size, args.duplicates)
+        t_hash, result = timed(unique_points, points)
+        if size <= args.baseline_limit:
+            t_base, expected = timed(check_for_dup_coord_quadratic, points)
+            if [id(p) for p in expected] != [id(p) for p in result]:
+                raise AssertionError("Spatial hash result differs from baseline at {} points".format(size))
+            baseline_ref = (size, t_base)
+            base_txt = "{:.3f} s".format(t_base)
+        elif baseline_ref:
+            t_base = baseline_ref[1] * (float(size) / baseline_ref[0]) ** 2
+            base_txt = "~{:.0f} s est.".format(t_base)
+        else:
+            t_base = None
+            base_txt = "skipped"
+        speedup = "{:.0f}x".format(t_base / t_hash) if t_base else "-"
+        print("{:>10} {:>10} {:>14} {:>14} {:>10}".format(
+            size, len(result), "{:.3f} s".format(t_hash), base_txt, speedup))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+""" Headless benchmark of batched BVH ray-terrain intersection on a synthetic terrain """
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from _terrain_bvh import TerrainBVH, synthetic_terrain
+
+
+def slope_rays(count, half_x, half_y, center, depth, angle):
+    """ Rays leaving a rectangular pad perimeter outwards and upwards at the excavation angle """
+    s = np.linspace(0.0, 1.0, count, endpoint=False) * 4
+    side = np.floor(s).astype(int)
+    f = s - side
+    x = np.select([side == 0, side == 1, side == 2, side == 3],
+                  [-half_x + 2 * half_x * f, np.full_like(f, half_x), half_x - 2 * half_x * f, np.full_like(f, -half_x)])
+    y = np.select([side == 0, side == 1, side == 2, side == 3],
+                  [np.full_like(f, -half_y), -half_y + 2 * half_y * f, np.full_like(f, half_y), half_y - 2 * half_y * f])
+    normals = np.array([[0, -1], [1, 0], [0, 1], [-1, 0]], dtype=float)[side]
+    origins = np.column_stack((x + center[0], y + center[1], np.full_like(x, center[2] - depth)))
+    a = math.radians(angle)
+    directions = np.column_stack((normals * math.cos(a), np.full_like(x, math.sin(a))))
+    return origins, directions
+
+
+def brute_force(vertices, triangles, origins, directions):
+    """ One vectorized call per ray against all triangles, like one FindNearest per curve """
+    v0 = vertices[triangles[:, 0]]
+    e1 = vertices[triangles[:, 1]] - v0
+    e2 = vertices[triangles[:, 2]] - v0
+    distances = np.full(len(origins), np.inf)
+    for i, (o, d) in enumerate(zip(origins, directions)):
+        d = d / np.linalg.norm(d)
+        p = np.cross(d, e2)
+        det = np.einsum("ij,ij->i", e1, p)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inv = 1.0 / det
+            s = o - v0
+            u = np.einsum("ij,ij->i", s, p) * inv
+            q = np.cross(s, e1)
+            v = q.dot(d) * inv
+            t = np.einsum("ij,ij->i", e2, q) * inv
+        ok = (np.abs(det) > 1e-12) & (u >= 0) & (v >= 0) & (u + v <= 1) & (t >= 0)
+        if np.any(ok):
+            distances[i] = t[ok].min()
+    return distances
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--grid", type=int, nargs="+", default=[100, 300], help="terrain cells per side")
+    parser.add_argument("--rays", type=int, default=20000)
+    parser.add_argument("--brute-rays", type=int, default=500, help="rays checked with the per-ray baseline")
+    args = parser.parse_args()
+
+    size = 300.0  # Feet
+    center = (size / 2, size / 2, 0.0)
+    print("{:>10} {:>8} {:>10} {:>10} {:>12} {:>14} {:>10}".format(
+        "triangles", "rays", "build", "batch", "rays/s", "per-ray est.", "speedup"))
+    for n in args.grid:
+        vertices, triangles = synthetic_terrain(size, size, n, n, relief=4.0)
+        origins, directions = slope_rays(args.rays, 60.0, 40.0, center, 10.0, 45.0)
+
+        start = time.perf_counter()
+        bvh = TerrainBVH(vertices, triangles)
+        t_build = time.perf_counter() - start
+        start = time.perf_counter()
+        points, distances, _ = bvh.intersect(origins, directions)
+        t_batch = time.perf_counter() - start
+
+        sample = slice(0, min(args.brute_rays, args.rays))
+        start = time.perf_counter()
+        expected = brute_force(vertices, triangles, origins[sample], directions[sample])
+        t_brute = (time.perf_counter() - start) * args.rays / len(expected)
+        if not np.allclose(distances[sample], expected, rtol=1e-9, atol=1e-9):
+            raise AssertionError("BVH distances differ from brute force on {} triangles".format(len(triangles)))
+
+        print("{:>10} {:>8} {:>10} {:>10} {:>12.0f} {:>14} {:>9.0f}x".format(
+            len(triangles), args.rays, "{:.3f} s".format(t_build), "{:.3f} s".format(t_batch),
+            args.rays / t_batch, "{:.2f} s".format(t_brute), t_brute / t_batch))
+
+
+if __name__ == "__main__":
+    main()
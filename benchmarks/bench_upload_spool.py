@@ -0,0 +1,158 @@
+""" Hook latency and delivery of spooled health-check uploads against a local HTTP stand-in for Power BI """
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from _upload_spool import SpoolUploader, UploadSpool
+
+
+class StandIn(ThreadingHTTPServer):
+    """ Accepts lists of rows, answering 503 to the first `failures` requests
+
+    With columns given it answers 400, as a push dataset does, to rows with a column outside them.
+    """
+    daemon_threads = True
+
+    def __init__(self, failures, delay, columns=None):
+        ThreadingHTTPServer.__init__(self, ("127.0.0.1", 0), Handler)
+        self.failures = failures
+        self.delay = delay
+        self.columns = columns
+        self.rows = []
+        self.requests = 0
+        self.connections = set()
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:{}/rows".format(self.server_address[1])
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, so pooled connections are reused
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        server = self.server
+        time.sleep(server.delay)
+        rows = json.loads(body)
+        unknown = sorted(set(c for r in rows for c in r) - server.columns) if server.columns else []
+        with server.lock:
+            server.requests += 1
+            server.connections.add(self.client_address)
+            failing = server.requests <= server.failures
+            if not failing and not unknown:
+                server.rows.extend(rows)
+        text = json.dumps({"error": {"code": "InvalidRequest", "message": "Unknown columns {}".format(unknown)}})
+        text = text.encode("utf-8") if unknown and not failing else b""
+        self.send_response(503 if failing else 400 if unknown else 200)
+        self.send_header("Content-Length", str(len(text)))
+        self.end_headers()
+        self.wfile.write(text)
+
+    def log_message(self, *args):
+        pass
+
+
+def row(i):
+    return {"user": "bench", "project": "Synthetic", "size": 1024.0, "date": i, "Warnings": i % 97}
+
+
+def synchronous(url, rows):
+    """ Previous flow: one requests.post on a new connection per sync """
+    import requests
+    latencies = []
+    for r in rows:
+        start = time.perf_counter()
+        requests.post(url, json=[r])
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def spooled(worker, rows, interval):
+    """ New flow: the hook only spools the row and wakes the worker """
+    latencies = []
+    for r in rows:
+        start = time.perf_counter()
+        worker.spool.put(r, r["date"])
+        worker.notify()
+        latencies.append(time.perf_counter() - start)
+        time.sleep(interval)
+    return latencies
+
+
+def summary(name, latencies):
+    latencies = sorted(latencies)
+    print("{:<12} hook median {:>8.2f} ms  max {:>8.2f} ms".format(
+        name, 1000 * latencies[len(latencies) // 2], 1000 * latencies[-1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--syncs", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.002, help="seconds between syncs")
+    parser.add_argument("--delay", type=float, default=0.05, help="server seconds per request")
+    parser.add_argument("--failures", type=int, default=3, help="503 answers before the server recovers")
+    parser.add_argument("--batch", type=int, default=50)
+    args = parser.parse_args()
+    rows = [row(i) for i in range(args.syncs)]
+
+    server = StandIn(0, args.delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    summary("synchronous", synchronous(server.url, rows[:20]))
+    server.shutdown()
+
+    server = StandIn(args.failures, args.delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    folder = tempfile.mkdtemp()
+    accepted = []
+    worker = SpoolUploader(UploadSpool(os.path.join(folder, "spool.sqlite")), server.url,
+                           batch_size=args.batch, base_delay=0.05, max_delay=1.0,
+                           on_sent=lambda sent, tags: accepted.extend(tags))
+    worker.start()
+    start = time.perf_counter()
+    summary("spooled", spooled(worker, rows, args.interval))
+    while len(server.rows) < len(rows) and time.perf_counter() - start < 60:
+        time.sleep(0.01)
+    seconds = time.perf_counter() - start
+    worker.stop(5)
+    server.shutdown()
+
+    delivered = sorted(r["date"] for r in server.rows)
+    print("Delivered {} of {} rows in {:.2f} s: {} requests, {} failed, {} connections".format(
+        len(set(delivered)), len(rows), seconds, server.requests, worker.failures, len(server.connections)))
+    print("Worker: {}".format(worker.stats()))
+    if delivered != list(range(len(rows))):
+        print("MISMATCH: rows lost or duplicated")
+        sys.exit(1)
+    if sorted(accepted) != delivered:
+        print("MISMATCH: on_sent was not called with the tags of exactly the accepted rows")
+        sys.exit(1)
+
+    # Rows with a column the dataset does not define are refused for good, kept in the spool and logged
+    server = StandIn(0, 0.0, set(rows[0]))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    path = os.path.join(folder, "rejected.sqlite")
+    worker = SpoolUploader(UploadSpool(path), server.url, batch_size=args.batch)
+    for r in rows:
+        worker.spool.put(dict(r, **{"census ms": 3}))
+    worker.flush()
+    server.shutdown()
+    with open(os.path.join(folder, "rejected_rejected.log")) as f:
+        logged = sum(len(json.loads(line)) for line in f.read().splitlines()[1::2])
+    counts = worker.spool.counts()
+    print("Refused by the schema: {} rows kept as failed, {} logged".format(counts["failed"], logged))
+    if counts != {"pending": 0, "failed": len(rows)} or logged != len(rows) or "census ms" not in worker.last_error:
+        print("MISMATCH: refused rows were not all kept and logged with the server's reason")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
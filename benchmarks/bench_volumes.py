@@ -0,0 +1,78 @@
+""" Benchmark of the raster cut/fill engine: accuracy on a flat terrain and speed of parameter sweeps """
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from _terrain_bvh import TerrainBVH, synthetic_terrain
+from _volumes import ExcavationGrid, reach, sweep_volumes
+from synthetic_pads import SHAPES, pad_scale, terrain_for
+
+
+def flat_cut_volume(width, depth, height, offset, angle, steps=200001):
+    """ Cut volume of a rectangular pad height below a flat terrain, for the distance-field model
+
+    The level bottom and the slope follow the plan distance from the pad, so their corners are round.
+    """
+    run = height / math.tan(math.radians(angle))
+    rho = np.linspace(0.0, offset + run, steps)
+    h = np.where(rho <= offset, height, height - (rho - offset) * math.tan(math.radians(angle)))
+    perimeter = 2 * (width + depth) + 2 * math.pi * rho
+    y = h * perimeter
+    return width * depth * height + float(((y[1:] + y[:-1]) / 2 * np.diff(rho)).sum())
+
+
+def check_accuracy(cell_size):
+    loop = SHAPES["rectangular"](4)
+    terrain = TerrainBVH(*synthetic_terrain(400.0, 400.0, 20, 20, origin=(-140.0, -160.0, 0.0), relief=0.0))
+    worst = 0.0
+    for angle in (30.0, 45.0, 60.0):
+        for offset in (0.0, 2.6, 6.0):
+            grid = ExcavationGrid(loop, terrain, cell_size, reach(terrain, -8.0, [angle], offset) + cell_size)
+            cut = grid.volumes(angle, offset)["cut"]
+            exact = flat_cut_volume(120.0, 80.0, 8.0, offset, angle)
+            worst = max(worst, abs(cut / exact - 1))
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--shapes", nargs="+", default=sorted(SHAPES), choices=sorted(SHAPES))
+    parser.add_argument("--edges", type=int, default=40)
+    parser.add_argument("--cell", type=float, default=1.0, help="cell size in feet")
+    parser.add_argument("--angles", type=int, default=20, help="angle variants between 30 and 70 degrees")
+    parser.add_argument("--offsets", type=int, default=20, help="offset variants between 0 and 10 feet")
+    args = parser.parse_args()
+
+    error = check_accuracy(args.cell)
+    print("Flat terrain: largest relative cut error {:.4%} at {} ft cells".format(error, args.cell))
+
+    angles = np.linspace(30.0, 70.0, args.angles).tolist()
+    offsets = np.linspace(0.0, 10.0, args.offsets).tolist()
+    print("{:<12} {:>9} {:>10} {:>10} {:>14} {:>14}".format(
+        "shape", "variants", "grid s", "sweep s", "cut min ft3", "cut max ft3"))
+    for shape in args.shapes:
+        scale = pad_scale(args.edges)
+        loop = SHAPES[shape](args.edges, scale)
+        terrain = TerrainBVH(*terrain_for(scale))
+        start = time.perf_counter()
+        grid = ExcavationGrid(loop, terrain, args.cell,
+                              reach(terrain, loop[0][1][2], angles, max(offsets)) + args.cell)
+        built = time.perf_counter()
+        results = grid.sweep(angles, offsets)
+        done = time.perf_counter()
+        cuts = [r["cut"] for r in results]
+        print("{:<12} {:>9} {:>10.3f} {:>10.3f} {:>14.0f} {:>14.0f}".format(
+            shape, len(results), built - start, done - built, min(cuts), max(cuts)))
+
+    start = time.perf_counter()
+    sweep_volumes(SHAPES["curved"](args.edges), TerrainBVH(*terrain_for(1.0)), angles, offsets, args.cell)
+    print("sweep_volumes end to end: {:.3f} s".format(time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
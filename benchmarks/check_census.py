@@ -0,0 +1,143 @@
+""" Randomized check of the incremental element census against a fresh census after every sync
+
+Local changes raise DocumentChanged, changes received from other users through a sync do not. With
+document versions (Revit 2023 and later) the census must match a fresh one after every sync without
+any collector pass. Without them it follows the events, and the element count check on every
+CHECK_EVERY-th sync catches received changes that alter the element count. There the census must
+match a fresh one whenever no received change is waiting for that check, and the syncs in between
+must do no collector pass.
+"""
+import argparse
+import os
+import random
+import sys
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+import revit_standin
+from revit_standin import (Application, BuiltInCategory, Document, Family, FilteredElementCollector,
+                           RevitLinkInstance, Room, View, ViewType, synthetic_document)
+
+revit_standin.install()
+import _doc_cache
+from _change_tracker import CHECK_EVERY, RECOUNT_EVERY, census_state, current_census, track_changes
+from _doc_cache import document_cache
+from _element_census import CENSUS_CATEGORIES, CENSUS_CLASSES, ElementCensus
+
+VERSIONED = ("none", "same count", "new elements")  # Changes received from other users before a sync
+READS = [
+    ("rooms", BuiltInCategory.OST_Rooms, lambda r: (r.Area, bool(r.Location))),
+    ("views", BuiltInCategory.OST_Views, lambda v: v.ViewType),
+    ("families", Family, lambda f: f.IsInPlace),
+    ("links pinned", RevitLinkInstance, lambda i: i.Pinned)
+]
+
+
+def snapshot(census):
+    """ Ids of every census category and class and the values of READS, comparable between censuses """
+    result = {}
+    for source in CENSUS_CATEGORIES + CENSUS_CLASSES:
+        result[getattr(source, "__name__", source)] = sorted(census.ids(source))
+    for key, source, read in READS:
+        result[key] = sorted(census.read(key, source, read), key=repr)
+    return result
+
+
+def census_changes(doc, rnd, count, keep_count=False):
+    """ Adds, deletes and modifies about count census elements, returns (added, modified, deleted)
+
+    With keep_count every deleted element is replaced by a new one, so the element count stays the same.
+    """
+    added, modified, deleted = [], [], []
+    candidates = [e for e in doc.elements.values() if isinstance(e, (Room, View, Family, RevitLinkInstance))]
+    for _ in range(count):
+        action = rnd.random()
+        element = candidates.pop(rnd.randrange(len(candidates)))
+        if keep_count and action < 0.5 or not keep_count and action < 0.25:
+            new = rnd.choice([
+                lambda: doc.new(Room, BuiltInCategory.OST_Rooms, "Room", Area=rnd.uniform(5, 80), Location=object()),
+                lambda: doc.new(View, BuiltInCategory.OST_Views, "View", ViewType=ViewType.FloorPlan, IsTemplate=False),
+                lambda: doc.new(Family, None, "Family", IsInPlace=rnd.random() < 0.5)])()
+            added.append(new.Id.Value)
+        if action < 0.5 and (keep_count or action >= 0.25):
+            del doc.elements[element.Id.Value]
+            deleted.append(element.Id.Value)
+        elif action >= 0.5:
+            if isinstance(element, Room):
+                element.Area = rnd.choice([0.0, rnd.uniform(5, 80)])
+            elif isinstance(element, View):
+                element.ViewType = rnd.choice([ViewType.FloorPlan, ViewType.Legend, ViewType.Section])
+            elif isinstance(element, Family):
+                element.IsInPlace = not element.IsInPlace
+            else:
+                element.Pinned = not element.Pinned
+            modified.append(element.Id.Value)
+    return added, modified, deleted
+
+
+def run_case(failures, app, label, args, received):
+    rnd = random.Random(args.seed)
+    doc = synthetic_document(app, args.elements, args.seed)
+    track_changes(app)
+    cache = document_cache(doc, lambda d: None)
+    cache.watch(app)
+    doc.save()
+    current_census(doc)
+    waiting = 0  # Syncs with received changes the element count check has not caught yet
+    for sync in range(1, args.syncs + 1):
+        doc.record(*census_changes(doc, rnd, rnd.randint(0, args.changes)))
+        kind = rnd.choice(received)
+        if kind == "same count":
+            doc.record(*census_changes(doc, rnd, rnd.randint(1, args.changes), keep_count=True), event=False)
+        elif kind == "new elements":
+            doc.record([doc.new(Room, BuiltInCategory.OST_Rooms, "Room", Area=10.0, Location=object()).Id.Value],
+                       [], [], event=False)
+        doc.save()
+        FilteredElementCollector.passes = 0
+        census = current_census(doc)
+        passes = FilteredElementCollector.passes
+        mode = census_state(doc)["mode"]
+        checked = received == VERSIONED or sync % CHECK_EVERY == 0 or sync % RECOUNT_EVERY == 0
+        if kind != "none" and not checked:
+            waiting += 1
+        elif checked:
+            waiting = 0
+        if not waiting and snapshot(census) != snapshot(ElementCensus(doc)):
+            failures.append("{} sync {}: census differs from a fresh one after {} received changes ({})".format(
+                label, sync, kind, mode))
+        if passes and not (checked and received != VERSIONED):
+            failures.append("{} sync {}: {} collector passes ({})".format(label, sync, passes, mode))
+    doc.close()
+    if census_state(doc) is not None or doc in _doc_cache._caches or cache._handler in app.DocumentChanged.handlers:
+        failures.append("{}: DocumentClosing left the census or the document cache behind".format(label))
+    print("{}: {} syncs, last census by {}".format(label, args.syncs, mode))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--elements", type=int, default=20000)
+    parser.add_argument("--syncs", type=int, default=40)
+    parser.add_argument("--changes", type=int, default=30, help="most census changes per sync")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    failures = []
+    app = Application()  # One application per session, as in Revit
+    run_case(failures, app, "Revit 2023 and later", args, VERSIONED)
+    get_version = Document.__dict__["GetDocumentVersion"]
+    get_changes = Document.__dict__["GetChangedElements"]
+    del Document.GetDocumentVersion, Document.GetChangedElements  # Revit 2021 and 2022
+    try:
+        run_case(failures, app, "Revit 2022", args, ("none", "new elements"))
+    finally:
+        Document.GetDocumentVersion = get_version
+        Document.GetChangedElements = get_changes
+    for failure in failures:
+        print("FAILED {}".format(failure))
+    if failures:
+        sys.exit(1)
+    print("Census checks passed")
+
+
+if __name__ == "__main__":
+    main()
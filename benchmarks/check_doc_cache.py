@@ -0,0 +1,86 @@
+""" Checks the document lookup cache against stand-in documents, with and without document versions """
+import os
+import sys
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+import revit_standin
+from revit_standin import Application, BuiltInCategory, Document, DocumentChangedEventArgs, View
+
+revit_standin.install()
+import _doc_cache
+from _doc_cache import document_cache, is_valid_element, release_document_cache, revit_document_version
+
+
+def find_view(name):
+    def find(document):
+        for element in document.elements.values():
+            if isinstance(element, View) and element.Name == name:
+                return element
+    return find
+
+
+def run_case(failures, label):
+    app = Application()
+    doc = Document(app, "C:\\Projects\\Cache.rvt")
+    doc.new(View, BuiltInCategory.OST_Views, "{3D}")
+    cache = document_cache(doc, revit_document_version)
+    cache.watch(app)
+    cache.watch(app)  # A second watch must not add a second handler
+
+    def expect(name, condition):
+        if not condition:
+            failures.append("{}: {}".format(label, name))
+
+    view = cache.get(("3D view", "{3D}"), find_view("{3D}"), is_valid_element)
+    expect("first lookup finds the view", view is not None and view.Name == "{3D}")
+    cache.get(("3D view", "{3D}"), find_view("{3D}"), is_valid_element)
+    expect("repeated lookup is a hit", cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1)
+    expect("one DocumentChanged handler", len(app.DocumentChanged.handlers) == 1)
+
+    app.DocumentChanged.raise_event(app, DocumentChangedEventArgs(doc, [], [view.Id.Value], []))
+    cache.get(("3D view", "{3D}"), find_view("{3D}"), is_valid_element)
+    expect("DocumentChanged clears the cache", cache.stats()["misses"] == 2)
+
+    other = Document(app, "C:\\Projects\\Other.rvt")
+    app.DocumentChanged.raise_event(app, DocumentChangedEventArgs(other, [1], [], []))
+    cache.get(("3D view", "{3D}"), find_view("{3D}"), is_valid_element)
+    expect("changes of another document keep the cache", cache.stats()["misses"] == 2)
+
+    doc.save()
+    cache.get(("3D view", "{3D}"), find_view("{3D}"), is_valid_element)
+    versions = revit_document_version(doc) is not None
+    expect("a save clears the cache only with document versions", cache.stats()["misses"] == (3 if versions else 2))
+
+    del doc.elements[view.Id.Value]  # Deleted without an event reaching the cache
+    replacement = doc.new(View, BuiltInCategory.OST_Views, "{3D}")
+    found = cache.get(("3D view", "{3D}"), find_view("{3D}"), lambda v: v.Id.Value in doc.elements)
+    expect("a deleted element is looked up again", found is replacement)
+
+    release_document_cache(doc)
+    expect("release unhooks DocumentChanged", not app.DocumentChanged.handlers)
+    expect("release forgets the cache", doc not in _doc_cache._caches)
+    print("{}: {}".format(label, cache.stats()))
+
+
+def main():
+    failures = []
+    run_case(failures, "Revit 2023 and later")
+    get_version = Document.__dict__["GetDocumentVersion"]
+    del Document.GetDocumentVersion  # Revit 2021 and 2022 have no document versions
+    try:
+        doc = Document(Application(), "C:\\Projects\\Old.rvt")
+        if revit_document_version(doc) is not None:
+            failures.append("Revit 2022: version token without GetDocumentVersion")
+        run_case(failures, "Revit 2022")
+    finally:
+        Document.GetDocumentVersion = get_version
+    for failure in failures:
+        print("FAILED {}".format(failure))
+    if failures:
+        sys.exit(1)
+    print("Document cache checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+""" Checks that MyWindows.compute_points gives the points of the geometry core, with and without NumPy
+
+script.py runs on the Revit, pyRevit and WPF stand-ins, once as under IronPython with NumPy blocked,
+so the core runs its plain Python code, and once with NumPy, on synthetic pads and on pads with a
+spline edge, which is tessellated into lines. Both must give the points of pad_points with NumPy,
+with the same number of leading required points, and a second run must reuse every edge from the
+edge cache. The fixed spacing point count of an adaptive run must be what a fixed spacing run
+gives. The topography merge must skip and simplify as many points as merge_points with NumPy. Pads
+with Excavation angle/offset parameters of every storage type must give the
+points of batch_pad_points with the values in degrees and mm, other parameters must be refused.
+"""
+import argparse
+import importlib.util
+import math
+import os
+import sys
+import types
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+sys.path.insert(0, ROOT)
+import excavation_standin
+from excavation_standin import BuildingPad, PadParameter, SpecTypeId, StorageType, excavation_document
+
+excavation_standin.install()
+from revit_standin import Application
+from _curve_sampling import LINE, line_descriptor
+from _excavation_core import batch_pad_points, pad_points
+from _point_set import PointSet
+from _terrain_bvh import TerrainBVH
+from _topo_merge import merge_points
+from synthetic_pads import SHAPES, pad_scale, terrain_for
+
+SCRIPT = os.path.join(ROOT, "script.py")
+MATCH_TOLERANCE = 1e-6  # Feet, points of both paths closer than this are the same point
+SPLINE_SEGMENTS = 8  # Lines the spline edge is tessellated into
+SPLINE_BULGE = 0.05  # Of the edge length, outwards
+# Excavation angle and offset parameters of the pads, with the degrees and mm they stand for
+PAD_PARAMETERS = [
+    ((math.radians(30.0), StorageType.Double, SpecTypeId.Angle), (1.5, StorageType.Double, SpecTypeId.Length),
+     30.0, 457.2),
+    (("30;60;45;60", StorageType.String, SpecTypeId.String), (600, StorageType.Integer, SpecTypeId.Number),
+     [30.0, 60.0, 45.0, 60.0], 600),
+    ((40.0, StorageType.Double, SpecTypeId.Number), None, 40.0, None),
+]
+REFUSED_PARAMETERS = [
+    (None, ("800", StorageType.String, SpecTypeId.String)),
+    ((0.5, StorageType.Double, SpecTypeId.Slope), None),
+    ((0.5, StorageType.Double, SpecTypeId.Length), None),
+]
+VERTICAL_TOLERANCE = 30.0  # mm, of the adaptive sampling case
+MERGE_BUDGET = 2000  # Points the merge case keeps
+TERRAIN_POINTS = 200  # Vertices of the terrain the merge case adds, the merge must skip them
+MODES = ("IronPython", "NumPy")
+
+
+def load_script(doc, mode):
+    """ script.py as a module working on doc, in IronPython mode it and the local modules see no NumPy """
+    local = dict((name, module) for name, module in sys.modules.items()
+                 if os.path.dirname(os.path.abspath(getattr(module, "__file__", None) or os.sep)) == ROOT)
+    saved_numpy = sys.modules.get("numpy")
+    if mode == "IronPython":
+        for name in local:
+            del sys.modules[name]
+        sys.modules["numpy"] = None  # import numpy raises ImportError
+    try:
+        spec = importlib.util.spec_from_file_location("excavation_script", SCRIPT)
+        module = importlib.util.module_from_spec(spec)
+        module.__revit__ = types.SimpleNamespace(ActiveUIDocument=types.SimpleNamespace(Document=doc))
+        spec.loader.exec_module(module)
+    finally:
+        sys.modules["numpy"] = saved_numpy
+        sys.modules.update(local)
+    expected = "python" if mode == "IronPython" else "numpy"
+    if module.BACKEND != expected:
+        raise RuntimeError("script.py runs the {} core in {} mode".format(module.BACKEND, mode))
+    return module
+
+
+def with_spline(loop, index=0):
+    """ Loop with the line at index replaced by a spline bulging outwards, the loop of its tessellated
+    lines, and the index of the curve each of those comes from
+    """
+    kind, p0, p1 = loop[index][:3]
+    assert kind == LINE
+    dx, dy = p1[0] - p0[0], p1[1] - p0[1]
+    length = math.hypot(dx, dy)
+    nx, ny = dy / length, -dx / length  # Outwards of a counterclockwise loop
+    points = []
+    for k in range(SPLINE_SEGMENTS + 1):
+        t = float(k) / SPLINE_SEGMENTS
+        bulge = SPLINE_BULGE * length * math.sin(math.pi * t)
+        points.append((p0[0] + t * dx + bulge * nx, p0[1] + t * dy + bulge * ny, p0[2]))
+    lines = [line_descriptor(a, b) for a, b in zip(points, points[1:])]
+    spline = list(loop)
+    spline[index] = ("spline", points)
+    curve = [i for i in range(len(loop)) for _ in range(len(lines) if i == index else 1)]
+    return spline, loop[:index] + lines + loop[index + 1:], curve
+
+
+def unmatched(points, others):
+    """ Number of points with no point of others within MATCH_TOLERANCE """
+    existing = PointSet(MATCH_TOLERANCE)
+    for p in others:
+        existing.add(*p)
+    return sum(1 for p in points if tuple(p) not in existing)
+
+
+def run_case(failures, shape, edges, angle, spline, mode, args, vertical_tolerance=None):
+    label = "{} {}/{}{} angle {}{}".format(mode, shape, edges, " spline" if spline else "", angle,
+                                          " within {} mm".format(vertical_tolerance) if vertical_tolerance else "")
+    scale = pad_scale(edges)
+    loop = SHAPES[shape](edges, scale)
+    if angle == "per edge":
+        angle = [30.0 + 30.0 * (i % 2) for i in range(len(loop))]
+    core_loop, core_angle = loop, angle
+    if spline:
+        loop, core_loop, curve = with_spline(loop)
+        if isinstance(angle, list):
+            core_angle = [angle[i] for i in curve]
+    vertices, triangles = terrain_for(scale)
+    stats = {}
+    fixed = {}
+    terrain = TerrainBVH(vertices, triangles)
+    core = pad_points(core_loop, core_angle, args.offset / 304.8, args.spacing / 304.8, terrain,
+                      vertical_tolerance=vertical_tolerance / 304.8 if vertical_tolerance else None,
+                      stats=stats).tolist()
+    pad_points(core_loop, core_angle, args.offset / 304.8, args.spacing / 304.8, terrain, stats=fixed)
+
+    doc, pad, topography = excavation_document(Application(), loop, vertices, triangles)
+    module = load_script(doc, mode)
+    runs = []
+    for _ in range(2):  # The second run reads every edge from the edge cache
+        points, _, sampling = module.MyWindows().compute_points(pad, topography, angle, args.offset, args.spacing,
+                                                                vertical_tolerance)
+        runs.append((list(points), sampling))
+    (revit, sampling), (again, cached) = runs
+
+    def expect(name, condition):
+        if not condition:
+            failures.append("{}: {}".format(label, name))
+
+    missing, extra = unmatched(core, revit), unmatched(revit, core)
+    expect("{} core points missing, {} extra points".format(missing, extra), not missing and not extra)
+    expect("{} points instead of {}".format(len(revit), len(core)), len(revit) == len(core))
+    expect("{} required points instead of {}".format(sampling["required points"], stats["required points"]),
+           sampling["required points"] == stats["required points"])
+    expect("{} fixed spacing points instead of {}".format(sampling["fixed spacing points"],
+                                                          fixed["points before dedup"]),
+           sampling["fixed spacing points"] == cached["fixed spacing points"] == fixed["points before dedup"])
+    expect("cached run differs", again == revit and cached["required points"] == sampling["required points"])
+    expect("{} of {} edges reused".format(cached["cache"]["hits"], len(core_loop)),
+           cached["cache"]["hits"] == len(core_loop) and not cached["cache"]["misses"])
+    print("{}: {} points, {} required, {} edges reused".format(label, len(revit), sampling["required points"],
+                                                              cached["cache"]["hits"]))
+
+
+def pad_parameters(angle, offset):
+    """ PadParameters of a pad with the given angle and offset (value, storage, spec), None leaves one out """
+    parameters = {}
+    for name, parameter in (("Excavation angle", angle), ("Excavation offset", offset)):
+        if parameter is not None:
+            parameters[name] = PadParameter(name, *parameter)
+    return parameters
+
+
+def run_merge_case(failures, mode, args):
+    label = "{} topography merge".format(mode)
+    scale = pad_scale(4)
+    loop = SHAPES["rectangular"](4, scale)
+    vertices, triangles = terrain_for(scale)
+    doc, pad, topography = excavation_document(Application(), loop, vertices, triangles)
+    module = load_script(doc, mode)
+    window = module.MyWindows()
+    points, _, sampling = window.compute_points(pad, topography, 45, args.offset, args.spacing)
+    points.extend(module.PointBuffer.from_coords(vertices[:TERRAIN_POINTS].tolist()))
+    required = sampling["required points"]
+    kept, merge = window.merge_with_topography(points, topography, max_points=MERGE_BUDGET, required=required)
+    stats = {}
+    core = merge_points(points.numpy(), TerrainBVH(vertices, triangles), module.MERGE_TOLERANCE / 304.8, MERGE_BUDGET,
+                        stats, required)
+    if merge != stats or len(kept) != len(core):
+        failures.append("{}: {} instead of {}".format(label, merge, stats))
+    if list(kept[:required]) != list(points[:required]):
+        failures.append("{}: required points were not kept first".format(label))
+    print("{}: {} added, {} skipped, {} simplified".format(label, merge["added"], merge["skipped"],
+                                                          merge["simplified"]))
+
+
+def flat(settings):
+    """ Angle and offset of pad settings as one list, per-edge angles spread out """
+    return [v for value in settings for v in (value if isinstance(value, list) else [value])]
+
+
+def run_parameters_case(failures, mode, args):
+    label = "{} pad parameters".format(mode)
+    scale = pad_scale(4)
+    loop = SHAPES["rectangular"](4, scale)
+    vertices, triangles = terrain_for(scale)
+    doc, _, topography = excavation_document(Application(), loop, vertices, triangles)
+    module = load_script(doc, mode)
+    window = module.MyWindows()
+    pads = []
+    jobs = []
+    for angle, offset, degrees, mm in PAD_PARAMETERS:
+        pads.append(doc.new(BuildingPad, None, "Pad", loop=loop, parameters=pad_parameters(angle, offset)))
+        settings = window.get_pad_settings(pads[-1], 45, args.offset)
+        expected = [degrees, args.offset if mm is None else mm]
+        got, want = flat(settings), flat(expected)
+        if len(got) != len(want) or any(abs(a - b) > 1e-9 for a, b in zip(got, want)):
+            failures.append("{}: settings {} instead of {}".format(label, settings, expected))
+        jobs.append({"loop": loop, "angle": expected[0], "offset": expected[1] / 304.8,
+                     "spacing": args.spacing / 304.8})
+    stats = {}
+    core, _ = batch_pad_points(jobs, TerrainBVH(vertices, triangles), processes=1, stats=stats)
+    sampling = {}
+    points = list(window.compute_batch_points(pads, topography, 45, args.offset, args.spacing, processes=1,
+                                              sampling=sampling))
+    missing, extra = unmatched(core.tolist(), points), unmatched(points, core.tolist())
+    if missing or extra or len(points) != len(core):
+        failures.append("{}: {} points, {} core points missing, {} extra points".format(label, len(points), missing,
+                                                                                     extra))
+    for name in ("required points", "fixed spacing points"):
+        if sampling[name] != stats[name]:
+            failures.append("{}: {} {} instead of {}".format(label, sampling[name], name, stats[name]))
+    for angle, offset in REFUSED_PARAMETERS:
+        pad = doc.new(BuildingPad, None, "Pad", loop=loop, parameters=pad_parameters(angle, offset))
+        try:
+            window.get_pad_settings(pad, 45, args.offset)
+        except ValueError:
+            continue
+        failures.append("{}: {} accepted".format(label, [p for p in (angle, offset) if p][0]))
+    print("{}: {} points, {} required, {} parameters refused".format(label, len(points), sampling["required points"],
+                                                                   len(REFUSED_PARAMETERS)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--shapes", nargs="+", default=sorted(SHAPES), choices=sorted(SHAPES))
+    parser.add_argument("--edges", type=int, nargs="+", default=[4, 40])
+    parser.add_argument("--offset", type=float, default=800.0, help="mm")
+    parser.add_argument("--spacing", type=float, default=200.0, help="segment_length in mm")
+    args = parser.parse_args()
+
+    failures = []
+    for mode in MODES:
+        for shape in args.shapes:
+            for edges in args.edges:
+                for angle in (45, "per edge"):
+                    run_case(failures, shape, edges, angle, False, mode, args)
+            if shape != "curved":  # Curved pads have no line to turn into a spline
+                run_case(failures, shape, min(args.edges), "per edge", True, mode, args)
+        run_case(failures, "l-shaped", min(args.edges), "per edge", False, mode, args, VERTICAL_TOLERANCE)
+        run_parameters_case(failures, mode, args)
+        run_merge_case(failures, mode, args)
+    for failure in failures:
+        print("FAILED {}".format(failure))
+    if failures:
+        sys.exit(1)
+    print("MyWindows.compute_points matches the geometry core with and without NumPy")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+""" Check of the journal tail against the recorded journals in benchmarks/journals
+
+Every journal.*.txt there has a journal.*.json next to it with the sync with central durations in
+seconds and the start of a sync still open at the end. The tail must find exactly those, read in one
+update, in random increments that split lines, and with several journals tailed in turn through one
+state folder, where every journal must keep its own offset.
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+from _journal_tail import JournalTail, load_tail, sync_statistics
+
+JOURNALS = os.path.join(BENCHMARKS, "journals")
+
+
+def recorded_journals():
+    """ (name, bytes, expected) of every recorded journal """
+    journals = []
+    for path in sorted(glob.glob(os.path.join(JOURNALS, "journal.*.txt"))):
+        with open(path, "rb") as f:
+            data = f.read()
+        with open(os.path.splitext(path)[0] + ".json") as f:
+            journals.append((os.path.basename(path), data, json.load(f)))
+    return journals
+
+
+def compare(name, tail, expected, failures):
+    found = [round(d, 3) for d in tail.durations]
+    if found != expected["syncs"] or tail.open_start != expected["open"]:
+        failures.append("{}: found {} open {}, expected {} open {}".format(
+            name, found, tail.open_start, expected["syncs"], expected["open"]))
+
+
+def pieces(data, rnd):
+    """ data cut at random positions, mostly inside lines """
+    cuts = sorted(rnd.sample(range(1, len(data)), min(len(data) - 1, rnd.randint(1, 40))))
+    return [data[a:b] for a, b in zip([0] + cuts, cuts + [len(data)])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=50, help="random increment orders per journal")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rnd = random.Random(args.seed)
+
+    journals = recorded_journals()
+    if not journals:
+        print("FAILED no recorded journals in {}".format(JOURNALS))
+        sys.exit(1)
+    folder = tempfile.mkdtemp()
+    failures = []
+    try:
+        for name, data, expected in journals:
+            path = os.path.join(folder, name)
+            with open(path, "wb") as f:
+                f.write(data)
+            tail = JournalTail(path)
+            tail.update()
+            compare(name + " whole", tail, expected, failures)
+
+            for _ in range(args.rounds):
+                tail = JournalTail(path)
+                with open(path, "wb") as f:
+                    for piece in pieces(data, rnd):
+                        f.write(piece)
+                        f.flush()
+                        tail = JournalTail.from_dict(tail.to_dict())  # Saved and loaded between syncs
+                        tail.update()
+                compare(name + " in increments", tail, expected, failures)
+                if tail.offset != len(data):
+                    failures.append("{}: stopped at byte {} of {}".format(name, tail.offset, len(data)))
+
+        # Sessions tailed in turn through one state folder, every journal written in increments
+        states = os.path.join(folder, "states")
+        os.makedirs(states)
+        sessions = []
+        for i in range(3):
+            for name, data, expected in journals:
+                path = os.path.join(folder, "session{}".format(i), name)
+                os.makedirs(os.path.dirname(path))
+                open(path, "wb").close()
+                sessions.append((path, pieces(data, rnd), expected, [0]))
+        while any(parts for _, parts, _, _ in sessions):
+            path, parts, expected, written = rnd.choice([s for s in sessions if s[1]])
+            with open(path, "ab") as f:
+                f.write(parts.pop(0))
+            offset = load_tail(path, states).offset
+            sync_statistics(path, states)
+            tail = load_tail(path, states)
+            if tail.offset < offset:
+                failures.append("{}: offset went back from {} to {}".format(path, offset, tail.offset))
+            written[0] += tail.offset - offset
+        for path, _, expected, written in sessions:
+            tail = load_tail(path, states)
+            compare(path, tail, expected, failures)
+            if written[0] != os.path.getsize(path):
+                failures.append("{}: read {} bytes of {}".format(path, written[0], os.path.getsize(path)))
+        if len(os.listdir(states)) != len(sessions):
+            failures.append("{} state files for {} journals".format(len(os.listdir(states)), len(sessions)))
+
+        # A new journal under the same name, its syncs written past the old offset before the next read
+        path, _, expected, _ = sessions[0]
+        with open(path, "rb") as f:
+            data = f.read()
+        with open(path, "wb") as f:
+            f.write(b"' 0:< started recording journal file\r\n" * (len(data) // 20) + data)
+        sync_statistics(path, states)
+        compare(path + " replaced", load_tail(path, states), expected, failures)
+    finally:
+        shutil.rmtree(folder)
+
+    for failure in failures:
+        print("FAILED " + failure)
+    if failures:
+        sys.exit(1)
+    print("{} recorded journals: durations match whole, in {} increment orders and across sessions".format(
+        len(journals), args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+""" In-memory stand-in for the Revit geometry, pyRevit and WPF parts script.py uses, on top of revit_standin
+
+install() adds lines, arcs, splines, curve loops, pads and topography meshes to the Autodesk.Revit.DB
+stand-in and registers pyrevit, wpf and System.Windows, so MyWindows computes points on a plain Python 3.
+"""
+import math
+import os
+import sys
+import tempfile
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import revit_standin
+from revit_standin import BuiltInCategory, Element, ElementId, View
+from _curve_sampling import ARC, LINE
+
+# Internal units, feet and radians, per unit
+INTERNAL_PER = {"Feet": 1.0, "Millimeters": 1 / 304.8, "Centimeters": 1 / 30.48, "Meters": 1 / 0.3048,
+                "SquareMeters": 1 / 0.3048 ** 2, "CubicMeters": 1 / 0.3048 ** 3, "Degrees": math.pi / 180}
+
+
+class XYZ(object):
+    __slots__ = ("X", "Y", "Z")
+
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.X = float(x)
+        self.Y = float(y)
+        self.Z = float(z)
+
+    def tuple(self):
+        return self.X, self.Y, self.Z
+
+
+class Curve(object):
+    def GetEndPoint(self, index):
+        return XYZ(*self.point(float(index)))
+
+
+class Line(Curve):
+    def __init__(self, start, end):
+        self.start = tuple(start)
+        self.end = tuple(end)
+
+    def point(self, t):
+        return tuple(a + t * (b - a) for a, b in zip(self.start, self.end))
+
+    def descriptor(self):
+        return LINE, self.start, self.end
+
+
+class Arc(Curve):
+    """ Points are center + radius * (cos a * XDirection + sin a * YDirection) for a between the end parameters """
+    def __init__(self, center, radius, a0, a1, x, y):
+        self.Center = XYZ(*center)
+        self.Radius = radius
+        self._angles = (a0, a1)
+        self.XDirection = XYZ(*x)
+        self.YDirection = XYZ(*y)
+
+    def GetEndParameter(self, index):
+        return self._angles[index]
+
+    def point(self, t):
+        a = self._angles[0] + t * (self._angles[1] - self._angles[0])
+        c, x, y = self.Center.tuple(), self.XDirection.tuple(), self.YDirection.tuple()
+        return tuple(c[i] + self.Radius * (math.cos(a) * x[i] + math.sin(a) * y[i]) for i in range(3))
+
+    def descriptor(self):
+        return (ARC, self.Center.tuple(), self.Radius) + self._angles + (self.XDirection.tuple(),
+                                                                          self.YDirection.tuple())
+
+
+class HermiteSpline(Curve):
+    """ Only the tessellation, the points it was created through """
+    def __init__(self, points):
+        self.points = [tuple(p) for p in points]
+
+    def point(self, t):
+        return self.points[0] if t == 0 else self.points[-1]
+
+    def Tessellate(self):
+        return [XYZ(*p) for p in self.points]
+
+
+def curve_from_descriptor(descriptor):
+    """ Line or arc of a descriptor, a "spline" descriptor lists the points of a HermiteSpline """
+    if descriptor[0] == LINE:
+        return Line(descriptor[1], descriptor[2])
+    if descriptor[0] == "spline":
+        return HermiteSpline(descriptor[1])
+    return Arc(*descriptor[1:])
+
+
+class CurveLoop(object):
+    def __init__(self, curves):
+        self._curves = list(curves)
+
+    def __iter__(self):
+        return iter(self._curves)
+
+    def NumberOfCurves(self):
+        return len(self._curves)
+
+
+class PlanarFace(object):
+    def __init__(self, normal, loops):
+        self.FaceNormal = normal
+        self._loops = loops
+
+    def GetEdgesAsCurveLoops(self):
+        return list(self._loops)
+
+
+class Solid(object):
+    def __init__(self, faces):
+        self.Faces = faces
+
+
+class MeshTriangle(object):
+    def __init__(self, indices):
+        self._indices = indices
+
+    def get_Index(self, k):
+        return self._indices[k]
+
+
+class Mesh(object):
+    def __init__(self, vertices, triangles):
+        self.Vertices = [XYZ(*v) for v in vertices]
+        self._triangles = [tuple(int(i) for i in t) for t in triangles]
+
+    @property
+    def NumTriangles(self):
+        return len(self._triangles)
+
+    def get_Triangle(self, i):
+        return MeshTriangle(self._triangles[i])
+
+
+class BuildingPad(Element):
+    __slots__ = ("loop", "parameters")
+
+    def get_Geometry(self, options):
+        top = PlanarFace(XYZ(0, 0, 1), [CurveLoop(curve_from_descriptor(c) for c in self.loop)])
+        bottom = PlanarFace(XYZ(0, 0, -1), [])
+        return [Solid([bottom, top])]
+
+    def LookupParameter(self, name):
+        return (getattr(self, "parameters", None) or {}).get(name)
+
+
+class StorageType(object):
+    Integer = 1
+    Double = 2
+    String = 3
+
+
+class SpecTypeId(object):
+    Angle = "autodesk.spec.aec:angle-2.0.0"
+    Length = "autodesk.spec.aec:length-2.0.0"
+    Number = "autodesk.spec:number-2.0.0"
+    Slope = "autodesk.spec.aec:slope-2.0.0"
+    String = "autodesk.spec:string-2.0.0"
+
+
+class Definition(object):
+    def __init__(self, name, spec):
+        self.Name = name
+        self._spec = spec
+
+    def GetDataType(self):
+        return self._spec
+
+
+class PadParameter(object):
+    """ Parameter of a pad, value is in Revit's internal units as AsDouble returns it """
+    def __init__(self, name, value, storage, spec):
+        self.Definition = Definition(name, spec)
+        self.StorageType = storage
+        self.HasValue = value is not None
+        self._value = value
+
+    def AsDouble(self):
+        return float(self._value)
+
+    def AsInteger(self):
+        return int(self._value)
+
+    def AsString(self):
+        return self._value
+
+
+class TopographySurface(Element):
+    __slots__ = ("mesh",)
+
+    def get_Geometry(self, options):
+        return [self.mesh]
+
+
+class Options(object):
+    View = None
+
+
+class UnitTypeId(object):
+    pass
+
+
+for _name in INTERNAL_PER:
+    setattr(UnitTypeId, _name, _name)
+
+
+class UnitUtils(object):
+    @staticmethod
+    def ConvertToInternalUnits(value, units):
+        return value * INTERNAL_PER[units]
+
+    @staticmethod
+    def ConvertFromInternalUnits(value, units):
+        return value / INTERNAL_PER[units]
+
+
+class IFailuresPreprocessor(object):
+    pass
+
+
+class ISelectionFilter(object):
+    pass
+
+
+def excavation_document(app, loop, vertices, triangles, parameters=None):
+    """ Document with a {3D} view, one building pad of loop and one topography of the triangulation
+
+    parameters maps parameter names of the pad to PadParameters.
+    """
+    doc = revit_standin.Document(app, "C:\\Projects\\Excavation.rvt")
+    doc.new(View, BuiltInCategory.OST_Views, "{3D}")
+    pad = doc.new(BuildingPad, None, "Pad", loop=loop, parameters=parameters)
+    topography = doc.new(TopographySurface, None, "Topography", mesh=Mesh(vertices, triangles))
+    return doc, pad, topography
+
+
+def install():
+    """ Registers revit_standin and the geometry, pyRevit and WPF stand-ins """
+    revit_standin.install()
+    db = sys.modules["Autodesk.Revit.DB"]
+    names = ["XYZ", "Curve", "Line", "Arc", "HermiteSpline", "CurveLoop", "Options", "Mesh", "UnitTypeId",
+             "UnitUtils", "StorageType", "SpecTypeId", "IFailuresPreprocessor"]
+    for name in names:
+        setattr(db, name, globals()[name])
+    db.__all__ = list(db.__all__) + names
+
+    selection = types.ModuleType("Autodesk.Revit.UI.Selection")
+    selection.ISelectionFilter = ISelectionFilter
+    selection.ObjectType = types.SimpleNamespace(Element=1)
+    selection.__all__ = ["ObjectType"]
+    sys.modules["Autodesk.Revit.UI"].Selection = selection
+    sys.modules["System"].Windows = types.SimpleNamespace(Window=object)
+    wpf = types.ModuleType("wpf")
+    wpf.LoadComponent = lambda window, xaml: None
+
+    data = tempfile.mkdtemp()
+    pyrevit = types.ModuleType("pyrevit")
+    pyrevit.UI = sys.modules["Autodesk.Revit.UI"]
+    pyrevit.forms = types.ModuleType("pyrevit.forms")
+    pyrevit.script = types.ModuleType("pyrevit.script")
+    pyrevit.script.get_bundle_file = lambda name: name
+    pyrevit.script.get_universal_data_file = lambda name, ext: os.path.join(data, "{}.{}".format(name, ext))
+    pyrevit.revit = types.ModuleType("pyrevit.revit")
+    pyrevit.revit.get_selection = lambda: []
+    for name, module in {"Autodesk.Revit.UI.Selection": selection, "wpf": wpf, "pyrevit": pyrevit}.items():
+        sys.modules.setdefault(name, module)
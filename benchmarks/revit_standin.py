@@ -0,0 +1,641 @@
+""" In-memory stand-in for the parts of the Revit API used by doc-synced.py, with synthetic documents
+
+install() registers Autodesk.Revit.DB, Autodesk.Revit.UI, System, clr and the Snippets helpers as modules,
+so the health check runs unchanged on a plain Python 3. Collectors walk every element of the document
+like Revit does, so pass counts and per-element work scale as they would in a real model.
+"""
+import random
+import sys
+import time
+import types
+import uuid
+
+
+class BuiltInCategory(object):
+    OST_Views = -2000279
+    OST_Sheets = -2003100
+    OST_Schedules = -2000573
+    OST_Viewports = -2000510
+    OST_ScheduleGraphics = -2000570
+    OST_Materials = -2000700
+    OST_RasterImages = -2000560
+    OST_Rooms = -2000160
+    OST_IOSModelGroups = -2000095
+    OST_Lines = -2000051
+    OST_Walls = -2000011
+    OST_Doors = -2000023
+    OST_Windows = -2000014
+    OST_GenericModel = -2000151
+    OST_ImportObjectStyles = -2000300
+    OST_RvtLinks = -2001352
+
+
+class ViewType(object):
+    FloorPlan = 1
+    CeilingPlan = 2
+    Elevation = 3
+    ThreeD = 4
+    Schedule = 5
+    DrawingSheet = 6
+    DraftingView = 10
+    Legend = 11
+    Section = 117
+
+
+class WorksetKind(object):
+    UserWorkset = 0
+
+
+class BuiltInParameter(object):
+    VIEWPORT_SHEET_NUMBER = -1005500
+
+
+class Parameter(object):
+    def __init__(self, value):
+        self._value = value
+
+    def AsString(self):
+        return self._value
+
+
+class ElementId(object):
+    __slots__ = ("Value",)
+
+    def __init__(self, value):
+        self.Value = int(value)
+
+    @property
+    def IntegerValue(self):
+        return self.Value
+
+    def __eq__(self, other):
+        return isinstance(other, ElementId) and other.Value == self.Value
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.Value)
+
+
+class _SubCategories(object):
+    def __init__(self, size):
+        self.Size = size
+
+
+class Category(object):
+    def __init__(self, category, subcategories=0):
+        self.Id = ElementId(category)
+        self.SubCategories = _SubCategories(subcategories)
+
+
+class Element(object):
+    __slots__ = ("Id", "Category", "Name")
+
+    def __init__(self, element_id, category=None, name=""):
+        self.Id = ElementId(element_id)
+        self.Category = category
+        self.Name = name
+
+    def get_Parameter(self, parameter):
+        return None
+
+
+class ElementType(Element):
+    __slots__ = ()
+
+
+class View(Element):
+    __slots__ = ("ViewType", "IsTemplate", "SheetNumber")
+
+    def get_Parameter(self, parameter):
+        if parameter == BuiltInParameter.VIEWPORT_SHEET_NUMBER:
+            return Parameter(getattr(self, "SheetNumber", None))
+        return None
+
+
+class ViewSheet(View):
+    __slots__ = ()
+
+
+class ViewSchedule(View):
+    __slots__ = ()
+
+
+class Material(Element):
+    __slots__ = ()
+
+
+class FillPatternElement(Element):
+    __slots__ = ()
+
+
+class LinePatternElement(Element):
+    __slots__ = ()
+
+
+class DesignOption(Element):
+    __slots__ = ()
+
+
+class ImportInstance(Element):
+    __slots__ = ("IsLinked", "Pinned")
+
+
+class RevitLinkInstance(Element):
+    __slots__ = ("Pinned",)
+
+
+class Family(Element):
+    __slots__ = ("IsInPlace",)
+
+
+class FamilySymbol(ElementType):
+    __slots__ = ()
+
+
+class FamilyInstance(Element):
+    __slots__ = ()
+
+
+class SpatialElement(Element):
+    __slots__ = ("Area", "Location")
+
+
+class Room(SpatialElement):
+    __slots__ = ()
+
+
+class Group(Element):
+    __slots__ = ()
+
+
+class GroupType(ElementType):
+    __slots__ = ()
+
+
+class ImageType(ElementType):
+    __slots__ = ()
+
+
+class ImageInstance(Element):
+    __slots__ = ()
+
+
+class Viewport(Element):
+    __slots__ = ("ViewId", "SheetId")
+
+
+class ScheduleSheetInstance(Element):
+    __slots__ = ("ScheduleId", "OwnerViewId", "IsTitleblockRevisionSchedule")
+
+
+class ElementMulticategoryFilter(object):
+    def __init__(self, categories):
+        self.categories = set(int(c) for c in categories)
+
+    def passes(self, element):
+        return element.Category is not None and element.Category.Id.Value in self.categories
+
+
+class ElementMulticlassFilter(object):
+    def __init__(self, classes):
+        self.classes = tuple(classes)
+
+    def passes(self, element):
+        return isinstance(element, self.classes)
+
+
+class LogicalOrFilter(object):
+    def __init__(self, first, second):
+        self.filters = (first, second)
+
+    def passes(self, element):
+        return any(f.passes(element) for f in self.filters)
+
+
+class FilteredElementCollector(object):
+    """ Lazily filtered walk over every element of the document, at least one filter is required """
+    passes = 0  # Document walks since the last reset, shared by all collectors
+
+    def __init__(self, doc):
+        self._doc = doc
+        self._tests = []
+
+    def _add(self, test):
+        self._tests.append(test)
+        return self
+
+    def OfCategory(self, category):
+        category = int(category)
+        return self._add(lambda e: e.Category is not None and e.Category.Id.Value == category)
+
+    def OfClass(self, cls):
+        return self._add(lambda e: isinstance(e, cls))
+
+    def WhereElementIsNotElementType(self):
+        return self._add(lambda e: not isinstance(e, ElementType))
+
+    def WhereElementIsElementType(self):
+        return self._add(lambda e: isinstance(e, ElementType))
+
+    def WherePasses(self, element_filter):
+        return self._add(element_filter.passes)
+
+    def __iter__(self):
+        if not self._tests:
+            raise RuntimeError("The collector does not have a filter applied")
+        FilteredElementCollector.passes += 1
+        tests = self._tests
+        for element in self._doc.elements.values():
+            if all(test(element) for test in tests):
+                yield element
+
+    def ToElements(self):
+        return list(self)
+
+    def ToElementIds(self):
+        return [e.Id for e in self]
+
+    def GetElementCount(self):
+        return sum(1 for _ in self)
+
+
+class Workset(object):
+    def __init__(self, name):
+        self.Name = name
+
+
+class FilteredWorksetCollector(object):
+    def __init__(self, doc):
+        self._doc = doc
+
+    def OfKind(self, kind):
+        return self
+
+    def ToWorksets(self):
+        return list(self._doc.worksets)
+
+
+class PerformanceAdviserRuleId(object):
+    def __init__(self, guid):
+        self.Guid = guid
+
+
+class _FailureMessage(object):
+    def __init__(self, ids):
+        self._ids = ids
+
+    def GetFailingElements(self):
+        return list(self._ids)
+
+
+class PerformanceAdviser(object):
+    PURGE_GUID = "e8c63650-70b7-435a-9010-ec97660c1bda"
+    _instance = None
+
+    def __init__(self):
+        self._rules = [PerformanceAdviserRuleId(uuid.UUID(int=i)) for i in range(1, 40)]
+        self._rules.insert(25, PerformanceAdviserRuleId(uuid.UUID(self.PURGE_GUID)))
+
+    @classmethod
+    def GetPerformanceAdviser(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def GetAllRuleIds(self):
+        return list(self._rules)
+
+    def ExecuteRules(self, doc, rule_ids):
+        """ Purge results of the document, taking doc.purge_seconds like the expensive Revit analysis """
+        time.sleep(doc.purge_seconds)
+        purgeable = [ElementId(i) for i in doc.purgeable if i in doc.elements]
+        return [_FailureMessage(purgeable)] if purgeable else []
+
+
+class DocumentVersion(object):
+    def __init__(self, guid, saves):
+        self.VersionGUID = guid
+        self.NumberOfSaves = saves
+
+
+class _Categories(object):
+    def __init__(self, line_styles):
+        self._lines = Category(BuiltInCategory.OST_Lines, line_styles)
+
+    def get_Item(self, category):
+        return self._lines
+
+
+class _Settings(object):
+    def __init__(self, line_styles):
+        self.Categories = _Categories(line_styles)
+
+
+class Event(object):
+    """ .NET style event, handlers are added with += """
+    def __init__(self):
+        self.handlers = []
+
+    def __iadd__(self, handler):
+        self.handlers.append(handler)
+        return self
+
+    def __isub__(self, handler):
+        self.handlers.remove(handler)
+        return self
+
+    def raise_event(self, sender, args):
+        for handler in list(self.handlers):
+            handler(sender, args)
+
+
+class Application(object):
+    def __init__(self, username="bench", version="Autodesk Revit 2024", journal=""):
+        self.Username = username
+        self.VersionName = version
+        self.RecordingJournalFilename = journal
+        self.DocumentChanged = Event()
+        self.DocumentClosing = Event()
+
+
+class UIApplication(object):
+    def __init__(self, app):
+        self.Application = app
+
+
+class DocumentChangedEventArgs(object):
+    def __init__(self, doc, added, modified, deleted):
+        self._doc = doc
+        self._changes = (added, modified, deleted)
+
+    def GetDocument(self):
+        return self._doc
+
+    def GetAddedElementIds(self):
+        return [ElementId(i) for i in self._changes[0]]
+
+    def GetModifiedElementIds(self):
+        return [ElementId(i) for i in self._changes[1]]
+
+    def GetDeletedElementIds(self):
+        return [ElementId(i) for i in self._changes[2]]
+
+
+class DocumentClosingEventArgs(object):
+    def __init__(self, doc):
+        self.Document = doc
+
+
+class ChangedElements(object):
+    """ Element ids changed between a document version and the current document """
+    def __init__(self, added, modified, deleted):
+        self._changes = (added, modified, deleted)
+
+    def GetCreatedElementIds(self):
+        return [ElementId(i) for i in self._changes[0]]
+
+    def GetModifiedElementIds(self):
+        return [ElementId(i) for i in self._changes[1]]
+
+    def GetDeletedElementIds(self):
+        return [ElementId(i) for i in self._changes[2]]
+
+
+class Document(object):
+    def __init__(self, app, path):
+        self.Application = app
+        self.PathName = path
+        self.IsModelInCloud = False
+        self.IsValidObject = True
+        self.elements = {}  # id value -> element, in creation order
+        self.worksets = []
+        self.warnings = []
+        self.purgeable = []
+        self.purge_seconds = 0.0
+        self.size_mb = 0.0
+        self.Settings = _Settings(0)
+        self._guid = str(uuid.uuid4())
+        self._saves = 0
+        self._next_id = 100000
+        self._versions = [self._guid]  # Every version GUID, oldest first
+        self._log = []  # (version index, added, modified, deleted) of every change
+
+    @staticmethod
+    def GetDocumentVersion(doc):
+        return DocumentVersion(doc._guid, doc._saves)
+
+    def GetChangedElements(self, guid):
+        """ Changes since version guid, by this session and by other users, raises for unknown versions """
+        if guid not in self._versions:
+            raise ValueError("The document version {} is not available".format(guid))
+        since = self._versions.index(guid)
+        added, modified, deleted = set(), set(), set()
+        for version, a, m, d in self._log:
+            if version >= since:
+                added.update(a)
+                modified.update(m)
+                deleted.update(d)
+        return ChangedElements(sorted(added), sorted(modified), sorted(deleted))
+
+    def GetElement(self, element_id):
+        return self.elements.get(element_id.Value)
+
+    def GetWarnings(self):
+        return list(self.warnings)
+
+    def new(self, cls, category=None, name="", **values):
+        element = cls(self._next_id, None if category is None else Category(category), name)
+        for k, v in values.items():
+            setattr(element, k, v)
+        self.elements[self._next_id] = element
+        self._next_id += 1
+        return element
+
+    def save(self):
+        """ Starts a new document version, as a sync with central does """
+        self._saves += 1
+        self._guid = str(uuid.uuid4())
+        self._versions.append(self._guid)
+
+    def change(self, count, rnd, event=True):
+        """ Adds, modifies and deletes about count elements and raises DocumentChanged for them
+
+        Without event the changes come from other users through a sync, no DocumentChanged reports them.
+        """
+        added, modified, deleted = [], [], []
+        ids = list(self.elements)
+        for _ in range(count):
+            action = rnd.random()
+            if action < 0.3:
+                added.append(self.new(FamilyInstance, BuiltInCategory.OST_Walls, "Wall").Id.Value)
+            elif action < 0.4:
+                room = self.new(Room, BuiltInCategory.OST_Rooms, "Room", Area=rnd.uniform(5, 80), Location=object())
+                added.append(room.Id.Value)
+            else:
+                element = self.elements.get(rnd.choice(ids))
+                if element is None:
+                    continue
+                if action < 0.5 and isinstance(element, FamilyInstance):
+                    del self.elements[element.Id.Value]
+                    deleted.append(element.Id.Value)
+                else:
+                    if isinstance(element, Room):
+                        element.Area = rnd.uniform(5, 80)
+                    modified.append(element.Id.Value)
+        return self.record(added, modified, deleted, event)
+
+    def record(self, added, modified, deleted, event=True):
+        """ Logs changed element id values for GetChangedElements and raises DocumentChanged unless event is False """
+        self._log.append((len(self._versions) - 1, added, modified, deleted))
+        if event:
+            self.Application.DocumentChanged.raise_event(self.Application,
+                                                         DocumentChangedEventArgs(self, added, modified, deleted))
+        return len(added) + len(modified) + len(deleted)
+
+    def close(self):
+        self.Application.DocumentClosing.raise_event(self.Application, DocumentClosingEventArgs(self))
+
+
+def synthetic_document(app, elements, seed=0, purge_seconds=0.0):
+    """ Document of about elements elements, with the mix of views, sheets, rooms and families of a large project """
+    rnd = random.Random(seed)
+    doc = Document(app, "C:\\Projects\\Synthetic\\Synthetic_{}.rvt".format(elements))
+    doc.purge_seconds = purge_seconds
+    doc.size_mb = round(elements * 0.0005 + 40.0, 1)
+    doc.Settings = _Settings(60 + elements // 20000)
+    scale = lambda fraction, least=1: max(least, int(elements * fraction))
+    C = BuiltInCategory
+
+    views = []
+    for i in range(scale(0.005, 20)):
+        kind = rnd.choice([ViewType.FloorPlan] * 5 + [ViewType.Section, ViewType.Elevation, ViewType.ThreeD,
+                                                     ViewType.DraftingView, ViewType.Legend])
+        views.append(doc.new(View, C.OST_Views, "View {}".format(i), ViewType=kind, IsTemplate=rnd.random() < 0.08))
+    sheets = [doc.new(ViewSheet, C.OST_Sheets, "Sheet {}".format(i), ViewType=ViewType.DrawingSheet, IsTemplate=False)
+              for i in range(max(2, len(views) // 8))]
+    schedules = [doc.new(ViewSchedule, C.OST_Schedules, "Schedule {}".format(i), ViewType=ViewType.Schedule,
+                         IsTemplate=False) for i in range(scale(0.001, 5))]
+    for view in views:
+        if view.IsTemplate:
+            continue
+        if view.ViewType == ViewType.Legend:
+            placed = rnd.sample(sheets, min(len(sheets), rnd.choice([0, 0, 1, 3])))
+        else:
+            placed = [rnd.choice(sheets)] if rnd.random() < 0.7 else []
+        for sheet in placed:
+            doc.new(Viewport, C.OST_Viewports, ViewId=view.Id, SheetId=sheet.Id)
+        if placed:
+            view.SheetNumber = placed[0].Name
+    for schedule in schedules:
+        if rnd.random() < 0.6:
+            doc.new(ScheduleSheetInstance, C.OST_ScheduleGraphics, ScheduleId=schedule.Id,
+                    OwnerViewId=rnd.choice(sheets).Id, IsTitleblockRevisionSchedule=False)
+    for sheet in sheets:
+        doc.new(ScheduleSheetInstance, C.OST_ScheduleGraphics, ScheduleId=ElementId(-1), OwnerViewId=sheet.Id,
+                IsTitleblockRevisionSchedule=True)
+
+    for i in range(min(3000, scale(0.002, 30))):
+        doc.new(Material, C.OST_Materials, "Material {}".format(i))
+    for i in range(150):
+        doc.new(FillPatternElement, None, "Fill {}".format(i))
+    for i in range(120):
+        doc.new(LinePatternElement, None, "Line {}".format(i))
+    for i in range(10):
+        doc.new(DesignOption, None, "Option {}".format(i))
+    for i in range(scale(0.0002, 4)):
+        doc.new(ImportInstance, C.OST_ImportObjectStyles, "Import {}".format(i), IsLinked=rnd.random() < 0.5,
+                Pinned=False)
+    for i in range(8):
+        doc.new(RevitLinkInstance, C.OST_RvtLinks, "Link {}".format(i), Pinned=rnd.random() < 0.7)
+    for i in range(20):
+        doc.new(ImageType, C.OST_RasterImages, "Image {}".format(i))
+    for i in range(30):
+        doc.new(ImageInstance, C.OST_RasterImages, "Image {}".format(i))
+
+    for i in range(scale(0.004, 10)):
+        state = rnd.random()
+        area = 0.0 if state < 0.08 else rnd.uniform(5, 80)
+        doc.new(Room, C.OST_Rooms, "Room {}".format(i), Area=area, Location=None if state < 0.03 else object())
+    group_types = [doc.new(GroupType, C.OST_IOSModelGroups, "Group {}".format(i)) for i in range(scale(0.0005, 2))]
+    for i in range(scale(0.002, 5)):
+        doc.new(Group, C.OST_IOSModelGroups, rnd.choice(group_types).Name)
+    families = []
+    for i in range(scale(0.002, 20)):
+        prefix = "AFRY_" if rnd.random() < 0.4 else "Vendor_"
+        families.append(doc.new(Family, None, "{}Family {}".format(prefix, i), IsInPlace=rnd.random() < 0.05))
+
+    categories = [C.OST_Walls, C.OST_Doors, C.OST_Windows, C.OST_GenericModel]
+    symbols = [doc.new(FamilySymbol, rnd.choice(categories), "Type {}".format(i)) for i in range(scale(0.01, 10))]
+    while len(doc.elements) < elements:
+        symbol = rnd.choice(symbols)
+        doc.new(FamilyInstance, symbol.Category.Id.Value, symbol.Name)
+
+    doc.worksets = [Workset("Workset {}".format(i)) for i in range(25)]
+    doc.warnings = [object() for _ in range(scale(0.002, 5))]
+    doc.purgeable = [e.Id.Value for e in rnd.sample(group_types + families, (len(group_types) + len(families)) // 10)]
+    return doc
+
+
+def _convert_internal_units(value, to_internal, unit):
+    factor = {"m2": 0.09290304, "m": 0.3048, "mm": 304.8}[unit]
+    return value / factor if to_internal else value * factor
+
+
+def install():
+    """ Registers the stand-in modules, replacing none that are already importable for real """
+    db = types.ModuleType("Autodesk.Revit.DB")
+    names = [n for n, v in globals().items() if isinstance(v, type) and not n.startswith("_")]
+    names = [n for n in names if n not in ("Event", "Application", "UIApplication", "DocumentChangedEventArgs",
+                                           "DocumentClosingEventArgs")]
+    for name in names:
+        setattr(db, name, globals()[name])
+    db.__all__ = names
+    ui = types.ModuleType("Autodesk.Revit.UI")
+    ui.UIApplication = UIApplication
+    ui.__all__ = ["UIApplication"]
+
+    system = types.ModuleType("System")
+    system.Type = type
+    generic = types.ModuleType("System.Collections.Generic")
+    generic.List = _GenericFactory()
+    clr = types.ModuleType("clr")
+    clr.GetClrType = lambda cls: cls
+    clr.AddReference = lambda name: None
+
+    project_path = types.ModuleType("Snippets._project_path")
+    project_path.get_project_size_mb = lambda doc: doc.size_mb
+    convert = types.ModuleType("Snippets._convert")
+    convert.convert_internal_units = _convert_internal_units
+
+    modules = {
+        "Autodesk": types.ModuleType("Autodesk"),
+        "Autodesk.Revit": types.ModuleType("Autodesk.Revit"),
+        "Autodesk.Revit.DB": db,
+        "Autodesk.Revit.UI": ui,
+        "System": system,
+        "System.Collections": types.ModuleType("System.Collections"),
+        "System.Collections.Generic": generic,
+        "clr": clr,
+        "Snippets": types.ModuleType("Snippets"),
+        "Snippets._project_path": project_path,
+        "Snippets._convert": convert
+    }
+    for name, module in modules.items():
+        sys.modules.setdefault(name, module)
+
+
+class _GenericList(list):
+    def Add(self, item):
+        self.append(item)
+
+    @property
+    def Count(self):
+        return len(self)
+
+
+class _GenericFactory(object):
+    """ List[T] of System.Collections.Generic """
+    def __getitem__(self, item_type):
+        return _GenericList
@@ -0,0 +1,89 @@
+""" Synthetic building pad loops and terrains for headless excavation benchmarks, units are feet """
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from _curve_sampling import arc_descriptor, line_descriptor
+from _terrain_bvh import synthetic_terrain
+
+PAD_Z = -8.0  # Below the synthetic terrain, so every slope ray rises to meet it
+
+
+def _polygon_loop(vertices, edges, z, whole=()):
+    """ Counterclockwise polygon split into about edges collinear lines, proportionally to side length
+
+    Sides listed in whole stay single lines, short lines next to a reflex corner would be swallowed by
+    the slope offset.
+    """
+    sides = list(zip(vertices, vertices[1:] + vertices[:1]))
+    lengths = [0.0 if i in whole else math.hypot(b[0] - a[0], b[1] - a[1]) for i, (a, b) in enumerate(sides)]
+    total = sum(lengths)
+    counts = [max(1, int(round((edges - len(whole)) * length / total))) for length in lengths]
+    loop = []
+    for (a, b), count in zip(sides, counts):
+        for k in range(count):
+            t0 = float(k) / count
+            t1 = float(k + 1) / count
+            loop.append(line_descriptor((a[0] + t0 * (b[0] - a[0]), a[1] + t0 * (b[1] - a[1]), z),
+                                        (a[0] + t1 * (b[0] - a[0]), a[1] + t1 * (b[1] - a[1]), z)))
+    return loop
+
+
+def rectangular_pad(edges, scale=1.0, z=PAD_Z):
+    w = 120.0 * scale
+    d = 80.0 * scale
+    return _polygon_loop([(0.0, 0.0), (w, 0.0), (w, d), (0.0, d)], max(edges, 4), z)
+
+
+def l_shaped_pad(edges, scale=1.0, z=PAD_Z):
+    w = 120.0 * scale
+    d = 90.0 * scale
+    return _polygon_loop([(0.0, 0.0), (w, 0.0), (w, d / 2), (w / 2, d / 2), (w / 2, d), (0.0, d)],
+                         max(edges, 6), z, whole=(2, 3))
+
+
+def curved_pad(edges, scale=1.0, z=PAD_Z, bulge=0.15):
+    """ Ellipse-like loop of outward bulging arcs that meet at corners """
+    edges = max(edges, 3)
+    rx = 60.0 * scale
+    ry = 40.0 * scale
+    points = [(rx + rx * math.cos(2 * math.pi * k / edges), ry + ry * math.sin(2 * math.pi * k / edges))
+              for k in range(edges)]
+    loop = []
+    for a, b in zip(points, points[1:] + points[:1]):
+        chord = math.hypot(b[0] - a[0], b[1] - a[1])
+        sagitta = bulge * chord / 2
+        radius = (chord * chord / 4 + sagitta * sagitta) / (2 * sagitta)
+        # Centre lies inwards of the chord, so the arc bulges outwards and runs counterclockwise
+        nx = (b[1] - a[1]) / chord
+        ny = -(b[0] - a[0]) / chord
+        h = radius - sagitta
+        cx = (a[0] + b[0]) / 2 - nx * h
+        cy = (a[1] + b[1]) / 2 - ny * h
+        a0 = math.atan2(a[1] - cy, a[0] - cx)
+        a1 = math.atan2(b[1] - cy, b[0] - cx)
+        if a1 < a0:
+            a1 += 2 * math.pi
+        loop.append(arc_descriptor((cx, cy, z), radius, a0, a1))
+    return loop
+
+
+SHAPES = {
+    "rectangular": rectangular_pad,
+    "l-shaped": l_shaped_pad,
+    "curved": curved_pad,
+}
+
+
+def pad_scale(edges):
+    """ Pads grow with the edge count so edges do not shrink below the sampling spacing """
+    return max(1.0, edges / 400.0)
+
+
+def terrain_for(scale, margin=60.0, max_cells=300):
+    """ Rolling terrain covering a pad of the given scale with margin on every side """
+    size_x = 120.0 * scale + 2 * margin
+    size_y = 90.0 * scale + 2 * margin
+    cells = int(min(max_cells, max(size_x, size_y) / 2.0))
+    return synthetic_terrain(size_x, size_y, cells, cells, origin=(-margin, -margin, 0.0), relief=4.0)
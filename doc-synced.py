@@ -4,14 +4,21 @@ from datetime import date, datetime, timedelta
 from Autodesk.Revit.DB import *
 from Autodesk.Revit.UI import *
 # Import
-from System.Collections.Generic import List
 import os
 import json
-import requests
+import tempfile
+import time
 # Import Lib
 from Snippets._project_path import get_project_size_mb
 from Snippets._convert import convert_internal_units
-from Snippets._get_journal_path import get_journal_path
+from _change_tracker import current_census, track_changes
+from _element_census import element_id_value
+from _journal_tail import sync_statistics
+from _metric_schedule import DAILY, EVERY_SYNC, MetricScheduler
+from _metric_store import MetricStore, upload_row
+from _purge import purgeable_elements
+from _upload_spool import spool_upload
+from _view_placement import PlacementIndex, schedule_placement, viewport_placement
 
 #uidoc = __revit__.ActiveUIDocument
 doc = __eventargs__.Document
@@ -22,21 +29,39 @@ now = datetime.now()
 
 url = "https://api.powerbi.com/beta/d5806acf-9211-41f2-8486-e356d60362b4/datasets/a39ed191-51bc-4b44-aaf0-5dc429ab7eab/rows?cmpid=pbi-glob-head-snn-signin&key=zJ8a86JOMy78%2Fbfl3zep1JAKOJrLTjh5Jdj%2FTSHKWwa40agBtxP81zZpBKHb%2F8RCLdnin5bZ%2FnCVSaIr%2B8SBEA%3D%3D"
 
+DATA_FOLDER = os.path.join(os.getenv("LOCALAPPDATA") or tempfile.gettempdir(), "RevitHealthCheck")
+# Rows wait here until the background worker has posted them
+SPOOL_PATH = os.path.join(DATA_FOLDER, "upload_spool.sqlite")
+# Time series of every metric per project, a sample is kept when a value changes
+STORE_PATH = os.path.join(DATA_FOLDER, "metrics.sqlite")
+UPLOAD_KEYS = ("user", "software", "project", "date", "dateTime")  # Sent with every row, changed or not
+UPLOAD_GZIP = False  # Post gzip-compressed batches, only for an endpoint checked to accept them
+# The push dataset refuses rows with columns it does not define. Add these columns to the dataset before
+# setting EXTENDED_COLUMNS: "Empty sheets", "Average views per sheet", "Max views per sheet" and "Orphaned
+# legends" (numbers), "Stale metrics" (text), "Health check ms", "census ms" and "<collector> ms" for every
+# collector in METRIC_TIERS (whole numbers)
+EXTENDED_COLUMNS = False
+VIEW_COLUMNS = ("Empty sheets", "Average views per sheet", "Max views per sheet", "Orphaned legends")
+# Last values, timings and run days of the metric collectors per project
+SCHEDULE_STATE = os.path.join(DATA_FOLDER, "metric_schedule.json")
+# Byte offset and running sync statistics of every journal, one file per Revit session
+JOURNAL_STATES = os.path.join(DATA_FOLDER, "journals")
+PURGE_EVERY = 1  # Run the purge analysis on every n-th sync, reusing the last result in between
+TIME_BUDGET = 2.0  # Seconds per sync before due collectors outside the every sync tier are deferred
+# Collector tiers: EVERY_SYNC, DAILY or an integer n for every n-th sync
+METRIC_TIERS = {
+    "general": EVERY_SYNC,
+    "views": EVERY_SYNC,
+    "styles": EVERY_SYNC,
+    "links": EVERY_SYNC,
+    "rooms": EVERY_SYNC,
+    "groups": 5,         # Purge analysis
+    "families": DAILY    # Purge analysis, warnings and journal
+}
+
 def get_purgeable_elements(doc):
-    # A constant
-    PURGE_GUID = "e8c63650-70b7-435a-9010-ec97660c1bda"
-    # A generic list of PerformanceAdviserRuleIds as required by the ExecuteRules method
-    rule_id_list = List[PerformanceAdviserRuleId]()
-    # Iterating through all PerformanceAdviser rules looking to find that which matches PURGE_GUID
-    for rule_id in PerformanceAdviser.GetPerformanceAdviser().GetAllRuleIds():
-        if str(rule_id.Guid) == PURGE_GUID:
-            rule_id_list.Add(rule_id)
-            break
-    # Get all purgeable elements
-    failure_messages = PerformanceAdviser.GetPerformanceAdviser().ExecuteRules(doc, rule_id_list)
-    if len(failure_messages) > 0:
-        purgeable_element_ids = failure_messages[0].GetFailingElements()
-        return purgeable_element_ids
+    """ Purgeable element ids, analysed once per document version and shared by all metrics """
+    return purgeable_elements(doc, PURGE_EVERY)
 
 def get_file_name(doc):
     if doc.IsModelInCloud:
@@ -60,9 +85,24 @@ def get_file_name(doc):
         project_name = name[:end]
         return project_name
 
+def accept_upload(rows, tags):
+    """ Moves the upload baseline of the metric store to the rows the server accepted """
+    store = MetricStore(STORE_PATH)
+    try:
+        for row, tag in zip(rows, tags):
+            if tag is not None:
+                store.accept(tag["project"], row, tag["time"])
+    finally:
+        store.close()
+
 class RevitHealthCheck():
     """ Revit health check for Power BI dashboard"""
     def __init__(self):
+        # One census shared by all metrics, updated from the element changes since the last sync
+        start = time.perf_counter()
+        track_changes(app)
+        self.census = current_census(doc)
+        self.census_seconds = time.perf_counter() - start
         self.data_parser()
 
     def general_data(self):
@@ -86,44 +126,46 @@ class RevitHealthCheck():
 
     def view_and_sheet_data(self):
         """ Get views and sheets count """
-        all_views = FilteredElementCollector(doc)\
-            .OfCategory(BuiltInCategory.OST_Views)\
-            .WhereElementIsNotElementType()\
-            .ToElements()
-        all_sheets = FilteredElementCollector(doc) \
-            .OfCategory(BuiltInCategory.OST_Sheets) \
-            .WhereElementIsNotElementType() \
-            .ToElements()
+        # (id, is legend) per view, read again only for views changed since the last sync
+        all_views = self.census.read("views", BuiltInCategory.OST_Views,
+                                     lambda v: (element_id_value(v.Id), v.ViewType == ViewType.Legend), True)
+        all_sheets = self.census.ids(BuiltInCategory.OST_Sheets, True)
+        # Placed views from viewports and schedule instances instead of a parameter lookup per view
+        placements = PlacementIndex(self.census.read("viewports", Viewport, viewport_placement) +
+                                    self.census.read("schedule instances", ScheduleSheetInstance, schedule_placement))
 
         on_sheet = 0                        # Number of placed views
         not_on_sheet = 0                    # Number of unplaced views
+        orphaned_legends = 0                # Legends not placed on any sheet
         total_views = len(all_views)        # Total view count
         total_sheets = len(all_sheets)      # Number of sheets in the project
 
-        for view in all_views:
-            sheet_number = view.get_Parameter(BuiltInParameter.VIEWPORT_SHEET_NUMBER).AsString()
-            if sheet_number == None:
-                not_on_sheet += 1
-            else:
+        for view_id, is_legend in all_views:
+            if placements.is_placed(view_id):
                 on_sheet += 1
+            else:
+                not_on_sheet += 1
+                if is_legend:
+                    orphaned_legends += 1
+        average_views, max_views = placements.views_per_sheet(all_sheets)
         dic = {
             "All views": total_views,
             "All sheets": total_sheets,
             "Views on sheets": on_sheet,
-            "Views not on sheets": not_on_sheet
+            "Views not on sheets": not_on_sheet,
+            "Empty sheets": len(placements.empty_sheets(all_sheets)),
+            "Average views per sheet": round(average_views, 2),
+            "Max views per sheet": max_views,
+            "Orphaned legends": orphaned_legends
             }
 
         return dic
 
     def style_data(self):
         """ Get data about materials, lines and fills"""
-        all_materials = FilteredElementCollector(doc)\
-            .OfCategory(BuiltInCategory.OST_Materials) \
-            .WhereElementIsNotElementType() \
-            .ToElements() \
-
-        all_fill_patterns = FilteredElementCollector(doc).OfClass(FillPatternElement).ToElements()
-        all_line_patters = FilteredElementCollector(doc).OfClass(LinePatternElement).ToElements()
+        all_materials = self.census.ids(BuiltInCategory.OST_Materials, True)
+        all_fill_patterns = self.census.ids(FillPatternElement)
+        all_line_patters = self.census.ids(LinePatternElement)
         all_line_styles = doc.Settings.Categories.get_Item(BuiltInCategory.OST_Lines).SubCategories.Size
 
         dic = {
@@ -136,26 +178,26 @@ class RevitHealthCheck():
 
     def link_import_data(self):
         all_worksets = FilteredWorksetCollector(doc).OfKind(WorksetKind.UserWorkset).ToWorksets()
-        all_design_opt = FilteredElementCollector(doc).OfClass(DesignOption).ToElementIds()
-        all_imports = FilteredElementCollector(doc).OfClass(ImportInstance).ToElements()
+        all_design_opt = self.census.ids(DesignOption)
+        all_imports = self.census.read("imports linked", ImportInstance, lambda i: i.IsLinked)
         all_cad_imports = []
         all_cad_links = []
-        all_images = FilteredElementCollector(doc).OfCategory(BuiltInCategory.OST_RasterImages).ToElementIds()
+        all_images = self.census.ids(BuiltInCategory.OST_RasterImages)
         # Imports
-        for i in all_imports:
-            if i.IsLinked:
-                all_cad_links.append(i)
+        for is_linked in all_imports:
+            if is_linked:
+                all_cad_links.append(is_linked)
             else:
-                all_cad_imports.append(i)
+                all_cad_imports.append(is_linked)
 
         # Linked Revit files
-        all_revit_link_collector = FilteredElementCollector(doc).OfClass(RevitLinkInstance)
+        all_revit_link_collector = self.census.read("links pinned", RevitLinkInstance, lambda i: i.Pinned)
         all_revit_links = 0
         all_pinned_rli = 0
 
-        for i in all_revit_link_collector:
+        for pinned in all_revit_link_collector:
             all_revit_links += 1
-            if i.Pinned:
+            if pinned:
                 all_pinned_rli += 1
 
         dic = {
@@ -172,7 +214,8 @@ class RevitHealthCheck():
         return dic
 
     def room_data(self):
-        all_rooms = FilteredElementCollector(doc).OfCategory(BuiltInCategory.OST_Rooms).ToElements()
+        # (area, is placed) per room
+        all_rooms = self.census.read("rooms", BuiltInCategory.OST_Rooms, lambda r: (r.Area, bool(r.Location)))
         all_rooms_count = len(all_rooms)
         # Room area
         all_rooms_area = 0  # Feet squared
@@ -180,14 +223,14 @@ class RevitHealthCheck():
         all_unplaced_rooms = []
         all_not_enclosed_rooms = []
 
-        for r in all_rooms:
-            if r.Area == 0:
-                if r.Location:
-                    all_not_enclosed_rooms.append(r)
+        for area, location in all_rooms:
+            if area == 0:
+                if location:
+                    all_not_enclosed_rooms.append(area)
                 else:
-                    all_unplaced_rooms.append(r)
+                    all_unplaced_rooms.append(area)
             else:
-                all_rooms_area += r.Area
+                all_rooms_area += area
 
         room_area_meters = convert_internal_units(all_rooms_area, False, "m2")
         dic = {
@@ -202,16 +245,17 @@ class RevitHealthCheck():
     def group_data(self):
         """ Get data of groups in the project """
 
-        all_model_groups = FilteredElementCollector(doc).OfCategory(BuiltInCategory.OST_IOSModelGroups).ToElements()
+        all_model_groups = self.census.read("group types", BuiltInCategory.OST_IOSModelGroups,
+                                            lambda i: str(type(i)) == GroupType)
         all_instances = []
         all_types = []
         all_unused_group_instances = 0
 
-        for i in all_model_groups:
-            if str(type(i)) == GroupType:
-                all_types.append(i)
+        for is_type in all_model_groups:
+            if is_type:
+                all_types.append(is_type)
             else:
-                all_instances.append(i)
+                all_instances.append(is_type)
 
         # Get purgable group instances
         f = get_purgeable_elements(doc)
@@ -233,23 +277,25 @@ class RevitHealthCheck():
     def family_data(self):
         """ Get data of families in the project """
         company_abbreviation = "AFRY"
-        all_families = FilteredElementCollector(doc).OfClass(Family).ToElements()  # custom families only (not system families)
+        # (in place, company name) per family, custom families only (not system families)
+        all_families = self.census.read("families", Family,
+                                        lambda f: (f.IsInPlace, str(f.Name).startswith(company_abbreviation)))
         all_inplace_families = []  # number of modeled in place families
         company_families = []  # number of families starting with AFRY
         non_company_families = []
         all_unplaced_families = 0  # number of purgeable families
 
         # Inplace families
-        for i in all_families:
-            if i.IsInPlace:
-                all_inplace_families.append(i)
+        for in_place, company in all_families:
+            if in_place:
+                all_inplace_families.append(in_place)
 
         # Company families
-        for fam in all_families:
-            if str(fam.Name).startswith(company_abbreviation):
-                company_families.append(fam)
+        for in_place, company in all_families:
+            if company:
+                company_families.append(company)
             else:
-                non_company_families.append(fam)
+                non_company_families.append(company)
 
         # Warnings
         Warnings = len(doc.GetWarnings())
@@ -263,12 +309,11 @@ class RevitHealthCheck():
                 ele = doc.GetElement(i)
                 if type(ele) == GroupType:
                     all_unplaced_families += 1
-        # Sync time
+        # Sync time, from the journal lines written since the last run
         sync_dur_int = 0
-        if get_journal_path(app) == None:
-            pass
-        else:
-            sync_dur_int = int(get_journal_path(app).total_seconds())
+        journal = app.RecordingJournalFilename
+        if journal:
+            sync_dur_int = int(sync_statistics(journal, JOURNAL_STATES)["mean"])
 
 
         dic = {
@@ -284,21 +329,37 @@ class RevitHealthCheck():
 
     def data_parser(self):
         """ Parses collected data into JSON """
-        general_data = self.general_data()
-
-        general_data.update(self.view_and_sheet_data())
-        general_data.update(self.style_data())
-        general_data.update(self.link_import_data())
-        general_data.update(self.room_data())
-        general_data.update(self.group_data())
-        general_data.update(self.family_data())
-
-        r = requests.post(url, json=[ general_data ])
-        if r.status_code == 200:
-            pass
+        collectors = [
+            ("general", METRIC_TIERS["general"], self.general_data),
+            ("views", METRIC_TIERS["views"], self.view_and_sheet_data),
+            ("styles", METRIC_TIERS["styles"], self.style_data),
+            ("links", METRIC_TIERS["links"], self.link_import_data),
+            ("rooms", METRIC_TIERS["rooms"], self.room_data),
+            ("groups", METRIC_TIERS["groups"], self.group_data),
+            ("families", METRIC_TIERS["families"], self.family_data)
+        ]
+        # Collectors not due, or deferred by the time budget, send their last values marked as stale
+        scheduler = MetricScheduler(SCHEDULE_STATE, doc.PathName, TIME_BUDGET)
+        general_data = scheduler.run(collectors, self.census_seconds)
+        if EXTENDED_COLUMNS:
+            general_data.update(scheduler.payload_fields(collectors))
+            general_data["census ms"] = int(round(1000 * self.census_seconds))
         else:
-            txt = "Error occurred: {status_c}, {status_r},".format(status_c=str(r.status_code), status_r=r.reason)
-            print(txt)
+            for column in VIEW_COLUMNS:
+                general_data.pop(column, None)
+        scheduler.save()
+
+        # Kept locally, after the first full row of the session only the metrics that differ from the
+        # last accepted upload are sent
+        moment = time.time()
+        store = MetricStore(STORE_PATH)
+        try:
+            changed = store.record(doc.PathName, general_data, moment)
+        finally:
+            store.close()
+        row = upload_row(doc.PathName, changed, general_data, UPLOAD_KEYS)
+        # Posted in batches by a background worker, failed posts stay spooled and are retried
+        spool_upload(url, row, SPOOL_PATH, UPLOAD_GZIP, {"project": doc.PathName, "time": moment}, accept_upload)
 
 # Run the script
 RevitHealthCheck()
\ No newline at end of file
@@ -5,6 +5,7 @@ clr.AddReference('System.Windows.Forms')
 clr.AddReference('IronPython.Wpf')
 # find the path of ui.xaml
 from pyrevit import UI
+from pyrevit import forms
 from pyrevit import script
 
 xamlfile = script.get_bundle_file('ui.xaml')
@@ -15,7 +16,28 @@ from System import Windows
 from pyrevit import revit
 from Autodesk.Revit.DB import *
 from Autodesk.Revit.UI.Selection import *
-import math
+import time
+# local
+from _chunked_apply import CHUNK_SIZE, apply_in_chunks, apply_result, clear_resume, load_resume, save_resume
+from _curve_sampling import arc_descriptor, line_descriptor
+from _doc_cache import document_cache, is_valid_element, release_document_cache, revit_document_version
+from _edge_cache import EdgeCache
+# The geometry core runs in plain Python under IronPython, as in Revit, and with NumPy under CPython
+from _excavation_core import BACKEND, batch_pad_points, pad_points
+from _point_buffer import PointBuffer
+from _run_profile import count, profile_run, record_timings, stage
+from _slope import edge_angles, parse_angles
+from _terrain_bvh import build_terrain
+from _topo_merge import merge_points
+try:
+    from _volumes import ExcavationGrid, reach
+except ImportError:  # NumPy is not available, volumes are not estimated
+    ExcavationGrid = None
+
+MERGE_TOLERANCE = 10  # mm, new points this close to the current topography surface are not added
+RUN_LOG = script.get_universal_data_file("excavation_runs", "jsonl")  # Rolling log of run profiles
+VOLUME_CELL_SIZE = 500  # mm, grid cell of the cut and fill estimate
+RESUME_FILE = script.get_universal_data_file("excavation_resume", "json")  # Points a failed run did not add
 
 
 uidoc = __revit__.ActiveUIDocument
@@ -47,6 +69,8 @@ def UnitConversion(value, get_internal=False, units="m"):
         units = UnitTypeId.Meters
     elif units == "m2":
         units = UnitTypeId.SquareMeters
+    elif units == "m3":
+        units = UnitTypeId.CubicMeters
     elif units == "cm":
         units = UnitTypeId.Centimeters
     elif units == "ft":
@@ -58,34 +82,61 @@ def UnitConversion(value, get_internal=False, units="m"):
     return UnitUtils.ConvertFromInternalUnits(value, units)
 
 
-def CurveDivisions(crvs, div):
-    """ This function returns dictionary of curves and its points divided by the given input """
-    mydict = {}
-    for curve in crvs:
-        mydict[curve] = []
-        for i in range(div):
-            x = i + 1
-            point = curve.Evaluate((x / div), True)
-            mydict[curve].append(point)
-        point = curve.Evaluate((0), True)
-        mydict[curve].append(point)
-    return mydict
-
-def CheckForDupCoord(listOfCoords):
-    """ Checks the list for duplicate coordinates and return a new list without duplicates """
-    listOfCoordsWithoutDup = []
-    for pnt in listOfCoords:
-        if len(listOfCoordsWithoutDup) == 0:
-            listOfCoordsWithoutDup.append(pnt)
+def ParameterSpec(param):
+    """ Spec of a parameter, such as SpecTypeId.Length, GetDataType replaced GetSpecTypeId in Revit 2022 """
+    definition = param.Definition
+    if hasattr(definition, "GetDataType"):
+        return definition.GetDataType()
+    return definition.GetSpecTypeId()
+
+
+def CurveDescriptor(curve):
+    """ Returns plain-data descriptor of a line or an arc, None for other curve types """
+    if isinstance(curve, Line):
+        p0 = curve.GetEndPoint(0)
+        p1 = curve.GetEndPoint(1)
+        return line_descriptor((p0.X, p0.Y, p0.Z), (p1.X, p1.Y, p1.Z))
+    if isinstance(curve, Arc):
+        c = curve.Center
+        x = curve.XDirection
+        y = curve.YDirection
+        return arc_descriptor((c.X, c.Y, c.Z), curve.Radius, curve.GetEndParameter(0), curve.GetEndParameter(1),
+                              (x.X, x.Y, x.Z), (y.X, y.Y, y.Z))
+    return None
+
+
+def LoopDescriptors(crvs):
+    """ Descriptors of a curve loop for the geometry core, and the index of the curve each one comes from
+
+    Lines and arcs give one descriptor each, other curves such as splines are tessellated into lines.
+    """
+    descriptors = []
+    edges = []
+    for i, curve in enumerate(crvs):
+        descriptor = CurveDescriptor(curve)
+        if descriptor is None:
+            points = [(p.X, p.Y, p.Z) for p in curve.Tessellate()]
+            parts = [line_descriptor(p0, p1) for p0, p1 in zip(points, points[1:])]
         else:
-            for p in listOfCoordsWithoutDup:
-                checkForDup = False
-                if p.IsAlmostEqualTo(pnt):
-                    checkForDup = True
-                    break
-            if checkForDup == False:
-                listOfCoordsWithoutDup.append(pnt)
-    return listOfCoordsWithoutDup
+            parts = [descriptor]
+        descriptors.extend(parts)
+        edges.extend([i] * len(parts))
+    return descriptors, edges
+
+
+def CurveAngles(angleExcavation, edges):
+    """ One angle, or the per-edge angles of the pad repeated for every descriptor of their edge """
+    if not hasattr(angleExcavation, "__iter__"):
+        return angleExcavation
+    angles = edge_angles(angleExcavation, edges[-1] + 1 if edges else 0)
+    return [angles[i] for i in edges]
+
+
+def CorePoints(points):
+    """ PointBuffer of the points of the geometry core, a list of (x, y, z) tuples or an (n, 3) array """
+    if isinstance(points, list):
+        return PointBuffer.from_coords(points)
+    return PointBuffer.from_numpy(points)
 
 
 class MyFailureProcessor(IFailuresPreprocessor):
@@ -94,194 +145,352 @@ class MyFailureProcessor(IFailuresPreprocessor):
 
 
 class MyWindows(Windows.Window):
+    _edge_caches = {}  # File name -> EdgeCache shared by every run of the session
+
     def __init__(self):
         wpf.LoadComponent(self, xamlfile)
+        self._terrains = {}  # Topography id -> TerrainBVH or TerrainTree, built once per run
 
     def btnCreate_Click(self, sender, args):
         """ Get inputs from user """
         self.Close()
-        angle = int(self.angleParam.Text)
+        angle = parse_angles(self.angleParam.Text)  # One angle, or one per pad edge separated by ;
         offSet = int(self.offsetParam.Text)
         segment_length = int(self.segment_length.Text)
-
-        MyWindows().runScript(angle, offSet, segment_length)
-
-    def get_3D_view(self):
+        dry_run = getattr(self, "dryRun", None) is not None and bool(self.dryRun.IsChecked)
+        batch = getattr(self, "batchMode", None) is not None and bool(self.batchMode.IsChecked)
+        tolerance_text = self.verticalTolerance.Text.strip() if getattr(self, "verticalTolerance", None) else ""
+        vertical_tolerance = float(tolerance_text) if tolerance_text else None
+        budget_text = self.pointBudget.Text.strip() if getattr(self, "pointBudget", None) else ""
+        max_points = int(budget_text) if budget_text else None
+        capture = getattr(self, "profileRun", None) is not None and bool(self.profileRun.IsChecked)
+        sweep_angles = self.sweepAngles.Text.strip() if getattr(self, "sweepAngles", None) else ""
+        sweep_offsets = self.sweepOffsets.Text.strip() if getattr(self, "sweepOffsets", None) else ""
+        chunk_text = self.chunkSize.Text.strip() if getattr(self, "chunkSize", None) else ""
+        chunk_size = int(chunk_text) if chunk_text else CHUNK_SIZE
+        resume = getattr(self, "resumeApply", None) is not None and bool(self.resumeApply.IsChecked)
+
+        if resume:  # Adds the points an earlier run left over, nothing is computed
+            apply = MyWindows().runResume(chunk_size)
+            if apply is not None:
+                self.print_apply(apply)
+            return
+
+        if sweep_angles or sweep_offsets:  # Volumes of every variant, nothing is written
+            angles = [float(a) for a in sweep_angles.split(";") if a.strip()] or [angle]
+            offsets = [float(o) for o in sweep_offsets.split(";") if o.strip()] or [offSet]
+            for v in MyWindows().runSweep(angles, offsets):
+                print("Angle {} offset {:.0f} mm: cut {:.1f} m3 over {:.1f} m2, fill {:.1f} m3 over {:.1f} m2".format(
+                    v["angle"], v["offset"], v["cut"], v["cut area"], v["fill"], v["fill area"]))
+            return
+
+        if batch:
+            run = lambda: MyWindows().runBatch(angle, offSet, segment_length, dry_run, vertical_tolerance, max_points,
+                                               chunk_size=chunk_size)
+        else:
+            run = lambda: MyWindows().runScript(angle, offSet, segment_length, dry_run, vertical_tolerance, max_points,
+                                                chunk_size)
+        context = {"batch": batch, "angle": angle, "offset": offSet, "segment_length": segment_length,
+                   "dry_run": dry_run, "vertical_tolerance": vertical_tolerance, "max_points": max_points}
+        profile_path = script.get_universal_data_file("excavation_profile", "prof") if capture else None
+        result, record = profile_run(run, RUN_LOG, context, profile_path)
+        merge = result["merge"]
+        print("Topography merge: {} added, {} skipped, {} simplified".format(
+            merge["added"], merge["skipped"], merge["simplified"]))
+        sampling = result["sampling"]
+        if vertical_tolerance is not None:  # Both counts are before the points are deduplicated
+            print("Adaptive sampling: {} points instead of {} at fixed spacing, within {} mm".format(
+                sampling["points before dedup"], sampling["fixed spacing points"], vertical_tolerance))
+        if "cache" in sampling:
+            cache = sampling["cache"]
+            print("Edge cache: {} of {} edges reused ({:.0%}), {:.2f} s saved".format(
+                cache["hits"], cache["hits"] + cache["misses"], cache["hit rate"], cache["time saved"]))
+        if dry_run:
+            timings = ", ".join("{} {:.2f} s".format(k, v) for k, v in sorted(result["timings"].items()))
+            print("Dry run: {} points computed, nothing written ({})".format(len(result["points"]), timings))
+        if result.get("apply"):
+            self.print_apply(result["apply"])
+        if result.get("volumes"):
+            v = result["volumes"]
+            print("Estimated cut {:.1f} m3 over {:.1f} m2, fill {:.1f} m3 over {:.1f} m2".format(
+                v["cut"], v["cut area"], v["fill"], v["fill area"]))
+        print("Run took {:.2f} s, slowest stage {}, logged to {}".format(
+            record["seconds"], record["slowest stage"], RUN_LOG))
+        if record["profile"]:
+            print("cProfile capture: {}".format(record["profile"]))
+        elif record["profile error"]:
+            print("No cProfile capture, {}. The stage timings are in the log".format(record["profile error"]))
+
+    def print_apply(self, apply):
+        """ Reports how many points were added, how fast, and what is left for a resumed run """
+        print("Added {} of {} points in {:.1f} s ({:.0f} points/s)".format(
+            apply["applied"], apply["total"], apply["seconds"], apply["rate"]))
+        if apply["error"]:
+            print("Adding points failed: {}".format(apply["error"]))
+        elif apply["cancelled"]:
+            print("Adding points was cancelled")
+        if not apply["complete"]:
+            print("{} points were not added, run again with Resume to add them".format(apply["total"] - apply["next"]))
+
+    def get_3D_view(self, name="{3D}"):
         """ Function to get ViewType - 3D View """
-        views = FilteredElementCollector(doc).OfCategory(BuiltInCategory.OST_Views)  # Get 3D view
-        for view in views:
-            if view.Name == "{3D}":
-                return view
-
-    def offset_curves_from_BP(self, buildingPad, offsetParam):
-        """ Offsets boundary cloops of BP """
-        curves = []  # Offset curves from foundation pad
-        try:  # Get curves from foundation pad, and create model lines
-            opt = Options()
-            opt.View = self.get_3D_view()
-            elemGeo = buildingPad.get_Geometry(opt)
-            # INPUT
-
+        def find_view(document):
+            views = FilteredElementCollector(document).OfCategory(BuiltInCategory.OST_Views)  # Get 3D view
+            for view in views:
+                if view.Name == name:
+                    return view
+
+        # Collector runs once per document version instead of on every call, edits clear the cache
+        cache = document_cache(doc, revit_document_version)
+        cache.watch(doc.Application)
+        return cache.get(("3D view", name), find_view, is_valid_element)
+
+    @stage("get_pad_boundary")
+    def get_pad_boundary(self, buildingPad):
+        """ Returns the outer curve loop of the top face of a building pad """
+        opt = Options()
+        opt.View = self.get_3D_view()
+        elemGeo = buildingPad.get_Geometry(opt)
+
+        faceBP = None
+        for geo in elemGeo:  # Get surface with normal Z == 1
+            faces = geo.Faces
             faceBP = None
-            for geo in elemGeo:  # Get surface with normal Z == 1, and offset its curves
-                faces = geo.Faces
-                faceBP = None
-                for face in faces:
-                    if face.FaceNormal.Z == 1:
-                        faceBP = face
-                        pass
-
-            cLoops = faceBP.GetEdgesAsCurveLoops()[0]
-            offsetParam_to_FT = UnitConversion(offsetParam, True, "mm")
-            offSetCLoops = CurveLoop.CreateViaOffset(cLoops, offsetParam_to_FT, XYZ(0, 0, 1))
-            t = Transaction(doc, "Model Lsssines")  # Create model lines form curves for visual purposes
+            for face in faces:
+                if face.FaceNormal.Z == 1:
+                    faceBP = face
+        loop = faceBP.GetEdgesAsCurveLoops()[0]
+        count("curves", loop.NumberOfCurves())
+        return loop
+
+    def get_pad_settings(self, buildingPad, angleExcavation, offsetExcavation):
+        """ Angle (degrees) and offset (mm) from the pad's Excavation angle/offset parameters, else the defaults
+
+        An Angle or Length parameter is converted from Revit's internal radians and feet, a Number or
+        Integer one is taken as degrees and mm. A text Excavation angle parameter may list one angle per
+        pad edge separated by ;. Any other parameter raises ValueError.
+        """
+        values = []
+        for name, default, spec, units in (("Excavation angle", angleExcavation, SpecTypeId.Angle, UnitTypeId.Degrees),
+                                           ("Excavation offset", offsetExcavation, SpecTypeId.Length,
+                                            UnitTypeId.Millimeters)):
+            param = buildingPad.LookupParameter(name)
+            if param is None or not param.HasValue:
+                values.append(default)
+            elif param.StorageType == StorageType.Integer:
+                values.append(param.AsInteger())
+            elif param.StorageType == StorageType.Double and ParameterSpec(param) == spec:
+                values.append(UnitUtils.ConvertFromInternalUnits(param.AsDouble(), units))
+            elif param.StorageType == StorageType.Double and ParameterSpec(param) == SpecTypeId.Number:
+                values.append(param.AsDouble())
+            elif param.StorageType == StorageType.String and name == "Excavation angle":
+                values.append(parse_angles(param.AsString()))
+            else:
+                kinds = "Integer, Number, Angle or Text" if spec == SpecTypeId.Angle else "Integer, Number or Length"
+                raise ValueError("{} of pad {} must be an {} parameter".format(name, buildingPad.Id.IntegerValue,
+                                                                               kinds))
+        return values
+
+    def get_topography_mesh(self, topography):
+        """ Returns vertices and triangle vertex indices of the topography triangulation """
+        opt = Options()
+        opt.View = self.get_3D_view()
+        vertices = []
+        triangles = []
+        for geo in topography.get_Geometry(opt):
+            if not isinstance(geo, Mesh):
+                continue
+            first = len(vertices)
+            for v in geo.Vertices:
+                vertices.append((v.X, v.Y, v.Z))
+            for i in range(geo.NumTriangles):
+                tri = geo.get_Triangle(i)
+                triangles.append((first + tri.get_Index(0), first + tri.get_Index(1), first + tri.get_Index(2)))
+        return vertices, triangles
+
+    def get_terrain(self, topography):
+        """ Returns the ray-cast tree of the topography, built once per run """
+        key = topography.Id.IntegerValue
+        if key not in self._terrains:
+            self._terrains[key] = build_terrain(*self.get_topography_mesh(topography))
+        return self._terrains[key]
+
+    @stage("update_points_on_topography")
+    def update_points_on_topography(self, points, topography, chunk_size=CHUNK_SIZE):
+        """ Adds points to the topography in one edit scope, one transaction per chunk of chunk_size points
+
+        A cancellable progress bar shows progress and throughput. Chunks committed before a failure or a
+        cancellation are kept and the rest is saved for runResume. Returns the result of apply_in_chunks.
+        """
+        def add_chunk(chunk):
+            t = Transaction(doc, "Edit topo points")
             t.Start()
-            for curve in offSetCLoops:  # Create model lines from offset curves
-                #sPlane = SketchPlane.Create(doc, Plane.CreateByNormalAndOrigin(XYZ.BasisZ, curve.Origin))
-                #doc.Create.NewModelCurve(curve, sPlane)
-                curves.append(curve)
-            t.Commit()
-
-        except Exception as e:
-            print(e)
-
-        return curves, offSetCLoops
-
-    def CurveDivisionSingular(self, crvs, div):
-        """ This function returns a list of points divided by divisions """
-        points = []
-        point0 = crvs.Evaluate(0, True)  # Starting point of a curve
-        points.append(point0)
-        for i in range(div):
-            xEnum = i + 1.0
-            point = crvs.Evaluate((xEnum / div), True)
-            points.append(point)
-        return points
-
-
-    def create_rotated_lines(self, curves, offSettedCLoops, angleExcavation, segment_length):
-        """ Creates rotated curves from user input """
-        t = Transaction(doc, "Create model lines")
-        t.Start()
-
-        # Input in degrees for rotation
-        rotationInRadians = (90 - angleExcavation) * math.pi / 180
-
-        distance = None
-        zCoor_top = None
-        zCoor_bot = None
-
-        for c in curves:
-            point = c.Evaluate(0.5, True)
-
-            xCo = point.X
-            yCo = point.Y
-            zCo = point.Z
-            newPoint = XYZ(xCo, yCo, 10)  # New vertical line with arbitrary length
-            newLine = Line.CreateBound(point, newPoint)  # Create a line from a point of the offset curve with dir. Z+
-
-            # Create rotated line
-            rotation = Transform.CreateRotationAtPoint(c.Direction, rotationInRadians, c.Origin)
-            rotatedLine = newLine.CreateTransformed(rotation)
-
-            #  Get end points of rotated lines
-            zCoor_top = rotatedLine.GetEndPoint(1).Z
-            zCoor_bot = zCo
-            distance1 = rotatedLine.GetEndPoint(1).DistanceTo(XYZ(xCo, yCo, zCoor_top))
-            distance = distance1
-
-            if distance or zCoor_top or zCoor_bot != None:
-                break
-
-        t.Commit()
-        offSetCLoopsTop = CurveLoop.CreateViaOffset(offSettedCLoops, distance, XYZ(0, 0, 1))  # at the level of foundation pad
-        movedOffsetCLoopsTop = []
-        # Create model lines form curves for visual purposes
-        t = Transaction(doc, "Model Lines")
-        t.Start()
-
-        for curve in offSetCLoopsTop:
-            dis = XYZ(0, 0, zCoor_top).DistanceTo(XYZ(0, 0, zCoor_bot))
-            translation = Transform.CreateTranslation(XYZ(0, 0, dis))
-            translated_line = curve.CreateTransformed(translation)
-            movedOffsetCLoopsTop.append(translated_line)
-            # Create model lines from offset curves
-            #sPlane = SketchPlane.Create(doc, Plane.CreateByNormalAndOrigin(XYZ.BasisZ, translated_line.Origin))
-            #doc.Create.NewModelCurve(translated_line, sPlane)
-
-        t.Commit()
-
-        t = Transaction(doc, "Create model lines")
-        t.Start()
-        #  This part creates sloped curves
-        slopeCurves = []
-        for c1, c2 in zip(offSettedCLoops, movedOffsetCLoopsTop):  # They do correlate
-            length = UnitUtils.ConvertFromInternalUnits(c1.Length, UnitTypeId.Millimeters)
-            segments = int(length // segment_length)
-            points1 = self.CurveDivisionSingular(c1, segments)
-            points2 = self.CurveDivisionSingular(c2, segments)
-            point3 = c1.Evaluate(0.521211, True)  # Arbitrary point on the line to create a sketch plane
-
-            for p1, p2 in zip(points1, points2):
-                #  Create a new line
-                newLine = Line.CreateBound(p1, p2)
-                #sPlane = SketchPlane.Create(doc, Plane.CreateByThreePoints(p1, p2, point3))
-                #doc.Create.NewModelCurve(newLine, sPlane)
-                slopeCurves.append(newLine)
-        t.Commit()
-        return slopeCurves
-
-    def ProjectPointsOnTopographySurface(self, curves, topography, segment_length):
-        """ This function returns intersection points from lines in a topography, and a list of segment points"""
-        referenceIntersector = ReferenceIntersector(topography.Id, FindReferenceTarget.Mesh, self.get_3D_view())
-        points_list = []
-        segment_points_list = []
-        curve_from_basepoint_to_intersection = []
-        for c in curves:
-            curveDir = c.Direction
-            curveOrig = c.Origin
-            # intersectionFilter = Autodesk.Revit.DB.ElementClassFilter(typeTopography)
-            # referenceIntersector = ReferenceIntersector(intersectionFilter, FindReferenceTarget.All, view3D)
-            referenceWithContext = referenceIntersector.FindNearest(curveOrig, curveDir)
-            intersection_points = referenceWithContext.GetReference().GlobalPoint
-            points_list.append(intersection_points)
-            new_line = Line.CreateBound(c.GetEndPoint(0), intersection_points)
-            curve_from_basepoint_to_intersection.append(new_line)
-
-        for c in curve_from_basepoint_to_intersection:
-            length = UnitUtils.ConvertFromInternalUnits(c.Length, UnitTypeId.Millimeters)
-            segments = int(length // segment_length)  # Create point every 200 mm
-            segment_points = self.CurveDivisionSingular(c, segments)
-            for p in segment_points:
-                segment_points_list.append(p)
-
-        return points_list, segment_points_list
-
-    def check_intersecting_points(self, curve_list, topography, segment_length):
-        """ Returns intersection points from provided curve list """
-        prelimList = []
-        # Get foundation base offset points
-        for c in curve_list:
-            prelimList.append(c.GetEndPoint(0))
-        # Get intersection points from sloped Curves
-        intersectionPoints, segment_points = self.ProjectPointsOnTopographySurface(curve_list, topography, segment_length)
-        intersectionPoints_NoDups = CheckForDupCoord(intersectionPoints + prelimList + segment_points)
-        # List of all new points to be added to the existing topography
-        return intersectionPoints_NoDups
-
-    def update_points_on_topography(self, points, topography):
+            try:
+                topography.AddPoints(chunk.to_xyz(XYZ))  # The only place points become XYZ objects
+                t.Commit()
+            except Exception:
+                if t.GetStatus() == TransactionStatus.Started:
+                    t.RollBack()
+                raise
+
+        ts = Architecture.TopographyEditScope(doc, "Edit topo points")
         try:
-            ts = Architecture.TopographyEditScope(doc, "Edit topo points")
             ts.Start(topography.Id)
-            t = Transaction(doc, "Edit topo points")
-            t.Start()
-            topography.AddPoints(points)
-            t.Commit()
-            ts.Commit(MyFailureProcessor())
         except Exception as e:
-            print(e)
-
-    def runScript(self, angleExcavation=45, offsetExcavation=800, segment_length=200):
+            result = apply_result(len(points), error="{}: {}".format(type(e).__name__, e))
+        else:
+            with forms.ProgressBar(title="Adding topography points {value} of {max_value}", cancellable=True) as pb:
+                def report(done, total, rate):
+                    pb.title = "Adding topography points {{value}} of {{max_value}} ({:.0f} points/s)".format(rate)
+                    pb.update_progress(done, total)
+                result = apply_in_chunks(points, add_chunk, chunk_size, report=report,
+                                         cancelled=lambda: pb.cancelled)
+            if result["applied"]:
+                try:
+                    ts.Commit(MyFailureProcessor())
+                except Exception as e:  # The scope lost every chunk
+                    result.update(applied=0, next=0, complete=False, error="{}: {}".format(type(e).__name__, e))
+            elif ts.IsActive:
+                ts.Cancel()
+
+        count("points written", result["applied"])
+        if result["complete"]:
+            clear_resume(RESUME_FILE)
+        else:
+            save_resume(RESUME_FILE, self.resume_key(topography), list(points), result["next"])
+        return result
+
+    def resume_key(self, topography):
+        """ Identifies the topography a saved remainder of points belongs to """
+        return "{}|{}".format(doc.PathName or doc.Title, topography.UniqueId)
+
+    def get_edge_cache(self, name=None):
+        """ Per-edge results of earlier runs, kept in the pyRevit data folder between sessions
+
+        Each backend of the geometry core keeps its edges in its own file, with NumPy they are arrays
+        IronPython cannot read.
+        """
+        name = name or "excavation_edges_{}".format(BACKEND)
+        if name not in MyWindows._edge_caches:
+            MyWindows._edge_caches[name] = EdgeCache(script.get_universal_data_file(name, "pickle"))
+        return MyWindows._edge_caches[name]
+
+    @stage("compute_points")
+    def compute_points(self, buildingPad, topography, angleExcavation, offsetExcavation, segment_length,
+                       vertical_tolerance=None):
+        """ Computes the new topography points with the geometry core, without opening any transaction
+
+        Revit only supplies the boundary and the terrain. With vertical_tolerance (mm) points are only
+        placed where the slope departs from the terrain or a straight line by more than it. Returns the
+        points, the stage timings and the sampling counts.
+        """
+        loop, edges = LoopDescriptors(self.get_pad_boundary(buildingPad))
+        timings = {}
+        start = time.time()
+        terrain = self.get_terrain(topography)
+        timings["terrain"] = time.time() - start
+        if vertical_tolerance is not None:
+            vertical_tolerance = UnitConversion(vertical_tolerance, True, "mm")
+        cache = self.get_edge_cache()
+        cache.reset_stats()
+        sampling = {}
+        points = pad_points(loop, CurveAngles(angleExcavation, edges), UnitConversion(offsetExcavation, True, "mm"),
+                            UnitConversion(segment_length, True, "mm"), terrain,
+                            vertical_tolerance=vertical_tolerance, stats=sampling, timings=timings, cache=cache)
+        start = time.time()
+        cache.save()
+        timings["cache save"] = time.time() - start
+        sampling["cache"] = cache.stats()
+        count("rays", sampling["rays"])
+        count("points before dedup", sampling["points before dedup"])
+        count("points after dedup", sampling["points"])
+        return CorePoints(points), timings, sampling
+
+    def write_points(self, points, topography, chunk_size=CHUNK_SIZE):
+        """ Writes the points in a single transaction group, keeping whatever chunks were committed """
+        tg = TransactionGroup(doc, "Excavation")
+        tg.Start()
+        result = self.update_points_on_topography(points, topography, chunk_size)
+        if result["applied"]:
+            tg.Assimilate()
+        else:
+            tg.RollBack()
+        return result
+
+    @stage("compute_batch_points")
+    def compute_batch_points(self, pads, topography, angleExcavation, offsetExcavation, segment_length,
+                             processes=None, vertical_tolerance=None, sampling=None):
+        """ Computes pads with the geometry core, returns unique points of all pads
+
+        Every pad uses its own Excavation angle/offset parameters when it has them. batch_pad_points
+        starts no process pool inside a host application, the pads are computed one by one there.
+        sampling receives the number of leading required points.
+        """
+        terrain = self.get_terrain(topography)
+        spacing = UnitConversion(segment_length, True, "mm")
+        jobs = []
+        for pad in pads:
+            angle, offset = self.get_pad_settings(pad, angleExcavation, offsetExcavation)
+            loop, edges = LoopDescriptors(self.get_pad_boundary(pad))
+            jobs.append({"loop": loop, "angle": CurveAngles(angle, edges), "offset": UnitConversion(offset, True, "mm"),
+                         "spacing": spacing})
+            if vertical_tolerance is not None:
+                jobs[-1]["vertical_tolerance"] = UnitConversion(vertical_tolerance, True, "mm")
+        points, _ = batch_pad_points(jobs, terrain, processes, stats=sampling)
+        return CorePoints(points)
+
+    def merge_with_topography(self, points, topography, merge_tolerance=MERGE_TOLERANCE, max_points=None,
+                              required=0):
+        """ Drops points the topography already represents within merge_tolerance (mm), then applies max_points
+
+        The first required points, the terrain hits and base points, are kept. Returns the points to add
+        and the added, skipped and simplified counts.
+        """
+        tolerance = UnitConversion(merge_tolerance, True, "mm")
+        stats = {}
+        if BACKEND == "numpy":
+            kept = merge_points(points.numpy(), self.get_terrain(topography), tolerance, max_points, stats,
+                                required).tolist()
+        else:
+            kept = merge_points(list(points), self.get_terrain(topography), tolerance, max_points, stats, required)
+        return points.take(kept), stats
+
+    def finish_run(self, points, timings, sampling, topography, dry_run, max_points=None, chunk_size=CHUNK_SIZE):
+        """ Merges the points with the topography and writes them unless dry_run, returns the run result """
+        start = time.time()
+        points, merge = self.merge_with_topography(points, topography, max_points=max_points,
+                                                   required=sampling.get("required points", 0))
+        timings["merge"] = time.time() - start
+        result = {"points": points, "timings": timings, "sampling": sampling, "merge": merge, "written": False}
+        if not dry_run:
+            start = time.time()
+            result["apply"] = self.write_points(points, topography, chunk_size)
+            result["written"] = result["apply"]["complete"]
+            timings["write"] = time.time() - start
+        record_timings(timings)
+        return result
+
+    def runBatch(self, angleExcavation=45, offsetExcavation=800, segment_length=200, dry_run=False,
+                 vertical_tolerance=None, max_points=None, processes=None, chunk_size=CHUNK_SIZE):
+        """ Excavates several building pads on one topography and writes all their points at once """
+        sel_Topo = revit.uidoc.Selection.PickObject(ObjectType.Element, CustomISelectionFilter("Topography"),
+                                                    "Select a Topography")
+        topography = doc.GetElement(sel_Topo)
+        sel_BPs = revit.uidoc.Selection.PickObjects(ObjectType.Element, CustomISelectionFilter("Pads"),
+                                                    "Select Building pads")
+        pads = [doc.GetElement(r) for r in sel_BPs]
+
+        start = time.time()
+        sampling = {}
+        points = self.compute_batch_points(pads, topography, angleExcavation, offsetExcavation, segment_length,
+                                           processes, vertical_tolerance, sampling)
+        timings = {"pads": time.time() - start}
+        sampling["points"] = len(points)
+        return self.finish_run(points, timings, sampling, topography, dry_run, max_points, chunk_size)
+
+    def runScript(self, angleExcavation=45, offsetExcavation=800, segment_length=200, dry_run=False,
+                  vertical_tolerance=None, max_points=None, chunk_size=CHUNK_SIZE):
+        """ Runs the excavation, with dry_run the points and timings are returned without touching the model """
         sel_Topo = revit.uidoc.Selection.PickObject(ObjectType.Element, CustomISelectionFilter("Topography"),
                                                     "Select a Topography")
         topography = doc.GetElement(sel_Topo)
@@ -289,12 +498,72 @@ class MyWindows(Windows.Window):
                                                   "Select a Building pad")
         buildingPad = doc.GetElement(sel_BP)
 
-        boundaryCurves, offSetCLoops = self.offset_curves_from_BP(buildingPad, offsetExcavation)
+        points_for_topography, timings, sampling = self.compute_points(buildingPad, topography, angleExcavation,
+                                                                       offsetExcavation, segment_length,
+                                                                       vertical_tolerance)
+        result = self.finish_run(points_for_topography, timings, sampling, topography, dry_run, max_points,
+                                 chunk_size)
+        if dry_run:
+            volumes = self.volume_grid(buildingPad, topography, [angleExcavation], offsetExcavation)
+            if volumes is not None:
+                grid, (angle,) = volumes
+                result["volumes"] = self.metric_volumes(grid.volumes(angle,
+                                                                     UnitConversion(offsetExcavation, True, "mm")))
+        return result
+
+    def runResume(self, chunk_size=CHUNK_SIZE):
+        """ Adds the points an interrupted run left over to the topography they were computed for """
+        sel_Topo = revit.uidoc.Selection.PickObject(ObjectType.Element, CustomISelectionFilter("Topography"),
+                                                    "Select a Topography")
+        topography = doc.GetElement(sel_Topo)
+        remaining = load_resume(RESUME_FILE, self.resume_key(topography))
+        if not remaining:
+            print("No points are waiting to be added to this topography")
+            return None
+        return self.write_points(PointBuffer.from_coords(remaining), topography, chunk_size)
+
+    def volume_grid(self, buildingPad, topography, angles, max_offset, cell_size=VOLUME_CELL_SIZE):
+        """ Terrain height grid around the pad, wide enough for the flattest of angles and max_offset (mm)
+
+        Returns the grid and the angles spread over its edges, or None when NumPy is not available.
+        """
+        if ExcavationGrid is None:
+            return None
+        loop, edges = LoopDescriptors(self.get_pad_boundary(buildingPad))
+        angles = [CurveAngles(a, edges) for a in angles]
+        terrain = self.get_terrain(topography)
+        cell = UnitConversion(cell_size, True, "mm")
+        margin = reach(terrain, loop[0][1][2], angles, UnitConversion(max_offset, True, "mm")) + cell
+        return ExcavationGrid(loop, terrain, cell, margin), angles
+
+    def metric_volumes(self, volumes):
+        """ Volumes in m3 and areas in m2, offset in mm """
+        converted = dict(volumes)
+        for key, units in (("cut", "m3"), ("fill", "m3"), ("cut area", "m2"), ("fill area", "m2"),
+                           ("offset", "mm")):
+            converted[key] = UnitConversion(volumes[key], False, units)
+        return converted
+
+    def runSweep(self, angles, offsets, cell_size=VOLUME_CELL_SIZE):
+        """ Cut and fill volumes of every angle and offset (mm) combination, without touching the model """
+        sel_Topo = revit.uidoc.Selection.PickObject(ObjectType.Element, CustomISelectionFilter("Topography"),
+                                                    "Select a Topography")
+        topography = doc.GetElement(sel_Topo)
+        sel_BP = revit.uidoc.Selection.PickObject(ObjectType.Element, CustomISelectionFilter("Pads"),
+                                                  "Select a Building pad")
+        buildingPad = doc.GetElement(sel_BP)
 
-        rotated_curves_list = self.create_rotated_lines(boundaryCurves, offSetCLoops, angleExcavation, segment_length)
-        points_for_topography = self.check_intersecting_points(rotated_curves_list, topography, segment_length)
-        self.update_points_on_topography(points_for_topography, topography)
+        volumes = self.volume_grid(buildingPad, topography, angles, max(offsets), cell_size)
+        if volumes is None:
+            print("Volume sweeps need NumPy")
+            return []
+        grid, angles = volumes
+        return [self.metric_volumes(v) for v in
+                grid.sweep(angles, [UnitConversion(o, True, "mm") for o in offsets])]
 
 # Show the window
 if __name__ == '__main__':
-    GUI = MyWindows().ShowDialog()
+    try:
+        GUI = MyWindows().ShowDialog()
+    finally:
+        release_document_cache(doc)  # Unhooks DocumentChanged before this script engine goes away